@@ -0,0 +1,67 @@
+"""
+One end-to-end pipeline run for the benchmark: local reads → trimming and
+FastQC → reference preparation → alignment and duplicate marking →
+post-alignment QC → variant calling, filtering and QC.
+
+Run by run.py in a fresh working directory (with stand-in tools first on
+PATH unless real tools are benchmarked); writes per-stage wall times as JSON:
+
+    python pipeline.py --reference ref.fa --reads r_1.fastq.gz r_2.fastq.gz \\
+        --out-dir run --result stages.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from genomics.sequence_acquisition import get_local_sequence
+from genomics.read_alignment import align_reads
+from genomics.quality_control import perform_qc
+from genomics.variant_calling import call_variants
+
+from omics.alignment import alignment_index
+from omics.reference import prepare_reference
+from omics.resources import configure
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reference", required=True, type=Path)
+    parser.add_argument("--reads", required=True, nargs=2, type=Path)
+    parser.add_argument("--out-dir", required=True, type=Path)
+    parser.add_argument("--result", required=True, type=Path)
+    parser.add_argument("--skip-qc", action="store_true", help="Leave out post-alignment QC")
+    parser.add_argument("--stream-trim", action="store_true",
+                        help="Trim in the alignment pipe instead of writing trimmed FASTQs")
+    args = parser.parse_args(argv)
+
+    configure()
+    base_dir = args.out_dir
+    base_dir.mkdir(parents=True, exist_ok=True)
+    stages = {}
+
+    def timed(name, fn, *fn_args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*fn_args, **kwargs)
+        stages[name] = round(time.perf_counter() - start, 3)
+        return result
+
+    reads = timed("reads", get_local_sequence, args.reads, base_dir=base_dir,
+                  do_trimming=not args.stream_trim)
+    fa_path = timed("reference", prepare_reference, args.reference)
+    timed("index", alignment_index, fa_path)
+    bam = timed("align", align_reads, fa_path, *reads, base_dir=base_dir,
+                trim=args.stream_trim)
+    if not args.skip_qc:
+        timed("qc", perform_qc, bam, fa_path, base_dir=base_dir)
+    final_vcf = timed("variants", call_variants, bam, fa_path, base_dir=base_dir)
+
+    args.result.write_text(json.dumps({"stages": stages, "final_vcf": str(final_vcf)}))
+
+
+if __name__ == "__main__":
+    main()
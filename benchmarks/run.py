@@ -0,0 +1,347 @@
+"""
+Benchmark suite for the pipeline's Python hot paths and an end-to-end run.
+
+Inputs are generated by synthetic.py from fixed seeds and cached under the
+work directory, one set per scale. Sizes at --scale 1:
+
+    synthetic VCF        200,000 records
+    per-base BED         1,000,000 rows
+    reference            4 contigs x 250 kb, 1,000 SNPs + 100 indels
+    reads                50,000 pairs of 150 bp
+
+fastq_stats times the read QC engine on the first read file and records
+how long plain gzip decompression of the same file takes.
+
+The startup benchmark times `omics --help` in a fresh interpreter, and
+records the import time of each pipeline module on top of a bare
+interpreter: the fixed cost every short per-sample job pays.
+
+The end-to-end benchmark runs pipeline.py in a fresh directory per repeat.
+With --tools stub (the default) the external tools are replaced by the
+stand-ins in stubs.py, so it runs on a bare CI box and times the pipeline's
+own orchestration and Python stages; --tools real uses whatever is on PATH.
+
+Every result is appended to benchmarks/results.jsonl with the commit it was
+measured on, and `compare` shows the change between two commits:
+
+    python benchmarks/run.py run --scale 1 --repeat 3
+    python benchmarks/run.py run --only qual_distribution count_variant_types
+    python benchmarks/run.py compare                  # latest vs. the commit before
+    python benchmarks/run.py compare --baseline HEAD~5 --fail-above 0.15
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(HERE))
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import synthetic
+from stubs import install_stubs
+
+from genomics.variants.qc import count_variant_types
+from genomics.variants.qc import qual_distribution
+from genomics.variants.scan import _scan_cached
+from qc.alignment import coverage_depth_distribution
+from qc.fastq_stats import fastq_stats
+
+DEFAULT_RESULTS = HERE / "results.jsonl"
+DEFAULT_WORK_DIR = Path(tempfile.gettempdir()) / "omics_benchmarks"
+
+BASE_SIZES = {
+    "vcf_records": 200_000,
+    "bed_rows": 1_000_000,
+    "contig_length": 250_000,
+    "snps": 1000,
+    "indels": 100,
+    "read_pairs": 50_000,
+}
+
+
+def sizes(scale):
+    return {k: max(1, int(v * scale)) for k, v in BASE_SIZES.items()}
+
+
+def prepare_data(work_dir, scale):
+    """Generate (or reuse) the synthetic inputs for a scale."""
+    data_dir = Path(work_dir) / f"data-x{scale:g}"
+    done = data_dir / "complete.json"
+    if done.exists():
+        return {k: Path(v) for k, v in json.loads(done.read_text()).items()}
+
+    n = sizes(scale)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    print(f"[bench] Generating synthetic inputs at scale {scale:g} → {data_dir}")
+    reference = synthetic.write_reference(data_dir / "reference.fa",
+                                          contig_length=n["contig_length"])
+    variants = synthetic.simulate_variants(reference, n["snps"], n["indels"])
+    data = {
+        "reference": data_dir / "reference.fa",
+        "truth_vcf": synthetic.write_truth_vcf(variants, reference, data_dir / "truth.vcf"),
+        "vcf": synthetic.write_synthetic_vcf(data_dir / "calls.vcf.gz", n["vcf_records"]),
+        "per_base_bed": synthetic.write_per_base_bed(data_dir / "sample.per-base.bed.gz",
+                                                     n["bed_rows"]),
+    }
+    data["read1"], data["read2"] = synthetic.simulate_reads(
+        reference, variants, data_dir / "reads_1.fastq.gz", data_dir / "reads_2.fastq.gz",
+        n["read_pairs"])
+    done.write_text(json.dumps({k: str(v) for k, v in data.items()}))
+    return data
+
+
+# -- benchmarks --------------------------------------------------------------
+# Each takes (data, out_dir, args) and returns a dict of extra fields to record;
+# a "seconds" field replaces the wall time of the call as the measured time.
+
+def bench_qual_distribution(data, out_dir, args):
+    # scan_vcf memoises per file; every repeat should time a full scan
+    _scan_cached.cache_clear()
+    qual_distribution(data["vcf"], out_dir / "qual_hist.png")
+
+
+def bench_count_variant_types(data, out_dir, args):
+    _scan_cached.cache_clear()
+    return {"counts": count_variant_types(data["vcf"])}
+
+
+def bench_coverage_depth_distribution(data, out_dir, args):
+    coverage_depth_distribution(data["per_base_bed"], out_dir / "depth_hist.png")
+
+
+def bench_fastq_stats(data, out_dir, args):
+    # Recorded next to the time to just decompress the same file: read QC
+    # should keep up with gzip
+    start = time.perf_counter()
+    with gzip.open(data["read1"], "rb") as f:
+        while f.read(1 << 24):
+            pass
+    gunzip = time.perf_counter() - start
+    start = time.perf_counter()
+    stats = fastq_stats(data["read1"])
+    return {"seconds": time.perf_counter() - start, "gunzip_s": round(gunzip, 4),
+            "reads": stats.total_reads}
+
+
+STARTUP_MODULES = [
+    "omics.cli",
+    "genomics.sequence_acquisition",
+    "genomics.read_alignment",
+    "genomics.quality_control",
+    "genomics.variant_calling",
+    "genomics.batch",
+    "qc.alignment",
+    "omics.downloader",
+]
+
+
+def _python_seconds(*python_args):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *python_args], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def bench_startup(data, out_dir, args):
+    bare = _python_seconds("-c", "pass")
+    imports = {m: round(max(0.0, _python_seconds("-c", f"import {m}") - bare), 4)
+               for m in STARTUP_MODULES}
+    return {"seconds": _python_seconds("-m", "omics.cli", "--help"), "imports": imports}
+
+
+def bench_end_to_end(data, out_dir, args):
+    run_dir = out_dir / "e2e"
+    shutil.rmtree(run_dir, ignore_errors=True)
+    run_dir.mkdir(parents=True)
+    reference = run_dir / "reference.fa"
+    shutil.copyfile(data["reference"], reference)
+
+    env = dict(os.environ)
+    env.update({
+        "OMICS_STEP_CACHE": str(run_dir / "cache"),
+        "OMICS_TELEMETRY_DIR": str(run_dir / "telemetry"),
+    })
+    if args.tools == "stub":
+        bin_dir = install_stubs(Path(args.work_dir) / "stub-bin")
+        env["PATH"] = f"{bin_dir}{os.pathsep}{env['PATH']}"
+        env["OMICS_STUB_TRUTH_VCF"] = str(data["truth_vcf"])
+
+    result = run_dir / "stages.json"
+    cmd = [sys.executable, str(HERE / "pipeline.py"), "--reference", str(reference),
+           "--reads", str(data["read1"]), str(data["read2"]),
+           "--out-dir", str(run_dir / "sample"), "--result", str(result)]
+    with (run_dir / "pipeline.log").open("w") as log:
+        proc = subprocess.run(cmd, cwd=run_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    if proc.returncode != 0:
+        raise RuntimeError(f"pipeline failed (exit {proc.returncode}); "
+                           f"see {run_dir / 'pipeline.log'}")
+    return {"stages": json.loads(result.read_text())["stages"]}
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "qual_distribution": bench_qual_distribution,
+    "count_variant_types": bench_count_variant_types,
+    "coverage_depth_distribution": bench_coverage_depth_distribution,
+    "fastq_stats": bench_fastq_stats,
+    "end_to_end": bench_end_to_end,
+}
+
+
+# -- results -----------------------------------------------------------------
+
+def git_commit():
+    """(short commit hash, whether tracked files have uncommitted changes)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        return commit, bool(dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def load_results(results_file):
+    if not Path(results_file).exists():
+        return []
+    with open(results_file) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_benchmarks(args):
+    data = prepare_data(args.work_dir, args.scale)
+    commit, dirty = git_commit()
+    names = args.only or list(BENCHMARKS)
+    out_dir = Path(args.work_dir) / "out"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    failed = 0
+    for name in names:
+        times, extra = [], {}
+        try:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                extra = BENCHMARKS[name](data, out_dir, args) or {}
+                times.append(extra.pop("seconds", time.perf_counter() - start))
+        except Exception as err:
+            print(f"[bench] {name}: failed: {type(err).__name__}: {err}")
+            failed += 1
+            continue
+
+        record = {
+            "benchmark": name,
+            "commit": commit,
+            "dirty": dirty,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "scale": args.scale,
+            "tools": args.tools if name == "end_to_end" else "-",
+            "repeat": args.repeat,
+            "min_s": round(min(times), 4),
+            "median_s": round(statistics.median(times), 4),
+            **extra,
+        }
+        print(f"[bench] {name:<28} median {record['median_s']:8.3f} s  "
+              f"min {record['min_s']:8.3f} s")
+        if "stages" in extra:
+            print("        " + "  ".join(f"{k} {v:.2f}s" for k, v in extra["stages"].items()))
+        if "gunzip_s" in extra:
+            print(f"        gunzip alone {extra['gunzip_s']:.3f} s")
+        if "imports" in extra:
+            for module, seconds in extra["imports"].items():
+                print(f"        import {module:<32} {seconds:6.3f} s")
+        if not args.no_save:
+            with open(args.results, "a") as f:
+                f.write(json.dumps(record) + "\n")
+    return 1 if failed else 0
+
+
+def compare(args):
+    """Print the change of each benchmark's median between two commits."""
+    records = [r for r in load_results(args.results)
+               if r["scale"] == args.scale and (args.host is None or r["host"] == args.host)]
+    if not records:
+        print(f"No results at scale {args.scale:g} in {args.results}")
+        return 1
+
+    # Latest record per (benchmark, commit), commits in the order they were measured
+    latest, commits = {}, []
+    for r in records:
+        latest[(r["benchmark"], r["commit"])] = r
+        if r["commit"] in commits:
+            commits.remove(r["commit"])
+        commits.append(r["commit"])
+
+    current = args.commit or commits[-1]
+    if args.baseline:
+        baseline = subprocess.run(["git", "rev-parse", "--short", args.baseline], cwd=ROOT,
+                                  capture_output=True, text=True).stdout.strip() or args.baseline
+    else:
+        earlier = commits[:commits.index(current)] if current in commits else []
+        if not earlier:
+            print(f"No results for a commit before {current}")
+            return 1
+        baseline = earlier[-1]
+
+    print(f"{'benchmark':<28} {baseline:>10} {current:>10} {'change':>8}")
+    regressions = 0
+    for name in BENCHMARKS:
+        old, new = latest.get((name, baseline)), latest.get((name, current))
+        if not old or not new:
+            continue
+        change = new["median_s"] / old["median_s"] - 1 if old["median_s"] else 0.0
+        flag = ""
+        if args.fail_above is not None and change > args.fail_above:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<28} {old['median_s']:>9.3f}s {new['median_s']:>9.3f}s "
+              f"{change:>+7.1%}{flag}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline benchmarks on synthetic data.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run benchmarks and record the results")
+    run_parser.add_argument("--scale", type=float, default=1.0,
+                            help="Multiplies every input size (default 1)")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    run_parser.add_argument("--tools", choices=["stub", "real"], default="stub",
+                            help="External tools for the end-to-end run")
+    run_parser.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR)
+    run_parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS)
+    run_parser.add_argument("--no-save", action="store_true")
+
+    compare_parser = sub.add_parser("compare", help="Compare results between commits")
+    compare_parser.add_argument("--scale", type=float, default=1.0)
+    compare_parser.add_argument("--baseline", help="Commit to compare against "
+                                "(default: the previously measured commit)")
+    compare_parser.add_argument("--commit", help="Commit to compare (default: latest measured)")
+    compare_parser.add_argument("--host", help="Only results from this host")
+    compare_parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS)
+    compare_parser.add_argument("--fail-above", type=float,
+                                help="Exit 1 if a median grew by more than this fraction")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        return run_benchmarks(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
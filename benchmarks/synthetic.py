@@ -0,0 +1,310 @@
+"""
+Deterministic synthetic inputs for the benchmarks.
+
+Every generator takes a seed, so the same scale and seed always give
+byte-identical files and timings can be compared between commits:
+
+    reference = write_reference("ref.fa", n_contigs=4, contig_length=500_000)
+    variants = simulate_variants(reference, n_snps=2000, n_indels=200)
+    write_truth_vcf(variants, reference, "truth.vcf")
+    simulate_reads(reference, variants, "reads_1.fastq.gz", "reads_2.fastq.gz", n_pairs=100_000)
+    write_synthetic_vcf("calls.vcf.gz", n_records=500_000)
+    write_per_base_bed("sample.per-base.bed.gz", n_rows=2_000_000)
+
+Read names carry the reference positions they were simulated from
+(<contig>:<start1>:<start2>:<n>, 1-based), which the stand-in aligner in
+stubs.py uses in place of real alignment.
+"""
+import bisect
+import gzip
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+COMPLEMENT = bytes.maketrans(b"ACGTN", b"TGCAN")
+LINE_WIDTH = 60
+CHUNK_ROWS = 100_000
+
+
+@dataclass(frozen=True)
+class Variant:
+    """A simulated homozygous variant; pos is 1-based, as in VCF."""
+    contig: str
+    pos: int
+    ref: str
+    alt: str
+
+
+def write_reference(path, n_contigs=4, contig_length=500_000, n_gaps=2, seed=1):
+    """
+    Write a random FASTA with n_gaps runs of N per contig.
+
+    Returns:
+        dict: contig → sequence (bytes).
+    """
+    rng = np.random.default_rng(seed)
+    contigs = {}
+    for i in range(n_contigs):
+        seq = BASES[rng.integers(0, 4, contig_length)]
+        for start in rng.integers(0, max(1, contig_length - 2000), n_gaps):
+            seq[start:start + 1500] = ord("N")
+        contigs[f"chr{i + 1}"] = seq.tobytes()
+
+    with open(path, "wb") as f:
+        for name, seq in contigs.items():
+            f.write(f">{name}\n".encode())
+            for start in range(0, len(seq), LINE_WIDTH):
+                f.write(seq[start:start + LINE_WIDTH] + b"\n")
+    return contigs
+
+
+def simulate_variants(reference, n_snps=1000, n_indels=100, max_indel=6, seed=2):
+    """
+    Non-overlapping SNPs and indels at random non-N positions.
+
+    Returns:
+        list of Variant: sorted by contig and position.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(reference)
+    lengths = np.array([len(reference[n]) for n in names])
+    variants, taken = [], set()
+
+    def positions(n):
+        # Spread over contigs by length, keeping clear of contig ends
+        contig_idx = rng.choice(len(names), size=n, p=lengths / lengths.sum())
+        return [(names[c], int(rng.integers(100, lengths[c] - 100))) for c in contig_idx]
+
+    for contig, pos in positions(n_snps):
+        ref = reference[contig][pos:pos + 1]
+        if ref == b"N" or (contig, pos // 10) in taken:
+            continue
+        taken.add((contig, pos // 10))
+        alt = bytes([BASES[(list(b"ACGT").index(ref[0]) + rng.integers(1, 4)) % 4]])
+        variants.append(Variant(contig, pos + 1, ref.decode(), alt.decode()))
+
+    for contig, pos in positions(n_indels):
+        size = int(rng.integers(1, max_indel + 1))
+        ref = reference[contig][pos:pos + size + 1]
+        if b"N" in ref or any((contig, p // 10) in taken for p in range(pos, pos + size + 1)):
+            continue
+        taken.update((contig, p // 10) for p in range(pos, pos + size + 1))
+        if rng.random() < 0.5:
+            # Deletion of size bases after the anchor base
+            variants.append(Variant(contig, pos + 1, ref.decode(), ref[:1].decode()))
+        else:
+            inserted = BASES[rng.integers(0, 4, size)].tobytes()
+            variants.append(Variant(contig, pos + 1, ref[:1].decode(),
+                                    (ref[:1] + inserted).decode()))
+
+    order = {name: i for i, name in enumerate(names)}
+    return sorted(variants, key=lambda v: (order[v.contig], v.pos))
+
+
+def write_truth_vcf(variants, reference, path):
+    """Write the simulated variants as a single-sample VCF, as a caller would report them."""
+    with open(path, "w") as f:
+        f.write("##fileformat=VCFv4.2\n")
+        for name, seq in reference.items():
+            f.write(f"##contig=<ID={name},length={len(seq)}>\n")
+        f.write('##INFO=<ID=DP,Number=1,Type=Integer,Description="Total read depth">\n'
+                '##INFO=<ID=AF,Number=A,Type=Float,Description="Allele frequency">\n'
+                '##INFO=<ID=SAF,Number=A,Type=Integer,Description="Alt forward reads">\n'
+                '##INFO=<ID=SAR,Number=A,Type=Integer,Description="Alt reverse reads">\n'
+                '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n'
+                '##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read depth">\n')
+        f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tsample\n")
+        for v in variants:
+            f.write(f"{v.contig}\t{v.pos}\t.\t{v.ref}\t{v.alt}\t200\t.\t"
+                    f"DP=30;AF=1;SAF=15;SAR=15\tGT:DP\t1/1:30\n")
+    return Path(path)
+
+
+def _haplotype(seq, variants):
+    """
+    Apply variants to a contig. Returns the haplotype and a lift-over table
+    (haplotype segment starts, matching reference starts).
+    """
+    parts, hap_starts, ref_starts = [], [0], [0]
+    ref_pos = hap_len = 0
+    for v in variants:
+        start = v.pos - 1
+        parts.append(seq[ref_pos:start])
+        hap_len += start - ref_pos
+        parts.append(v.alt.encode())
+        hap_len += len(v.alt)
+        ref_pos = start + len(v.ref)
+        hap_starts.append(hap_len)
+        ref_starts.append(ref_pos)
+    parts.append(seq[ref_pos:])
+    return b"".join(parts), hap_starts, ref_starts
+
+
+def _lift(hap_pos, hap_starts, ref_starts):
+    i = bisect.bisect_right(hap_starts, hap_pos) - 1
+    return ref_starts[i] + hap_pos - hap_starts[i]
+
+
+def simulate_reads(reference, variants, read1_path, read2_path, n_pairs=100_000,
+                   read_length=150, insert_mean=350, insert_sd=50, error_rate=0.002,
+                   seed=3):
+    """
+    Simulate gzipped paired-end FASTQ from the reference with variants applied.
+
+    Fragments are drawn uniformly over the haplotypes (weighted by length)
+    and read 2 is the reverse complement of the fragment end. Base errors
+    are substitutions at error_rate with a low quality score.
+
+    Returns:
+        tuple of Path: (read1_path, read2_path)
+    """
+    rng = np.random.default_rng(seed)
+    by_contig = {name: [] for name in reference}
+    for v in variants:
+        by_contig[v.contig].append(v)
+    haplotypes = {name: _haplotype(seq, by_contig[name]) for name, seq in reference.items()}
+
+    names = list(reference)
+    lengths = np.array([len(haplotypes[n][0]) for n in names])
+    contig_idx = rng.choice(len(names), size=n_pairs, p=lengths / lengths.sum())
+    inserts = np.clip(rng.normal(insert_mean, insert_sd, n_pairs).astype(int),
+                      read_length, None)
+    good_qual = b"I" * read_length
+
+    with gzip.open(read1_path, "wb", compresslevel=1) as r1, \
+            gzip.open(read2_path, "wb", compresslevel=1) as r2:
+        out1, out2 = [], []
+        for n in range(n_pairs):
+            name = names[contig_idx[n]]
+            hap, hap_starts, ref_starts = haplotypes[name]
+            insert = min(int(inserts[n]), len(hap))
+            start = int(rng.integers(0, len(hap) - insert + 1))
+            fragment = hap[start:start + insert]
+            seq1 = fragment[:read_length]
+            seq2 = fragment[-read_length:][::-1].translate(COMPLEMENT)
+
+            reads = []
+            for seq in (seq1, seq2):
+                errors = np.flatnonzero(rng.random(len(seq)) < error_rate)
+                if len(errors):
+                    seq = bytearray(seq)
+                    qual = bytearray(good_qual[:len(seq)])
+                    for e in errors:
+                        seq[e] = BASES[(list(b"ACGTN").index(seq[e]) + 1) % 4]
+                        qual[e] = ord("#")
+                    reads.append((bytes(seq), bytes(qual)))
+                else:
+                    reads.append((seq, good_qual[:len(seq)]))
+
+            pos1 = _lift(start, hap_starts, ref_starts) + 1
+            pos2 = _lift(start + insert - len(seq2), hap_starts, ref_starts) + 1
+            read_name = f"{name}:{pos1}:{pos2}:{n}".encode()
+            out1.append(b"@%s/1\n%s\n+\n%s\n" % (read_name, *reads[0]))
+            out2.append(b"@%s/2\n%s\n+\n%s\n" % (read_name, *reads[1]))
+            if len(out1) == CHUNK_ROWS:
+                r1.write(b"".join(out1))
+                r2.write(b"".join(out2))
+                out1, out2 = [], []
+        r1.write(b"".join(out1))
+        r2.write(b"".join(out2))
+    return Path(read1_path), Path(read2_path)
+
+
+def write_synthetic_vcf(path, n_records=500_000, n_contigs=16, contig_length=1_000_000,
+                        samples=("sample",), seed=4):
+    """
+    Write a FreeBayes-like VCF (gzipped if path ends in .gz) for the QC hot paths.
+
+    The variant mix is about 80% SNPs, 12% indels, 5% MNPs and 3% multi-allelic
+    sites; about 1% of records have QUAL '.'.
+
+    Returns:
+        Path: path
+    """
+    rng = np.random.default_rng(seed)
+    contigs = [f"chr{i + 1}" for i in range(n_contigs)]
+    per_contig = np.bincount(rng.integers(0, n_contigs, n_records), minlength=n_contigs)
+
+    header = ["##fileformat=VCFv4.2", "##source=synthetic"]
+    header += [f"##contig=<ID={c},length={contig_length}>" for c in contigs]
+    header += [
+        '##INFO=<ID=DP,Number=1,Type=Integer,Description="Total read depth">',
+        '##INFO=<ID=AF,Number=A,Type=Float,Description="Allele frequency">',
+        '##INFO=<ID=SAF,Number=A,Type=Integer,Description="Alt forward reads">',
+        '##INFO=<ID=SAR,Number=A,Type=Integer,Description="Alt reverse reads">',
+        '##INFO=<ID=TYPE,Number=A,Type=String,Description="Allele type">',
+        '##FILTER=<ID=LowQual,Description="Low quality">',
+        '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+        '##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read depth">',
+        "\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT",
+                   *samples]),
+    ]
+    kinds = np.array(["snp", "ins", "del", "mnp", "multi"])
+    ref_alt = {
+        "snp": [("A", "G"), ("C", "T"), ("G", "A"), ("T", "C"), ("A", "C"), ("G", "T")],
+        "ins": [("A", "AT"), ("C", "CAG"), ("G", "GTTA")],
+        "del": [("AT", "A"), ("CAG", "C"), ("GTTA", "G")],
+        "mnp": [("AC", "GT"), ("TG", "CA")],
+        "multi": [("A", "G,T"), ("C", "CA,T")],
+    }
+
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wt") as f:
+        f.write("\n".join(header) + "\n")
+        for contig, n in zip(contigs, per_contig):
+            positions = np.sort(rng.choice(contig_length - 10, size=n, replace=False)) + 1
+            kind = rng.choice(kinds, size=n, p=[0.8, 0.06, 0.06, 0.05, 0.03])
+            choice = rng.integers(0, 6, n)
+            qual = rng.gamma(2.0, 60.0, n)
+            qual_missing = rng.random(n) < 0.01
+            dp = rng.poisson(30, n)
+            af = np.round(rng.uniform(0.1, 1.0, n), 3)
+            saf = rng.binomial(dp, 0.5)
+            filt = np.where(qual < 20, "LowQual", "PASS")
+            gt = np.where(af > 0.8, "1/1", "0/1")
+
+            for start in range(0, n, CHUNK_ROWS):
+                lines = []
+                for i in range(start, min(n, start + CHUNK_ROWS)):
+                    options = ref_alt[kind[i]]
+                    ref, alt = options[choice[i] % len(options)]
+                    q = "." if qual_missing[i] else f"{qual[i]:.2f}"
+                    lines.append(
+                        f"{contig}\t{positions[i]}\t.\t{ref}\t{alt}\t{q}\t{filt[i]}\t"
+                        f"DP={dp[i]};AF={af[i]};SAF={saf[i]};SAR={dp[i] - saf[i]};"
+                        f"TYPE={kind[i]}\tGT:DP" + f"\t{gt[i]}:{dp[i]}" * len(samples)
+                    )
+                f.write("\n".join(lines) + "\n")
+    return Path(path)
+
+
+def write_per_base_bed(path, n_rows=2_000_000, n_contigs=16, mean_depth=30,
+                       zero_fraction=0.02, seed=5):
+    """
+    Write a mosdepth-style per-base BED (contig, start, end, depth), gzipped.
+
+    Runs of equal depth have geometric lengths; depths are Poisson around
+    mean_depth with a fraction of zero-coverage runs.
+
+    Returns:
+        Path: path
+    """
+    rng = np.random.default_rng(seed)
+    per_contig = np.bincount(rng.integers(0, n_contigs, n_rows), minlength=n_contigs)
+    with gzip.open(path, "wt", compresslevel=1) as f:
+        for i, n in enumerate(per_contig):
+            contig = f"chr{i + 1}"
+            ends = np.cumsum(rng.geometric(0.3, n))
+            starts = np.concatenate([[0], ends[:-1]])
+            depth = rng.poisson(mean_depth, n)
+            depth[rng.random(n) < zero_fraction] = 0
+            for start in range(0, n, CHUNK_ROWS):
+                stop = min(n, start + CHUNK_ROWS)
+                f.write("".join(
+                    f"{contig}\t{s}\t{e}\t{d}\n"
+                    for s, e, d in zip(starts[start:stop].tolist(), ends[start:stop].tolist(),
+                                       depth[start:stop].tolist())
+                ))
+    return Path(path)
@@ -1,6 +1,8 @@
-import subprocess
+from omics.telemetry import run
+from omics.resources import threads as resolve_threads
+from omics.resources import get_budget
 
-def run_spades(read1, read2, output_dir="spades_output", threads=4, memory=16):
+def run_spades(read1, read2, output_dir="spades_output", threads=None, memory=None):
     """
     Assemble genome de novo using SPAdes.
     
@@ -8,10 +10,12 @@ def run_spades(read1, read2, output_dir="spades_output", threads=4, memory=16):
         read1 (str): Path to trimmed read 1 (FASTQ.gz)
         read2 (str): Path to trimmed read 2 (FASTQ.gz)
         output_dir (str): Output directory for SPAdes results
-        threads (int): Number of threads to use
-        memory (int): Max memory (in GB)
+        threads (int): Number of threads to use (defaults to the resource budget)
+        memory (int): Max memory (in GB, defaults to the resource budget)
     """
-    subprocess.run([
+    threads = resolve_threads(threads)
+    memory = memory or max(1, get_budget().memory_mb // 1024)
+    run([
         "spades.py",
         "-1", read1,
         "-2", read2,
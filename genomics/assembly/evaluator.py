@@ -1,4 +1,6 @@
-import subprocess
+from omics.telemetry import run
+
+
 def run_quast(contigs_fasta, output_dir="quast_output", reference_fasta=None, reference_gff=None):
     """
     Evaluate genome assembly quality using QUAST.
@@ -20,4 +22,4 @@ def run_quast(contigs_fasta, output_dir="quast_output", reference_fasta=None, re
     if reference_gff:
         cmd += ["-g", reference_gff]
     
-    subprocess.run(cmd)
\ No newline at end of file
+    run(cmd)
\ No newline at end of file
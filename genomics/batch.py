@@ -0,0 +1,266 @@
+"""
+Run many samples through the pipeline with per-stage concurrency limits.
+
+Samples are read from a tab-separated manifest with a header line and either
+an SRA accession or a local pair of FASTQ files per row ('#' lines are
+ignored; 'sample' defaults to the accession or the first FASTQ name):
+
+    sample      accession     read1                 read2
+    yeast_a     SRR34533466
+    yeast_b                   reads/b_1.fastq.gz    reads/b_2.fastq.gz
+
+Every sample goes through download, align, qc and variants in order. Each
+stage has its own limit on how many samples may be in it at once, so the
+download of one sample overlaps the alignment of the previous one. A failed
+sample is recorded and the batch carries on with the rest; per-sample status
+is written to <out_dir>/batch_status.tsv as samples finish.
+
+Each sample's intermediates live in its own scratch session (see omics/scratch.py;
+--scratch-dir puts them on a fast local disk) and are deleted as soon as they
+have been read. A sample waits before starting, and before each stage, while
+the scratch filesystem is above --scratch-high-water.
+
+    omics batch manifest.tsv --reference <url> --out-dir runs \\
+        --download 2 --align 1 --qc 2 --variants 2
+"""
+import argparse
+import csv
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import sys
+
+from genomics.sequence_acquisition import get_sequence
+from genomics.sequence_acquisition import get_local_sequence
+from genomics.read_alignment import reference_genome
+from genomics.read_alignment import align_reads
+from genomics.quality_control import perform_qc
+from genomics.variant_calling import call_variants
+
+from omics.resources import ResourceBudget
+from omics.resources import configure
+from omics.resources import scoped_budget
+from omics.scratch import configure_scratch
+from omics.scratch import scratch_session
+from omics.scratch import wait_for_space
+from omics.stepcache import cached_step
+
+STAGES = ("download", "align", "qc", "variants")
+DEFAULT_LIMITS = {"download": 2, "align": 1, "qc": 2, "variants": 2}
+STATUS_FIELDS = ["sample", "status", "failed_stage", "error",
+                 *[f"{stage}_s" for stage in STAGES], "final_vcf"]
+
+
+@dataclass
+class Sample:
+    name: str
+    accession: str = None
+    reads: tuple = ()
+    status: str = "pending"
+    failed_stage: str = None
+    error: str = None
+    seconds: dict = field(default_factory=dict)
+    final_vcf: Path = None
+
+
+def read_manifest(manifest_file):
+    """
+    Parse a sample manifest.
+
+    Returns:
+        list of Sample: in manifest order.
+
+    Raises:
+        ValueError: on a row without an accession or a read1, or a duplicate sample name.
+    """
+    manifest_file = Path(manifest_file)
+    with manifest_file.open() as f:
+        rows = [line for line in f if line.strip() and not line.startswith("#")]
+
+    samples, seen = [], set()
+    for i, row in enumerate(csv.DictReader(rows, delimiter="\t"), start=1):
+        row = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+        accession = row.get("accession") or None
+        reads = tuple(Path(row[k]) for k in ("read1", "read2") if row.get(k))
+        if not accession and not reads:
+            raise ValueError(f"{manifest_file}: sample row {i} needs an accession or read1")
+        # Relative FASTQ paths are relative to the manifest
+        reads = tuple(r if r.is_absolute() else manifest_file.parent / r for r in reads)
+        name = row.get("sample") or accession or reads[0].name.split(".")[0]
+        if name in seen:
+            raise ValueError(f"{manifest_file}: sample row {i} duplicates sample {name}")
+        seen.add(name)
+        samples.append(Sample(name=name, accession=accession, reads=reads))
+    return samples
+
+
+def _run_sample(sample, fa_path, out_dir, gates, budget, run_qc, stream_trim, status):
+    """Take one sample through every stage; failures are recorded, not raised."""
+    base_dir = out_dir / sample.name
+    sample.status = "running"
+
+    # Set-up (budget scope, scratch session) and clean-up failures are
+    # recorded like stage failures, so no sample is left "running"
+    stage = "setup"
+    try:
+        with scoped_budget(budget), scratch_session(sample.name):
+            base_dir.mkdir(parents=True, exist_ok=True)
+            for stage in STAGES:
+                if stage == "qc" and not run_qc:
+                    continue
+                with gates[stage]:
+                    wait_for_space(label=f"{sample.name} {stage}")
+                    print(f"[batch] {sample.name}: {stage}")
+                    start = time.monotonic()
+                    if stage == "download":
+                        if sample.accession:
+                            reads = cached_step("get_sequence", get_sequence, sample.accession,
+                                                base_dir=base_dir, do_trimming=not stream_trim,
+                                                tools=["prefetch", "fasterq-dump", "cutadapt"])
+                        else:
+                            reads = cached_step("get_local_sequence", get_local_sequence,
+                                                list(sample.reads), base_dir=base_dir,
+                                                do_trimming=not stream_trim,
+                                                inputs=list(sample.reads), tools=["cutadapt"])
+                    elif stage == "align":
+                        bam = cached_step("align_reads", align_reads, fa_path, *reads,
+                                          base_dir=base_dir, trim=stream_trim,
+                                          inputs=[fa_path, *reads],
+                                          tools=["cutadapt", "bwa-mem2", "samtools"])
+                    elif stage == "qc":
+                        perform_qc(bam, fa_path, base_dir=base_dir)
+                    elif stage == "variants":
+                        sample.final_vcf = call_variants(bam, fa_path, base_dir=base_dir)
+                    sample.seconds[stage] = round(time.monotonic() - start, 1)
+            stage = "cleanup"
+        sample.status = "ok"
+    except Exception as err:
+        sample.status = "failed"
+        sample.failed_stage = stage
+        sample.error = f"{type(err).__name__}: {err}"
+        print(f"[batch] {sample.name}: failed in {stage}: {sample.error}")
+        traceback.print_exc()
+    status.write()
+    return sample
+
+
+class _StatusFile:
+    """Rewrites the status TSV whenever a sample finishes."""
+
+    def __init__(self, path, samples):
+        self.path = Path(path)
+        self.samples = samples
+        self._lock = threading.Lock()
+
+    def write(self):
+        with self._lock:
+            tmp = self.path.with_suffix(".tmp")
+            with tmp.open("w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=STATUS_FIELDS, delimiter="\t")
+                writer.writeheader()
+                for s in self.samples:
+                    writer.writerow({
+                        "sample": s.name,
+                        "status": s.status,
+                        "failed_stage": s.failed_stage or "",
+                        "error": (s.error or "").replace("\t", " ").replace("\n", " "),
+                        **{f"{stage}_s": s.seconds.get(stage, "") for stage in STAGES},
+                        "final_vcf": s.final_vcf or "",
+                    })
+            tmp.replace(self.path)
+
+
+def run_batch(manifest_file, ref_url, out_dir=Path("."), limits=None,
+              threads_per_sample=None, run_qc=True, stream_trim=False):
+    """
+    Run every sample in a manifest through the pipeline.
+
+    Parameters:
+        manifest_file (str or Path): Sample manifest (see module docstring).
+        ref_url (str): Reference FASTA URL; prepared once under out_dir/ref.
+        out_dir (str or Path): Each sample is written to out_dir/<sample>.
+        limits (dict, optional): Stage → samples allowed in that stage at once.
+            Missing stages use DEFAULT_LIMITS.
+        threads_per_sample (int, optional): Threads for each sample's tools.
+            Defaults to the budget divided by the largest stage limit; memory
+            is divided by the total of the limits.
+        run_qc (bool): Run post-alignment QC.
+        stream_trim (bool): Trim in the alignment pipe instead of writing
+            trimmed FASTQs (see align_reads).
+
+    Returns:
+        list of Sample: with status, failed stage, error and stage timings.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    samples = read_manifest(manifest_file)
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+
+    budget = configure()
+    sample_budget = ResourceBudget(
+        threads=threads_per_sample or max(1, budget.threads // max(limits.values())),
+        memory_mb=max(1, budget.memory_mb // sum(limits.values())),
+    )
+    print(f"[batch] {len(samples)} samples, stage limits {limits}, "
+          f"{sample_budget.threads} threads / {sample_budget.memory_mb} MB per sample")
+
+    fa_path = cached_step("reference_genome", reference_genome, ref_url, base_dir=out_dir,
+                          tools=["bwa-mem2"])
+
+    gates = {stage: threading.BoundedSemaphore(max(1, limits[stage])) for stage in STAGES}
+    status = _StatusFile(out_dir / "batch_status.tsv", samples)
+    status.write()
+
+    # One worker per stage slot keeps every stage busy without letting
+    # downloads run arbitrarily far ahead of alignment.
+    workers = max(1, sum(limits.values()))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_sample, sample, fa_path, out_dir, gates, sample_budget,
+                               run_qc, stream_trim, status)
+                   for sample in samples]
+    # _run_sample records its own failures; anything raised past that
+    # (e.g. writing the status file) is a batch error, not a sample's
+    for future in futures:
+        future.result()
+
+    failed = [s for s in samples if s.status != "ok"]
+    print(f"\n[batch] {len(samples) - len(failed)}/{len(samples)} samples succeeded")
+    for s in failed:
+        print(f"[batch]   {s.name}: failed in {s.failed_stage}: {s.error}")
+    print(f"[batch] Status: {status.path}")
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a manifest of samples through the pipeline.")
+    parser.add_argument("manifest", help="TSV with sample, accession or read1/read2 columns")
+    parser.add_argument("--reference", required=True, help="Reference FASTA URL")
+    parser.add_argument("--out-dir", default=".")
+    for stage in STAGES:
+        parser.add_argument(f"--{stage}", type=int, default=DEFAULT_LIMITS[stage],
+                            help=f"Samples in the {stage} stage at once")
+    parser.add_argument("--threads-per-sample", type=int)
+    parser.add_argument("--no-qc", action="store_true", help="Skip post-alignment QC")
+    parser.add_argument("--stream-trim", action="store_true",
+                        help="Trim in the alignment pipe instead of writing trimmed FASTQs")
+    parser.add_argument("--scratch-dir", help="Directory for intermediates (fast local disk or tmpfs)")
+    parser.add_argument("--scratch-high-water", type=float,
+                        help="Hold new work while the scratch filesystem is fuller than this fraction")
+    args = parser.parse_args(argv)
+    configure_scratch(root=args.scratch_dir, high_water=args.scratch_high_water)
+
+    samples = run_batch(
+        args.manifest, args.reference, out_dir=args.out_dir,
+        limits={stage: getattr(args, stage) for stage in STAGES},
+        threads_per_sample=args.threads_per_sample,
+        run_qc=not args.no_qc,
+        stream_trim=args.stream_trim,
+    )
+    return 0 if all(s.status == "ok" for s in samples) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,66 +1,50 @@
-from pathlib import Path
-from sequence_acquisition import get_sequence
-from read_alignment import reference_genome
-from read_alignment import align_reads
-from quality_control import perform_qc
-from genomics.variants.callers import freebayes
-from genomics.variants.qc import validate
-from genomics.variants.qc import stats
-from genomics.variants.qc import count_variant_types
-from genomics.variants.qc import qual_distribution
-from genomics.variants.qc import qual_distribution
-
-from genomics.variants.filters import quality_and_depth
-from genomics.variants.filters import low_af_and_mq
-from genomics.variants.filters import strand_bias
-from genomics.variants.filters import max_depth_filter
-from genomics.variants.filters import strict_high_confidence
-from genomics.variants.filters import sample_coverage
-
-from genomics.variants.normalisation import normalize
-from genomics.variants.normalisation import index
-
-from genomics.variants.annotate import tidy_fields
-from genomics.variants.annotate import sort
-
-# READS
-base_dir = Path("yeast")
+"""
+Example end-to-end run for one yeast sample (SRR34533466).
 
+Run from the repository root as a module, so the genomics and omics
+packages are importable without installing:
 
-read_1,read_2 = get_sequence("SRR34533466",base_dir=base_dir)
+    python -m genomics.main
 
-# GENOME ALIGN
-ref_url = ("ftp://ftp.ensembl.org/pub/release-109/fasta/saccharomyces_cerevisiae/dna/Saccharomyces_cerevisiae.R64-1-1.dna.toplevel.fa.gz")
-fa_path = reference_genome(ref_url,base_dir=base_dir)
-final_bam = align_reads(fa_path,read_1,read_2,base_dir=base_dir)
-
-# QC
-#perform_qc(final_bam,fa_path)
-vcf_dir = base_dir / "vcf"
-output_vcf = vcf_dir / "variants_raw.vcf"
-v_qc_out = vcf_dir / "qc" / "variants"
-
-freebayes(final_bam, fa_path, output_vcf=output_vcf)
-# Filter by QUAL and INFO/DP 
-vcf1 = quality_and_depth(output_vcf)
-vcf2 = low_af_and_mq(vcf1,af_thresh=0.8)
-vcf3 = strand_bias(vcf2)
-norm_vcf = normalize(vcf3, fa_path)
-tidied_vcf = tidy_fields(norm_vcf)
-sorted_vcf = sort(tidied_vcf)
-index(sorted_vcf)
-final_vcf = sorted_vcf
-# Perform QC
-validate(final_vcf)
-stats(final_vcf, v_qc_out / "stats.txt")
-rv = count_variant_types(final_vcf, v_qc_out / "variant_type_count.txt")
-qual_distribution(final_vcf, v_qc_out / "qual_distribution.png")
-
-
-intermediate_files = [
-    vcf1, vcf2, vcf3, norm_vcf, tidied_vcf, sorted_vcf,
-    vcf1.with_suffix(".vcf.csi"), vcf1.with_suffix(".vcf.idx")
-]
-for f in intermediate_files:
-    if Path(f).exists():
-        Path(f).unlink()
\ No newline at end of file
+Once installed, `omics run` does the same for any accession or reads.
+"""
+from pathlib import Path
+from genomics.sequence_acquisition import get_sequence
+from genomics.read_alignment import reference_genome
+from genomics.read_alignment import align_reads
+from genomics.quality_control import perform_qc
+from genomics.variant_calling import call_variants
+
+from omics.resources import configure
+from omics.stepcache import cached_step
+
+# Worker processes (FASTQ QC) re-import this script, so the pipeline only
+# runs when it is executed directly.
+if __name__ == "__main__":
+    # Size threads/memory once for every tool wrapper
+    # (OMICS_THREADS / OMICS_MEMORY_MB / OMICS_RESOURCES override the machine defaults).
+    configure()
+
+    # READS
+    base_dir = Path("yeast")
+
+
+    # Each step goes through the step cache: a rerun only re-executes steps whose
+    # inputs, parameters or tool versions changed (omics cache list/evict).
+    # `omics run` does the same from the command line; for many samples use
+    # `omics batch` with a manifest instead.
+    read_1,read_2 = cached_step("get_sequence", get_sequence, "SRR34533466", base_dir=base_dir,
+                                tools=["prefetch", "fasterq-dump", "cutadapt"])
+
+    # GENOME ALIGN
+    ref_url = ("ftp://ftp.ensembl.org/pub/release-109/fasta/saccharomyces_cerevisiae/dna/Saccharomyces_cerevisiae.R64-1-1.dna.toplevel.fa.gz")
+    fa_path = cached_step("reference_genome", reference_genome, ref_url, base_dir=base_dir,
+                          tools=["bwa-mem2"])
+    final_bam = cached_step("align_reads", align_reads, fa_path, read_1, read_2, base_dir=base_dir,
+                            inputs=[fa_path, read_1, read_2], tools=["bwa-mem2", "samtools"])
+
+    # QC
+    #perform_qc(final_bam,fa_path)
+
+    # Call, filter and QC variants
+    final_vcf = call_variants(final_bam, fa_path, base_dir=base_dir)
@@ -1,9 +1,6 @@
 from pathlib import Path
-import sys
 import os
 
-sys.path.append("../")
-
 from qc.alignment import (
     flagstat_summary,
     alignment_summary,
@@ -12,26 +9,44 @@ from qc.alignment import (
     quality_depth,
     gc_bias,
     qualimap_bam,
-    coverage_depth_distribution
+    coverage_depth_distribution,
+    coverage_depth_from_summary
 )
+from omics.resources import get_budget
+from omics.taskgraph import Task, run_graph
 
-def perform_qc(bam_file, reference_fasta, base_dir=Path(".")):
+def perform_qc(bam_file, reference_fasta, base_dir=Path("."), per_base_depth=True,
+               coverage_window=None, coverage_bins=None):
     """
     Run post-alignment QC metrics on a BAM file using reference genome.
     All outputs are saved into a specified QC directory.
 
+    The tools only read the BAM, so they run concurrently within the
+    resource budget; the depth plot waits for mosdepth.
+
+    The depth histogram is built exactly from mosdepth's per-base BED.
+    per_base_depth=False skips that BED, one of the largest QC outputs, and
+    rebuilds the histogram from mosdepth's distribution file instead; its
+    bins are only resolved to about 1% of each contig (see
+    depth_histogram_from_dist), so median and breadth are approximate.
+
     Parameters:
         bam_file (str or Path): Path to deduplicated, coordinate-sorted BAM file.
         reference_fasta (str or Path): Path to reference FASTA used in alignment.
-        qc_dir (str or Path): Directory to write all QC output files. Defaults to 'qc/'.
+        base_dir (str or Path): QC output is written to base_dir/qc.
+        per_base_depth (bool): Write mosdepth's per-base BED and build the
+            exact depth histogram from it.
+        coverage_window (int, optional): mosdepth --by window size in bp, for
+            windowed means (regions.bed.gz) alongside the QC.
+        coverage_bins (str, optional): mosdepth --quantize bins, e.g.
+            '0:1:10:20:30:', for a quantized.bed.gz alongside the QC.
 
     Returns:
-        list of Path: All QC result file paths.
+        Path: The QC directory.
     """
-    qc_dir = base_dir / "qc"
+    qc_dir = Path(base_dir) / "qc"
     bam_file = Path(bam_file)
     reference_fasta = Path(reference_fasta)
-    qc_dir = Path(qc_dir)
     qc_dir.mkdir(exist_ok=True)
 
     print("\nRunning post-alignment QC...")
@@ -53,24 +68,49 @@ def perform_qc(bam_file, reference_fasta, base_dir=Path(".")):
     
     coverage_prefix = coverage_dir / bam_file.stem
     per_base_file = coverage_prefix.with_name(f"{coverage_prefix.name}.per-base.bed.gz")
-    depth_plot = coverage_dir / f"{bam_file.stem}_depth_hist.png"
+    dist_file = coverage_prefix.with_name(f"{coverage_prefix.name}.mosdepth.global.dist.txt")
+    summary_file = coverage_prefix.with_name(f"{coverage_prefix.name}.mosdepth.summary.txt")
+    depth_plot = qc_dir / f"{bam_file.stem}_depth_hist.png"
 
     insert_metrics = insert_dir / "insert_size_metrics.txt"
 
     stats_out = stats_dir / "samtools_stats.txt"
     gc_metrics = bias_dir / "gc_bias_metrics.txt"
 
-    flagstat_summary(bam_file, flagstat_out)
-    alignment_summary(reference_fasta, bam_file, align_metrics)
-    coverage_metrics(bam_file, prefix=coverage_prefix)
-    size_distribution(bam_file, output_filename=insert_metrics)
-    quality_depth(bam_file, stats_out)
-    gc_bias(bam_file, reference_fasta, gc_metrics)
-    qualimap_bam(bam_file, qualimap_dir)
+    # Per-tool shares of the budget. Picard tools are single-threaded JVMs.
+    budget = get_budget()
+    io_threads = max(1, budget.threads // 4)
+    qualimap_threads = max(1, budget.threads // 2)
+    jvm_mb = max(1024, min(4096, budget.memory_mb // 4))
+    qualimap_mb = max(1024, min(8192, budget.memory_mb // 2))
 
-    # Optional: depth plot
-    per_base_file = coverage_prefix.with_name(f"{coverage_prefix.name}.per-base.bed.gz")
-    depth_plot = qc_dir / f"{bam_file.stem}_depth_hist.png"
-    coverage_depth_distribution(per_base_file, depth_plot)
+    tasks = [
+        Task("flagstat", flagstat_summary, (bam_file, flagstat_out),
+             {"threads": io_threads}, threads=io_threads),
+        Task("alignment_summary", alignment_summary, (reference_fasta, bam_file, align_metrics),
+             {"memory_mb": jvm_mb}, memory_mb=jvm_mb),
+        Task("coverage", coverage_metrics, (bam_file,),
+             {"prefix": coverage_prefix, "threads": min(io_threads, 4),
+              "per_base": per_base_depth, "window": coverage_window,
+              "quantize": coverage_bins},
+             threads=min(io_threads, 4)),
+        Task("insert_size", size_distribution, (bam_file,),
+             {"output_filename": insert_metrics, "memory_mb": jvm_mb}, memory_mb=jvm_mb),
+        Task("samtools_stats", quality_depth, (bam_file, stats_out),
+             {"threads": io_threads}, threads=io_threads),
+        Task("gc_bias", gc_bias, (bam_file, reference_fasta, gc_metrics),
+             {"memory_mb": jvm_mb}, memory_mb=jvm_mb),
+        Task("qualimap", qualimap_bam, (bam_file, qualimap_dir),
+             {"threads": qualimap_threads, "memory_mb": qualimap_mb},
+             threads=qualimap_threads, memory_mb=qualimap_mb),
+    ]
+    # Depth plot: exact from the per-base BED, approximate from the summaries
+    if per_base_depth:
+        tasks.append(Task("depth_plot", coverage_depth_distribution,
+                          (per_base_file, depth_plot), deps=("coverage",)))
+    else:
+        tasks.append(Task("depth_plot", coverage_depth_from_summary,
+                          (dist_file, summary_file, depth_plot), deps=("coverage",)))
+    run_graph(tasks, budget)
 
     return qc_dir
@@ -1,39 +1,88 @@
 from pathlib import Path
-import sys
 import os
 
-sys.path.append("../")
-
-from downloader import download_reference_genome
-from alignment import alignment_index
-from utils import decompress_gzip
-from alignment import align_ends
-from converter import SAM_to_BAM
-from converter import sort_bam
-from converter import index_bam
-from converter import mark_duplicates
+from omics.downloader import download_reference_genome
+from omics.alignment import alignment_index
+from omics.bgzf import is_bgzf
+from omics.reference import is_prepared
+from omics.reference_registry import PIPELINE_INDEXES
+from omics.reference_registry import get_registry
+from omics.reference import prepare_reference
+from omics.alignment import align_ends
+from omics.alignment import align_sorted
+from omics.alignment import trim_align_sorted
+from omics.converter import SAM_to_BAM
+from omics.converter import sort_bam
+from omics.converter import index_bam
+from omics.converter import mark_duplicates
+from qc.alignment import multi_qc
+from omics.read_trim import cut_adapt
+from omics.scratch import intermediate
+from omics.scratch import wait_for_space
 
 
     
-def reference_genome(ref_url, base_dir=Path(".")):
-    """Download and prepare reference genome and annotation under base_dir/ref/."""
+def reference_genome(ref_url, base_dir=Path("."), use_registry=True):
+    """
+    Download and prepare reference genome and annotation.
+
+    The reference stays compressed (BGZF with .fai/.gzi); bwa-mem2, samtools,
+    bcftools and GATK read it directly. With use_registry the reference and
+    its indexes come from the machine-wide reference registry and are built
+    once per machine; otherwise they are kept under base_dir/ref/.
+    """
+    if use_registry:
+        return get_registry().reference(url=ref_url, indexes=PIPELINE_INDEXES)
+
     ref_dir = base_dir / "ref"
     
     ref_filename = os.path.basename(ref_url)
-    print(f"Downloading reference: {ref_filename}")
-    gz_path = download_reference_genome(ref_url, ref_filename, target_dir=ref_dir)
-    fa_path = decompress_gzip(gz_path)
+    fa_path = ref_dir / ref_filename
+    # The download is recompressed to BGZF in place; a BGZF file there is
+    # complete (downloads are renamed into place) and may no longer match
+    # the published checksum, so it is not fetched again.
+    if not is_prepared(fa_path):
+        if not (fa_path.exists() and is_bgzf(fa_path)):
+            print(f"Downloading reference: {ref_filename}")
+            download_reference_genome(ref_url, ref_filename, target_dir=ref_dir)
+        prepare_reference(fa_path)
     print(f"Indexing: {fa_path}")
     alignment_index(fa_path)
     return Path(fa_path)
 
-def align_reads(fa_path, read1, read2,base_dir=Path(".")):
-    sam_filename = base_dir/"aln.sam"
-    sam_file = align_ends(fa_path, read1, read2, sam_filename)
-    bam_file = SAM_to_BAM(sam_file)
-    sorted_bam_file = sort_bam(bam_file)
-    index_bam(sorted_bam_file)
-    dedup_bam = mark_duplicates(sorted_bam_file)
+def align_reads(fa_path, read1, read2,base_dir=Path("."), stream=True, trim=False):
+    """
+    Align paired reads, sort, index and mark duplicates.
+
+    With stream=True the aligner output is piped directly into a sorted,
+    indexed BAM. stream=False runs the step-by-step SAM → BAM → sort path.
+
+    trim=True adapter-trims raw reads here rather than in prepare_reads()
+    (call that with do_trimming=False). When streaming, cutadapt feeds the
+    aligner interleaved reads over the pipe, so no trimmed FASTQ is written;
+    its report goes to base_dir/qc and MultiQC is rerun to include it.
+    Everything before the deduplicated BAM is an intermediate: inside a
+    scratch session it is written to scratch and deleted once read.
+    """
+    wait_for_space(label="align_reads")
+    if trim and stream:
+        qc_dir = base_dir/"qc"
+        sorted_bam_file = trim_align_sorted(fa_path, read1, read2,
+                                            qc_dir/f"{Path(read1).name.split('.')[0]}_cutadapt.log",
+                                            intermediate(base_dir/"aln_sorted.bam"))
+        multi_qc(qc_dir)
+    elif stream:
+        sorted_bam_file = align_sorted(fa_path, read1, read2,
+                                       intermediate(base_dir/"aln_sorted.bam"))
+    else:
+        if trim:
+            read1, read2 = cut_adapt([Path(read1), Path(read2)], base_dir/"trimmed")
+        sam_filename = intermediate(base_dir/"aln.sam")
+        sam_file = align_ends(fa_path, read1, read2, sam_filename)
+        bam_file = SAM_to_BAM(sam_file)
+        sorted_bam_file = sort_bam(bam_file)
+        index_bam(sorted_bam_file)
+    dedup_bam = mark_duplicates(sorted_bam_file, output_bam=base_dir/"aln_sorted_dedup.bam")
     return dedup_bam
 
 
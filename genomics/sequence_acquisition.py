@@ -1,13 +1,10 @@
 from pathlib import Path
-import sys
 
-sys.path.append("../")
-
-from downloader import download_sra
-from downloader import sra_metadata
-from qc.alignment import fast_qc
+from omics.downloader import download_sra
+from omics.downloader import sra_metadata
 from qc.alignment import multi_qc
-from read_trim import cut_adapt
+from qc.fastq_stats import fastq_qc
+from omics.read_trim import cut_adapt
 
 
 RAW_DIR = Path("raw")
@@ -26,22 +23,42 @@ def get_sequence(identifier, base_dir=Path("."), do_trimming=True):
     print(f"\nStarting processing for: {identifier}")
     
     raw_dir = base_dir / RAW_DIR
-    trimmed_dir = base_dir / TRIMMED_DIR
-    qc_dir = base_dir / QC_DIR
 
     download_sra(identifier, raw_dir)
     raw_fastqs = detect_fastq_files(identifier, raw_dir)
 
-    fast_qc(raw_fastqs, qc_dir)
+    return prepare_reads(raw_fastqs, base_dir, do_trimming)
+
+
+def get_local_sequence(reads, base_dir=Path("."), do_trimming=True):
+    """Sequence acquisition for FASTQ files already on disk."""
+    reads = [Path(r) for r in reads]
+    missing = [str(r) for r in reads if not r.exists()]
+    if missing:
+        raise FileNotFoundError(f"FASTQ files not found: {', '.join(missing)}")
+    print(f"\nStarting processing for: {', '.join(r.name for r in reads)}")
+
+    return prepare_reads(reads, base_dir, do_trimming)
+
+
+def prepare_reads(raw_fastqs, base_dir=Path("."), do_trimming=True):
+    """
+    Read QC, optional adapter trimming and MultiQC; returns the reads to align.
+
+    Read QC runs in-process (qc.fastq_stats), one process per file, and
+    writes FastQC-format reports; OMICS_FASTQ_QC=fastqc runs FastQC instead.
+    """
+    trimmed_dir = base_dir / TRIMMED_DIR
+    qc_dir = base_dir / QC_DIR
+
+    fastq_qc(raw_fastqs, qc_dir)
 
     if do_trimming:
         trimmed_fastqs = cut_adapt(raw_fastqs, trimmed_dir)
-        fast_qc(trimmed_fastqs, qc_dir)
+        fastq_qc(trimmed_fastqs, qc_dir)
 
     multi_qc(qc_dir)
     
     if do_trimming:
         return trimmed_fastqs
     return raw_fastqs
-    
-
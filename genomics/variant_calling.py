@@ -0,0 +1,81 @@
+from pathlib import Path
+
+from genomics.variants.callers import freebayes
+from genomics.variants.qc import validate
+from genomics.variants.qc import stats
+from genomics.variants.qc import count_variant_types
+from genomics.variants.qc import qual_distribution
+from genomics.variants.qc import variant_metrics
+
+from genomics.variants.filters import FilterPipeline
+from genomics.variants.filters import quality_and_depth_stage
+from genomics.variants.filters import low_af_and_mq_stage
+from genomics.variants.filters import strand_bias_stage
+
+from genomics.variants.normalisation import normalize_stage
+
+from genomics.variants.annotate import tidy_fields_stage
+from genomics.variants.annotate import sort_stage
+
+from omics.resources import get_budget
+from omics.stepcache import cached_step
+
+
+def call_variants(bam_file, fa_path, base_dir=Path("."), shards=None, parquet=False):
+    """
+    Call, filter and QC variants for one sample under base_dir/vcf/.
+
+    Each step goes through the step cache, so a rerun only re-executes
+    steps whose inputs, parameters or tool versions changed.
+
+    Parameters:
+        bam_file (str or Path): Deduplicated, coordinate-sorted BAM file.
+        fa_path (str or Path): Reference FASTA used for alignment.
+        base_dir (str or Path): Sample output directory.
+        shards (int, optional): FreeBayes shards. Defaults to one per budget thread.
+        parquet (bool): Also export the final VCF to Parquet, partitioned by
+            contig (needs pyarrow).
+
+    Returns:
+        Path: The final bgzipped, indexed VCF.
+    """
+    base_dir = Path(base_dir)
+    vcf_dir = base_dir / "vcf"
+    output_vcf = vcf_dir / "variants_raw.bcf"
+    v_qc_out = vcf_dir / "qc" / "variants"
+
+    # FreeBayes is single-threaded: scatter it over balanced regions, one per core
+    cached_step("freebayes", freebayes, bam_file, fa_path, output_vcf=output_vcf,
+                shards=shards or get_budget().threads,
+                inputs=[bam_file, fa_path], tools=["freebayes"])
+    # Filter by QUAL and INFO/DP, label low AF/MQ and strand bias, normalise and
+    # sort as one bcftools pipe; only the final bgzipped, indexed VCF is written.
+    filter_pipeline = (
+        FilterPipeline(output_vcf)
+        .add(quality_and_depth_stage(input_vcf=output_vcf))
+        .add(low_af_and_mq_stage(output_vcf, af_thresh=0.8))
+        .add(strand_bias_stage(output_vcf))
+        .add(normalize_stage(fa_path))
+        .add(tidy_fields_stage())
+        .add(sort_stage())
+    )
+    final_vcf = cached_step("filter_pipeline", filter_pipeline.run, vcf_dir / "variants_final.vcf.gz",
+                            inputs=[output_vcf, fa_path],
+                            params={"stages": filter_pipeline.stages}, tools=["bcftools"])
+    # Perform QC
+    validate(final_vcf)
+    cached_step("stats", stats, final_vcf, v_qc_out / "stats.txt",
+                inputs=[final_vcf], tools=["bcftools"])
+    # Returns the counts; the file it writes is declared so a hit checks it
+    cached_step("count_variant_types", count_variant_types, final_vcf,
+                v_qc_out / "variant_type_count.txt", inputs=[final_vcf],
+                outputs=[v_qc_out / "variant_type_count.txt"])
+    cached_step("qual_distribution", qual_distribution, final_vcf, v_qc_out / "qual_distribution.png",
+                inputs=[final_vcf])
+    cached_step("variant_metrics", variant_metrics, final_vcf, v_qc_out / "variant_metrics.json",
+                inputs=[final_vcf])
+    if parquet:
+        from genomics.variants.export import export_parquet  # pyarrow/pandas only when asked for
+        cached_step("export_parquet", export_parquet, final_vcf, vcf_dir / "variants_final.parquet",
+                    inputs=[final_vcf])
+    return final_vcf
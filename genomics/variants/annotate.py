@@ -1,7 +1,12 @@
-import subprocess
 from pathlib import Path
 
-def assign_rsid(input_vcf, dbsnp_vcf, output_vcf=None):
+from omics.telemetry import run
+from genomics.variants.formats import derived_path
+from genomics.variants.formats import output_args
+from genomics.variants.formats import sort_run_args
+from genomics.variants.formats import threads_args
+
+def assign_rsid(input_vcf, dbsnp_vcf, output_vcf=None, threads=None):
     """
     Annotates VCF records with rsIDs from a known dbSNP-style reference.
 
@@ -9,30 +14,45 @@ def assign_rsid(input_vcf, dbsnp_vcf, output_vcf=None):
         input_vcf (str or Path): Path to the normalized input VCF (e.g., variants_norm.vcf.gz)
         dbsnp_vcf (str or Path): Path to a VCF file with known variant IDs (e.g., dbSNP or Ensembl VCF)
         output_vcf (str or Path, optional): Output path for the annotated VCF.
-                                            If None, a default name is generated.
+                                            If None, '<stem>_rsid.vcf.gz' (bgzipped, indexed).
+        threads (int, optional): bcftools threads. Defaults to the resource budget.
     """
     input_vcf = Path(input_vcf)
     dbsnp_vcf = Path(dbsnp_vcf)
 
     if output_vcf is None:
-        output_vcf = input_vcf.with_name(input_vcf.stem + "_rsid.vcf")
+        output_vcf = derived_path(input_vcf, "_rsid", final=True)
     else:
         output_vcf = Path(output_vcf)
 
     print(f"[assign_rsid] Annotating with rsIDs using: {dbsnp_vcf}")
     
-    subprocess.run([
+    run([
         "bcftools", "annotate",
+        *threads_args(threads),
         "-a", str(dbsnp_vcf),
         "-c", "ID",
-        "-o", str(output_vcf),
-        "-O", "v",
+        *output_args(output_vcf, final=True),
         str(input_vcf)
     ], check=True)
 
     return output_vcf
 
-def tidy_fields(input_vcf, fields_to_remove=None, output_vcf=None):
+def tidy_fields_stage(fields_to_remove=None):
+    """
+    Build the bcftools annotate --remove command for use as a FilterPipeline
+    stage. Returns None when there is nothing to remove.
+    """
+    if not fields_to_remove:
+        print("[tidy_vcf_fields] No fields specified for removal. Skipping.")
+        return None
+
+    remove_arg = ",".join(fields_to_remove)
+    print(f"[tidy_vcf_fields] Removing fields: {remove_arg}")
+    return ["bcftools", "annotate", "--remove", remove_arg]
+
+
+def tidy_fields(input_vcf, fields_to_remove=None, output_vcf=None, threads=None):
     """
     Removes specified INFO and FORMAT fields from a VCF file using bcftools annotate.
 
@@ -40,62 +60,75 @@ def tidy_fields(input_vcf, fields_to_remove=None, output_vcf=None):
         input_vcf (str or Path): Path to the VCF file to clean (e.g., variants_validated.vcf)
         fields_to_remove (list of str): List of field names to remove (e.g., ["INFO/OLD_TAG", "FORMAT/UNUSED_TAG"])
         output_vcf (str or Path, optional): Output path for the cleaned VCF.
-                                            If None, appends '_tidy.vcf' to input filename.
+                                            If None, '<stem>_tidy.bcf' (uncompressed BCF).
+        threads (int, optional): bcftools threads. Defaults to the resource budget.
 
     Returns:
         Path to the cleaned VCF file
     """
     input_vcf = Path(input_vcf)
     fields_to_remove = fields_to_remove or []
-    output_vcf = Path(output_vcf) if output_vcf else input_vcf.with_name(input_vcf.stem + "_tidy.vcf")
+    output_vcf = Path(output_vcf) if output_vcf else derived_path(input_vcf, "_tidy")
 
-    if not fields_to_remove:
-        print("[tidy_vcf_fields] No fields specified for removal. Skipping.")
+    stage = tidy_fields_stage(fields_to_remove)
+    if stage is None:
         return input_vcf
 
-    remove_arg = ",".join(fields_to_remove)
-    print(f"[tidy_vcf_fields] Removing fields: {remove_arg}")
-
-    subprocess.run([
-        "bcftools", "annotate",
-        "--remove", remove_arg,
-        "-o", str(output_vcf),
-        "-O", "v",
+    run([
+        *stage,
+        *threads_args(threads),
+        *output_args(output_vcf),
         str(input_vcf)
     ], check=True)
 
     return output_vcf
 
 
+def sort_stage(temp_dir=None):
+    """
+    Build the bcftools sort command for use as a FilterPipeline stage.
+
+    Parameters:
+        temp_dir (str or Path, optional): Directory for sort spill files.
+            Without one, the scratch session's directory is used when the
+            stage runs (see sort_run_args), else bcftools' own default.
+
+    The memory limit (-m) is likewise added at run time from the resource
+    budget, so the stage, and a cache key built from it, does not depend on
+    the machine or the batch scope it was built in.
+    """
+    cmd = ["bcftools", "sort"]
+    if temp_dir:
+        cmd += ["-T", str(temp_dir)]
+    return cmd
+
+
 def sort(input_vcf, output_vcf=None):
     """
-    Sorts a VCF by chromosomal position, compresses with bgzip, and indexes it with tabix.
+    Sorts a VCF by chromosomal position, compresses it and writes a CSI index.
 
     Parameters:
-        input_vcf (str or Path): Path to the input VCF (.vcf or .vcf.gz)
-        output_vcf (str or Path, optional): Output path for the sorted/compressed VCF (.vcf.gz).
-                                            If None, generates '<stem>_final.vcf.gz'
+        input_vcf (str or Path): Path to the input VCF (.vcf, .vcf.gz or .bcf)
+        output_vcf (str or Path, optional): Output path for the sorted/compressed VCF
+                                            (.vcf.gz, or .bcf for compressed BCF).
+                                            If None, generates '<stem>_sorted.vcf.gz'
 
     Returns:
         Path to the compressed and indexed VCF file
     """
     input_vcf = Path(input_vcf)
     if output_vcf is None:
-        base = input_vcf
-        if base.suffix == ".gz" and base.with_suffix("").suffix == ".vcf":
-            base = base.with_suffix("")  # Remove .gz
-            base = base.with_suffix("")  # Remove .vcf
-        else:
-            base = base.with_suffix("")  # Remove single suffix
-        output_vcf = base.with_name(base.name + "_sorted.vcf.gz")
-    
+        output_vcf = derived_path(input_vcf, "_sorted", final=True)
+    output_vcf = Path(output_vcf)
+
     print(f"[sort_and_index_vcf] Sorting and compressing: {input_vcf.name} → {output_vcf.name}")
 
-    subprocess.run([
-        "bcftools", "sort",
+    cmd = sort_stage()
+    run([
+        *cmd,
+        *sort_run_args(cmd),
         str(input_vcf),
-        "-Oz",
-        "-o", str(output_vcf)
+        *output_args(output_vcf, final=True),
     ], check=True)
 
     return output_vcf
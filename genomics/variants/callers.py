@@ -1,23 +1,53 @@
-import subprocess
 from pathlib import Path
 from typing import List
 
+from omics.telemetry import run
+from omics.reference import plain_fasta
+from omics.resources import threads as resolve_threads
+from omics.resources import java_heap_mb
+from omics.resources import PIPE_SORT_MEMORY_FRACTION
+from omics.resources import sort_memory
+from omics.scratch import intermediate
+from omics.scratch import release
+from omics.scratch import temp_prefix
+from omics.taskgraph import Task, run_graph
+from omics.utils import run_pipeline
+from genomics.variants.formats import output_args
+from genomics.variants.formats import output_type
+from genomics.variants.formats import threads_args
+from genomics.variants.formats import vcf_stem
+from genomics.variants.regions import balanced_regions
+from genomics.variants.regions import contig_read_counts
+from genomics.variants.regions import n_gap_free_regions
+from genomics.variants.regions import read_fai
+from genomics.variants.regions import reference_contigs
+from genomics.variants.regions import write_bed
+
 
 def freebayes(bam_path, reference_fasta, 
-              output_vcf, extra_args=None):
+              output_vcf, extra_args=None, shards=1, weight_by_reads=True):
     """
     Run FreeBayes to call variants from a BAM file.
 
     Parameters:
     - bam_path (str or Path): Path to the deduplicated, sorted BAM file
     - reference_fasta (str or Path): Path to the reference genome in FASTA format
-    - output_vcf (str or Path): Output path for the raw VCF file
+    - output_vcf (str or Path): Output path for the raw calls; a .bcf or .vcf.gz
+      path has FreeBayes' text output converted by bcftools view on the fly
     - extra_args (list): Optional list of additional arguments to pass to FreeBayes
+    - shards (int): If > 1, split the genome into this many balanced regions,
+      call them concurrently within the resource budget and merge the results
+    - weight_by_reads (bool): Balance shards by BAM index read counts rather than bases
     """
     bam_path = str(bam_path)
-    reference_fasta = str(reference_fasta)
+    # FreeBayes cannot read a compressed reference
+    reference_fasta = str(plain_fasta(reference_fasta))
     output_vcf = Path(output_vcf)
 
+    if shards and shards > 1:
+        return _freebayes_sharded(bam_path, reference_fasta, output_vcf,
+                                  extra_args, shards, weight_by_reads)
+
     cmd = [
         "freebayes",
         "-f", reference_fasta,
@@ -27,22 +57,124 @@ def freebayes(bam_path, reference_fasta,
         cmd.extend(extra_args)
     
     output_vcf.parent.mkdir(exist_ok=True)
-    with output_vcf.open("w") as out_vcf:
-        subprocess.run(cmd, stdout=out_vcf, check=True)
+    if output_type(output_vcf) == "v":
+        with output_vcf.open("w") as out_vcf:
+            run(cmd, stdout=out_vcf, check=True)
+    else:
+        run_pipeline([cmd, ["bcftools", "view", *threads_args(), *output_args(output_vcf), "-"]])
+    return output_vcf
+
+
+def _freebayes_sharded(bam_path, reference_fasta, output_vcf, extra_args, shards,
+                       weight_by_reads):
+    """Scatter FreeBayes over balanced regions, then concatenate, sort and deduplicate."""
+    shard_dir = intermediate(output_vcf.with_name(vcf_stem(output_vcf) + "_shards"))
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    read_counts = contig_read_counts(bam_path) if weight_by_reads else None
+    shard_regions = balanced_regions(read_fai(reference_fasta), shards, read_counts)
+    print(f"[freebayes] Calling {len(shard_regions)} shards → {output_vcf}")
+
+    tasks, shard_vcfs = [], []
+    for i, regions in enumerate(shard_regions):
+        shard_vcf = shard_dir / f"shard_{i:04d}.bcf"
+        if len(regions) == 1:
+            region_args = ["--region", regions[0].bed()]
+        else:
+            bed = write_bed(regions, shard_dir / f"shard_{i:04d}.bed")
+            region_args = ["--targets", str(bed)]
+        tasks.append(Task(f"freebayes_{i:04d}", freebayes,
+                          (bam_path, reference_fasta, shard_vcf),
+                          {"extra_args": region_args + list(extra_args or [])}))
+        shard_vcfs.append(shard_vcf)
+    run_graph(tasks)
+
+    # Shards are in reference order; sort + exact dedup handles records that
+    # straddle a shard boundary and were reported by both neighbours.
+    print(f"[freebayes] Merging {len(shard_vcfs)} shards")
+    run_pipeline([
+        ["bcftools", "concat", "--threads", str(resolve_threads()), "-O", "u",
+         *[str(v) for v in shard_vcfs]],
+        ["bcftools", "sort", "-m", sort_memory(1, PIPE_SORT_MEMORY_FRACTION), "-T",
+         temp_prefix("bcftools_sort", default=shard_dir / "sort."), "-O", "u", "-"],
+        ["bcftools", "norm", "-d", "exact", *threads_args(), *output_args(output_vcf), "-"],
+    ])
+
+    release(shard_dir)
+    return output_vcf
 
 
 def haplotype_caller(bam_path: str, reference_fasta: str, 
-                     output_gvcf: str):
+                     output_gvcf: str, threads: int = None,
+                     memory_mb: int = None, intervals: str = None,
+                     shards: int = 1, shard_memory_mb: int = 4096,
+                     shard_threads: int = 2, split_at_gaps: bool = False):
     """
     Generate a gVCF file for a single sample using GATK HaplotypeCaller.
+
+    With shards > 1 the genome is split into interval shards (from the
+    sequence dictionary or .fai, optionally only between N-gaps), each shard
+    runs in its own JVM with shard_memory_mb of heap and shard_threads
+    pair-HMM threads, concurrently within the resource budget, and the shard
+    gVCFs are gathered into one indexed gVCF.
     """
-    subprocess.run([
-        "gatk", "HaplotypeCaller",
-        "-R", reference_fasta,
-        "-I", bam_path,
-        "-O", output_gvcf,
+    if shards and shards > 1:
+        return _haplotype_caller_sharded(bam_path, reference_fasta, output_gvcf, shards,
+                                         shard_memory_mb, shard_threads, split_at_gaps)
+
+    cmd = [
+        "gatk", "--java-options", f"-Xmx{java_heap_mb(memory_mb)}m",
+        "HaplotypeCaller",
+        "--native-pair-hmm-threads", str(resolve_threads(threads)),
+        "-R", str(reference_fasta),
+        "-I", str(bam_path),
+        "-O", str(output_gvcf),
         "-ERC", "GVCF"
-    ], check=True)
+    ]
+    if intervals:
+        cmd += ["-L", str(intervals)]
+    run(cmd, check=True)
+    return output_gvcf
+
+
+def _haplotype_caller_sharded(bam_path, reference_fasta, output_gvcf, shards,
+                              shard_memory_mb, shard_threads, split_at_gaps):
+    """Scatter HaplotypeCaller over interval shards and gather the gVCFs in order."""
+    output_gvcf = Path(output_gvcf)
+    shard_dir = intermediate(output_gvcf.with_name(output_gvcf.name.split(".")[0] + "_shards"))
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    if split_at_gaps:
+        spans = n_gap_free_regions(reference_fasta)
+    else:
+        spans = reference_contigs(reference_fasta)
+    shard_regions = balanced_regions(spans, shards)
+    print(f"[haplotype_caller] Calling {len(shard_regions)} interval shards → {output_gvcf}")
+
+    # The JVM needs headroom above its heap
+    task_memory = int(shard_memory_mb / 0.85)
+    tasks, shard_gvcfs = [], []
+    for i, regions in enumerate(shard_regions):
+        bed = write_bed(regions, shard_dir / f"shard_{i:04d}.bed")
+        shard_gvcf = shard_dir / f"shard_{i:04d}.g.vcf.gz"
+        tasks.append(Task(f"haplotype_caller_{i:04d}", haplotype_caller,
+                          (bam_path, reference_fasta, shard_gvcf),
+                          {"threads": shard_threads, "memory_mb": task_memory,
+                           "intervals": bed},
+                          threads=shard_threads, memory_mb=task_memory))
+        shard_gvcfs.append(shard_gvcf)
+    run_graph(tasks)
+
+    print(f"[haplotype_caller] Gathering {len(shard_gvcfs)} shard gVCFs")
+    cmd = ["gatk", "--java-options", f"-Xmx{java_heap_mb(task_memory)}m", "GatherVcfs"]
+    for gvcf in shard_gvcfs:
+        cmd += ["-I", str(gvcf)]
+    cmd += ["-O", str(output_gvcf)]
+    run(cmd, check=True)
+    run(["gatk", "IndexFeatureFile", "-I", str(output_gvcf)], check=True)
+
+    release(shard_dir)
+    return output_gvcf
 
 
 def combine_gvcfs(reference_fasta: str, gvcf_paths: List[str], 
@@ -51,27 +183,29 @@ def combine_gvcfs(reference_fasta: str, gvcf_paths: List[str],
     Combine multiple gVCFs into a single gVCF (for ≤50 samples).
     """
     cmd = [
-        "gatk", "CombineGVCFs",
+        "gatk", "--java-options", f"-Xmx{java_heap_mb()}m",
+        "CombineGVCFs",
         "-R", reference_fasta,
     ]
     for path in gvcf_paths:
         cmd += ["--variant", path]
     cmd += ["-O", output_path]
-    subprocess.run(cmd, check=True)
+    run(cmd, check=True)
 
 
 def import_gvcfs_to_db(samples_list_file: str, 
                        intervals_file: str, db_path: str, 
-                       threads: int = 4):
+                       threads: int = None):
     """
     Import gVCFs into a GenomicsDB for joint genotyping in large cohorts.
     """
-    subprocess.run([
-        "gatk", "GenomicsDBImport",
+    run([
+        "gatk", "--java-options", f"-Xmx{java_heap_mb()}m",
+        "GenomicsDBImport",
         "--genomicsdb-workspace-path", db_path,
         "--sample-name-map", samples_list_file,
         "--L", intervals_file,
-        "--reader-threads", str(threads)
+        "--reader-threads", str(resolve_threads(threads))
     ], check=True)
 
 
@@ -81,29 +215,32 @@ def genotype_gvcfs(reference_fasta: str, input_vcf_or_db: str,
     Perform joint genotyping on combined gVCF or a GenomicsDBImport database.
     """
     input_path = f"gendb://{input_vcf_or_db}" if is_db else input_vcf_or_db
-    subprocess.run([
-        "gatk", "GenotypeGVCFs",
+    run([
+        "gatk", "--java-options", f"-Xmx{java_heap_mb()}m",
+        "GenotypeGVCFs",
         "-R", reference_fasta,
         "-V", input_path,
         "-O", output_vcf
     ], check=True)
 
 
-def run_manta(bam_file, reference_fa, output_dir="manta_sv"):
+def run_manta(bam_file, reference_fa, output_dir="manta_sv", threads=None,
+              memory_mb=None):
     """Configure and run Manta structural variant caller."""
     output_dir = Path(output_dir)
     
-    subprocess.run([
+    run([
         "configManta.py",
         "--bam", str(bam_file),
         "--referenceFasta", str(reference_fa),
         "--runDir", str(output_dir)
     ], check=True)
 
-    subprocess.run([
+    run([
         str(output_dir / "runWorkflow.py"),
         "-m", "local",
-        "-j", "4"
+        "-j", str(resolve_threads(threads)),
+        "-g", str(max(1, java_heap_mb(memory_mb) // 1024))
     ], check=True)
 
     return output_dir / "results" / "variants" / "diploidSV.vcf.gz"
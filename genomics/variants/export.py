@@ -0,0 +1,314 @@
+"""
+Columnar export of a VCF to Parquet, partitioned by contig.
+
+export_parquet() streams a .vcf/.vcf.gz in chunks through pandas' C parser,
+converts each chunk to an Arrow table with INFO and FORMAT columns typed
+from the header (read_header) and appends it to one Parquet file per
+contig, in a Hive-style layout:
+
+    <out_dir>/chrom=chr1/part-0000.parquet
+    <out_dir>/chrom=chr2/part-0000.parquet
+
+Each write becomes its own row group with min/max statistics. In a sorted
+VCF the positions in a row group form a narrow range, so a region query on
+`pos` only reads the matching row groups and query_parquet() (or any
+Parquet engine) can skip the rest. Memory is bounded by the chunk size and
+the number of open writers, not the VCF size.
+
+Columns:
+    pos (int64), id (string), ref (string), alt (list<string>),
+    qual (float32), filter (list<string>),
+    info_<ID> for each header INFO field: Integer → int32, Float → float32,
+        String/Character → string, Flag → bool; Number other than 0/1 → list,
+    sample_<name> per sample: a struct with one typed child per FORMAT field.
+The 'chrom' column comes from the partition directory.
+
+pyarrow is an optional dependency, needed only here.
+"""
+import csv
+import os
+import re
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from omics.telemetry import stage
+from genomics.variants.header import read_header
+from genomics.variants.scan import _header_lines
+
+CHUNK_RECORDS = 100_000
+MAX_OPEN_WRITERS = 16
+BASE_COLUMNS = ["chrom", "pos", "id", "ref", "alt", "qual", "filter", "info"]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError as err:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from err
+    return pyarrow
+
+
+def _arrow_type(pa, definition):
+    """Arrow type of an INFO/FORMAT definition."""
+    value_type = {
+        "Integer": pa.int32(),
+        "Float": pa.float32(),
+        "Flag": pa.bool_(),
+    }.get(definition.type, pa.string())
+    if definition.type == "Flag" or definition.number == "0":
+        return pa.bool_()
+    if definition.number == "1" or definition.id == "GT":
+        return value_type
+    return pa.list_(value_type)
+
+
+def schema_for(header):
+    """Arrow schema of the exported files (without the 'chrom' partition column)."""
+    pa = _pyarrow()
+    fields = [
+        pa.field("pos", pa.int64()),
+        pa.field("id", pa.string()),
+        pa.field("ref", pa.string()),
+        pa.field("alt", pa.list_(pa.string())),
+        pa.field("qual", pa.float32()),
+        pa.field("filter", pa.list_(pa.string())),
+    ]
+    fields += [pa.field(f"info_{d.id}", _arrow_type(pa, d)) for d in header.info.values()]
+    if header.samples:
+        sample_type = pa.struct([pa.field(d.id, _arrow_type(pa, d))
+                                 for d in header.format.values()])
+        fields += [pa.field(f"sample_{s}", sample_type) for s in header.samples]
+    return pa.schema(fields)
+
+
+def _missing_to_null(pa, strings):
+    pc = pa.compute
+    return pc.if_else(pc.equal(strings, "."), pa.scalar(None, pa.string()), strings)
+
+
+def _cast(pa, strings, arrow_type):
+    """Cast strings to a numeric type; values that do not parse become null."""
+    if arrow_type == pa.string():
+        return strings
+    try:
+        return strings.cast(arrow_type)
+    except pa.ArrowInvalid:
+        numbers = pd.to_numeric(strings.to_pandas(), errors="coerce")
+        return pa.array(numbers, from_pandas=True).cast(arrow_type, safe=False)
+
+
+def _typed(pa, strings, arrow_type):
+    """Typed array from VCF text values ('.' is missing; lists are comma-separated)."""
+    pc = pa.compute
+    if pa.types.is_list(arrow_type):
+        lists = pc.split_pattern(_missing_to_null(pa, strings), ",")
+        values = _missing_to_null(pa, pc.list_flatten(lists))
+        values = _cast(pa, values, arrow_type.value_type)
+        return pa.ListArray.from_arrays(lists.offsets, values, type=arrow_type,
+                                        mask=lists.is_null())
+    return _cast(pa, _missing_to_null(pa, strings), arrow_type)
+
+
+def _info_column(pa, info, definition, arrow_type):
+    pc = pa.compute
+    key = re.escape(definition.id)
+    if arrow_type == pa.bool_():
+        return pc.match_substring_regex(info, rf"(?:^|;){key}(?:;|$)")
+    values = pc.extract_regex(info, rf"(?:^|;){key}=(?P<v>[^;]*)").flatten()[0]
+    return _typed(pa, values, arrow_type)
+
+
+def _sample_column(pa, fmt, sample, sample_type):
+    """Struct column of one sample's FORMAT values; rows may use different FORMAT keys."""
+    n = len(sample)
+    values = {f.name: np.full(n, None, dtype=object) for f in sample_type}
+    for keys, rows in fmt.groupby(fmt, sort=False).indices.items():
+        parts = sample.iloc[rows].str.split(":", expand=True)
+        for i, key in enumerate(keys.split(":")):
+            if key in values and i < parts.shape[1]:
+                values[key][rows] = parts[i].to_numpy(dtype=object)
+
+    children = [_typed(pa, pa.array(values[f.name], type=pa.string()), f.type)
+                for f in sample_type]
+    return pa.StructArray.from_arrays(children, fields=list(sample_type))
+
+
+def _chunk_table(pa, chunk, header, schema):
+    """Arrow table of one parsed chunk (all columns as strings)."""
+    pc = pa.compute
+    columns = {
+        "pos": pa.array(chunk["pos"].astype(np.int64).to_numpy()),
+        "id": _missing_to_null(pa, pa.array(chunk["id"], type=pa.string())),
+        "ref": pa.array(chunk["ref"], type=pa.string()),
+        "alt": _typed(pa, pa.array(chunk["alt"], type=pa.string()), pa.list_(pa.string())),
+        "qual": _typed(pa, pa.array(chunk["qual"], type=pa.string()), pa.float32()),
+        "filter": pc.split_pattern(
+            _missing_to_null(pa, pa.array(chunk["filter"], type=pa.string())), ";"),
+    }
+    info = pa.array(chunk["info"], type=pa.string())
+    for definition in header.info.values():
+        name = f"info_{definition.id}"
+        columns[name] = _info_column(pa, info, definition, schema.field(name).type)
+    for s in header.samples:
+        name = f"sample_{s}"
+        columns[name] = _sample_column(pa, chunk["format"], chunk[name],
+                                       schema.field(name).type)
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+class _PartitionWriters:
+    """
+    One ParquetWriter per contig partition, at most max_open at a time.
+    A contig that comes back after its writer was closed (unsorted input)
+    continues in a new part file.
+    """
+
+    def __init__(self, pa, out_dir, schema, max_open, compression):
+        self.pa = pa
+        self.out_dir = out_dir
+        self.schema = schema
+        self.max_open = max_open
+        self.compression = compression
+        self.open = OrderedDict()
+        self.parts = {}
+
+    def get(self, contig):
+        if contig in self.open:
+            self.open.move_to_end(contig)
+            return self.open[contig]
+        if len(self.open) >= self.max_open:
+            _, oldest = self.open.popitem(last=False)
+            oldest.close()
+        part = self.parts.get(contig, 0)
+        self.parts[contig] = part + 1
+        partition = self.out_dir / f"chrom={quote(contig, safe='')}"
+        partition.mkdir(parents=True, exist_ok=True)
+        writer = self.pa.parquet.ParquetWriter(partition / f"part-{part:04d}.parquet",
+                                               self.schema, compression=self.compression)
+        self.open[contig] = writer
+        return writer
+
+    def close(self):
+        for writer in self.open.values():
+            writer.close()
+        self.open.clear()
+
+
+@stage("export_parquet")
+def export_parquet(vcf_file, out_dir=None, chunk_records=CHUNK_RECORDS,
+                   max_open_writers=MAX_OPEN_WRITERS, compression="zstd"):
+    """
+    Export a VCF to Parquet partitioned by contig, in bounded memory.
+
+    Parameters:
+        vcf_file (str or Path): Input .vcf or .vcf.gz (text VCF).
+        out_dir (str or Path, optional): Dataset directory. Defaults to the
+            VCF path with '.parquet' in place of '.vcf(.gz)'. Replaced as a
+            whole once the export is complete.
+        chunk_records (int): Records per chunk; each chunk becomes one row
+            group per contig it contains.
+        max_open_writers (int): Contig files open at once.
+        compression (str): Parquet compression codec.
+
+    Returns:
+        Path: The dataset directory.
+    """
+    pa = _pyarrow()
+    vcf_file = Path(vcf_file)
+    if out_dir is None:
+        name = vcf_file.name
+        for suffix in (".gz", ".vcf"):
+            name = name[:-len(suffix)] if name.endswith(suffix) else name
+        out_dir = vcf_file.with_name(name + ".parquet")
+    out_dir = Path(out_dir)
+
+    header = read_header(vcf_file)
+    schema = schema_for(header)
+    names = BASE_COLUMNS + (["format"] + [f"sample_{s}" for s in header.samples]
+                            if header.samples else [])
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    writers = _PartitionWriters(pa, tmp_dir, schema, max_open_writers, compression)
+    print(f"[export_parquet] {vcf_file.name} → {out_dir}")
+
+    reader = pd.read_csv(
+        vcf_file,
+        sep="\t",
+        header=None,
+        names=names,
+        usecols=range(len(names)),
+        skiprows=_header_lines(vcf_file),
+        dtype=str,
+        keep_default_na=False,
+        quoting=csv.QUOTE_NONE,
+        compression="gzip" if vcf_file.suffix == ".gz" else None,
+        chunksize=chunk_records,
+    )
+    records = 0
+    try:
+        with reader:
+            for chunk in reader:
+                table = _chunk_table(pa, chunk, header, schema)
+                for contig, rows in chunk.groupby("chrom", sort=False).indices.items():
+                    if rows[-1] - rows[0] + 1 == len(rows):
+                        part = table.slice(rows[0], len(rows))
+                    else:
+                        part = table.take(pa.array(rows))
+                    writers.get(contig).write_table(part)
+                records += len(chunk)
+    finally:
+        writers.close()
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_dir, out_dir)
+    print(f"[export_parquet] {records} records in {len(writers.parts)} contig partitions")
+    return out_dir
+
+
+@stage("query_parquet")
+def query_parquet(dataset_dir, contig=None, start=None, end=None, columns=None, where=None):
+    """
+    Read records from an exported dataset, reading only the contig
+    partitions and row groups that can match.
+
+    Parameters:
+        dataset_dir (str or Path): Directory written by export_parquet().
+        contig (str, optional): Contig (partition) to read.
+        start, end (int, optional): 1-based, inclusive bounds on POS.
+        columns (list, optional): Columns to read (default: all).
+        where (pyarrow.compute.Expression, optional): Additional filter,
+            e.g. pc.field("qual") > 30.
+
+    Returns:
+        pyarrow.Table
+    """
+    pa = _pyarrow()
+    import pyarrow.dataset as ds
+
+    # Declare chrom a string: inferred, Ensembl's 1, 2, ... would become int32
+    partitioning = ds.partitioning(pa.schema([("chrom", pa.string())]), flavor="hive")
+    dataset = ds.dataset(dataset_dir, format="parquet", partitioning=partitioning)
+    conditions = []
+    if contig is not None:
+        conditions.append(ds.field("chrom") == str(contig))
+    if start is not None:
+        conditions.append(ds.field("pos") >= start)
+    if end is not None:
+        conditions.append(ds.field("pos") <= end)
+    if where is not None:
+        conditions.append(where)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression)
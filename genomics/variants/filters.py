@@ -1,35 +1,33 @@
 from pathlib import Path
-import subprocess
 
+from omics.telemetry import run
+from omics.resources import PIPE_SORT_MEMORY_FRACTION
+from omics.resources import SORT_MEMORY_FRACTION
+from omics.resources import threads as resolve_threads
+from omics.utils import run_pipeline
+from genomics.variants.header import read_header
+from genomics.variants.formats import derived_path
+from genomics.variants.formats import output_args
+from genomics.variants.formats import sort_run_args
+from genomics.variants.formats import threads_args
 
-def apply_filter(input_vcf, output_vcf, expression, label=None, include=True, fn=None):
-    """
-    Apply a bcftools filter to a VCF file.
+# bcftools subcommands that accept --threads (bcftools sort does not)
+THREADED_COMMANDS = {"annotate", "filter", "norm", "view"}
 
-    Parameters:
-    - input_vcf (str or Path): Input VCF path
-    - output_vcf (str or Path): Output VCF path
-    - expression (str): bcftools filter expression
-    - label (str): FILTER tag label to assign to failing variants (optional)
-    - include (bool): Use '-i' to include matching variants, or '-e' to exclude them
-    - fn (str): Optional name of the calling function, for logging/debugging
 
-    Returns:
-    - Path to the filtered output VCF
+def filter_stage(expression, label=None, include=True, fn=None):
     """
-    input_vcf = str(input_vcf)
-    output_vcf = Path(output_vcf)
+    Build a bcftools filter stage: the command without input or output options.
 
+    Stages can be run on their own with run_stage() or chained with
+    FilterPipeline. Parameters are as for apply_filter().
+    """
     if fn:
         print(f"[{fn}] Applying filter: {'-i' if include else '-e'} \"{expression}\"")
 
     cmd = [
         "bcftools",
         "filter",
-        "-o",
-        str(output_vcf),
-        "-O",
-        "v",
         "-i" if include else "-e",
         expression,
     ]
@@ -37,45 +35,149 @@ def apply_filter(input_vcf, output_vcf, expression, label=None, include=True, fn
     if label and not include:
         cmd += ["-s", label]
 
-    cmd.append(input_vcf)
+    return cmd
+
+
+def run_stage(stage, input_vcf, output_vcf, output_type=None, threads=None):
+    """
+    Run a single stage from input_vcf to output_vcf.
+
+    Parameters:
+    - stage (list): bcftools command built by a *_stage function
+    - input_vcf (str or Path): Input VCF/BCF path
+    - output_vcf (str or Path): Output path; its suffix sets the format
+      (.bcf uncompressed BCF, .vcf.gz bgzipped and indexed, .vcf text)
+    - output_type (str): bcftools -O type (v, z, u, b), overriding the suffix
+    - threads (int): bcftools threads (defaults to the resource budget)
+
+    Returns:
+    - Path to the output VCF
+    """
+    output_vcf = Path(output_vcf)
+    cmd = list(stage) + sort_run_args(stage)
+    if cmd[1] in THREADED_COMMANDS:
+        cmd += threads_args(threads)
+    cmd += output_args(output_vcf, kind=output_type) + [str(input_vcf)]
 
-    subprocess.run(cmd, check=True)
+    run(cmd, check=True)
     return output_vcf
 
 
-def quality_and_depth(input_vcf, output_vcf=None, qual_thresh=20, dp_thresh=10):
+class FilterPipeline:
     """
-    Filter variants based on quality and depth thresholds.
-    If output_vcf is not provided, appends '_qualdepth.vcf' to the input filename.
+    Chain bcftools stages into one process pipe.
+
+    Stages exchange uncompressed BCF over stdin/stdout and only the final,
+    bgzipped and indexed VCF is written to disk:
+
+        FilterPipeline(raw_vcf)
+            .add(quality_and_depth_stage())
+            .add(low_af_and_mq_stage(raw_vcf, af_thresh=0.8))
+            .add(strand_bias_stage())
+            .add(normalize_stage(fa_path))
+            .add(sort_stage())
+            .run(final_vcf)
     """
-    input_vcf = Path(input_vcf)
-    output_vcf = (
-        Path(output_vcf)
-        if output_vcf
-        else input_vcf.with_name(input_vcf.stem + "_qualdepth.vcf")
-    )
 
-    return apply_filter(
-        input_vcf=input_vcf,
-        output_vcf=output_vcf,
-        expression=f"QUAL>{qual_thresh} && INFO/DP>{dp_thresh}",
+    def __init__(self, input_vcf):
+        self.input_vcf = Path(input_vcf)
+        self.stages = []
+
+    def add(self, stage):
+        """Append a stage; None (a stage with nothing to do) is ignored."""
+        if stage is not None:
+            self.stages.append(list(stage))
+        return self
+
+    def run(self, output_vcf, threads=None):
+        """
+        Run the chain and write the final product: a bgzipped VCF (or, for a
+        .bcf output, compressed BCF) with a CSI index (--write-index).
+
+        Returns:
+        - Path to the output VCF
+        """
+        if not self.stages:
+            raise ValueError("FilterPipeline has no stages")
+        output_vcf = Path(output_vcf)
+        output_vcf.parent.mkdir(parents=True, exist_ok=True)
+        threads = str(resolve_threads(threads))
+
+        stages = [list(s) for s in self.stages]
+        if stages[-1][1] not in THREADED_COMMANDS:
+            # Let a threaded writer do the compression
+            stages.append(["bcftools", "view"])
+
+        # A sort shares the memory budget with the other stages of the pipe
+        sort_fraction = PIPE_SORT_MEMORY_FRACTION if len(stages) > 1 else SORT_MEMORY_FRACTION
+        commands = []
+        for i, cmd in enumerate(stages):
+            cmd += sort_run_args(cmd, sort_fraction)
+            if i == len(stages) - 1:
+                cmd += ["--threads", threads, *output_args(output_vcf, final=True)]
+            else:
+                cmd += ["-O", "u"]
+            cmd.append(str(self.input_vcf) if i == 0 else "-")
+            commands.append(cmd)
+
+        print(f"[filter_pipeline] {' | '.join(c[1] for c in commands)}: "
+              f"{self.input_vcf.name} → {output_vcf.name}")
+        run_pipeline(commands)
+        return output_vcf
+
+
+def apply_filter(input_vcf, output_vcf, expression, label=None, include=True, fn=None,
+                 threads=None):
+    """
+    Apply a bcftools filter to a VCF file.
+
+    Parameters:
+    - input_vcf (str or Path): Input VCF path
+    - output_vcf (str or Path): Output VCF path
+    - expression (str): bcftools filter expression
+    - label (str): FILTER tag label to assign to failing variants (optional)
+    - include (bool): Use '-i' to include matching variants, or '-e' to exclude them
+    - fn (str): Optional name of the calling function, for logging/debugging
+    - threads (int): bcftools compression threads (defaults to the resource budget)
+
+    Returns:
+    - Path to the filtered output VCF
+    """
+    stage = filter_stage(expression, label=label, include=include, fn=fn)
+    return run_stage(stage, input_vcf, output_vcf, threads=threads)
+
+
+def quality_and_depth_stage(qual_thresh=20, dp_thresh=10, input_vcf=None):
+    """
+    Stage form of quality_and_depth(). If input_vcf is given and its header
+    has no INFO/DP, only QUAL is filtered.
+    """
+    expr = f"QUAL>{qual_thresh}"
+    if input_vcf is None or read_header(input_vcf).has_info("DP"):
+        expr += f" && INFO/DP>{dp_thresh}"
+
+    return filter_stage(
+        expression=expr,
         include=True,
         fn="filter_by_qual_and_depth",
     )
 
 
-def label_low_quality(input_vcf, output_vcf=None, qual_thresh=20, dp_thresh=10):
-    """Label low-quality variants with a FILTER tag instead of removing them."""
+def quality_and_depth(input_vcf, output_vcf=None, qual_thresh=20, dp_thresh=10):
+    """
+    Filter variants based on quality and depth thresholds.
+    If output_vcf is not provided, writes '<input stem>_qualdepth.bcf' (uncompressed BCF).
+    """
     input_vcf = Path(input_vcf)
-    output_vcf = (
-        Path(output_vcf)
-        if output_vcf
-        else input_vcf.with_name(input_vcf.stem + "_labeled.vcf")
-    )
+    output_vcf = Path(output_vcf) if output_vcf else derived_path(input_vcf, "_qualdepth")
 
-    return apply_filter(
-        input_vcf=input_vcf,
-        output_vcf=output_vcf,
+    stage = quality_and_depth_stage(qual_thresh, dp_thresh, input_vcf)
+    return run_stage(stage, input_vcf, output_vcf)
+
+
+def label_low_quality_stage(qual_thresh=20, dp_thresh=10):
+    """Stage form of label_low_quality()."""
+    return filter_stage(
         expression=f"QUAL<={qual_thresh} || INFO/DP<={dp_thresh}",
         label="LowQual",
         include=False,
@@ -83,47 +185,42 @@ def label_low_quality(input_vcf, output_vcf=None, qual_thresh=20, dp_thresh=10):
     )
 
 
-def max_depth_filter(input_vcf, output_vcf=None, max_dp=500):
-    """Exclude variants with depth above max_dp (e.g., PCR artifacts or repeats)."""
+def label_low_quality(input_vcf, output_vcf=None, qual_thresh=20, dp_thresh=10):
+    """Label low-quality variants with a FILTER tag instead of removing them."""
     input_vcf = Path(input_vcf)
-    output_vcf = (
-        Path(output_vcf)
-        if output_vcf
-        else input_vcf.with_name(input_vcf.stem + f"_dp{max_dp}.vcf")
-    )
+    output_vcf = Path(output_vcf) if output_vcf else derived_path(input_vcf, "_labeled")
 
-    return apply_filter(
-        input_vcf=input_vcf,
-        output_vcf=output_vcf,
+    return run_stage(label_low_quality_stage(qual_thresh, dp_thresh), input_vcf, output_vcf)
+
+
+def max_depth_filter_stage(max_dp=500):
+    """Stage form of max_depth_filter()."""
+    return filter_stage(
         expression=f"INFO/DP<{max_dp}",
         include=True,
         fn="add_max_depth_filter",
     )
 
 
-def low_af_and_mq(input_vcf, output_vcf=None, af_thresh=0.2, mq_thresh=40):
-    """Label variants with low allele frequency or low mapping quality (if present)."""
+def max_depth_filter(input_vcf, output_vcf=None, max_dp=500):
+    """Exclude variants with depth above max_dp (e.g., PCR artifacts or repeats)."""
     input_vcf = Path(input_vcf)
-    output_vcf = (
-        Path(output_vcf)
-        if output_vcf
-        else input_vcf.with_name(input_vcf.stem + "_afmq.vcf")
-    )
+    output_vcf = Path(output_vcf) if output_vcf else derived_path(input_vcf, f"_dp{max_dp}")
 
-    # Check if MQ is in header
-    has_mq = (
-        "MQ,"
-        in subprocess.run(
-            ["bcftools", "view", "-h", input_vcf], capture_output=True, text=True
-        ).stdout
-    )
+    return run_stage(max_depth_filter_stage(max_dp), input_vcf, output_vcf)
+
+
+def low_af_and_mq_stage(input_vcf, af_thresh=0.2, mq_thresh=40):
+    """
+    Stage form of low_af_and_mq(). input_vcf is only read for its header,
+    so in a FilterPipeline pass the pipeline's input.
+    """
+    has_mq = read_header(input_vcf).has_info("MQ")
 
     expr = f"AF<{af_thresh}" + (f" || MQ<{mq_thresh}" if has_mq else "")
     label = "LowAF" if not has_mq else "LowAF_MQ"
 
-    return apply_filter(
-        input_vcf=input_vcf,
-        output_vcf=output_vcf,
+    return filter_stage(
         expression=expr,
         label=label,
         include=False,
@@ -131,59 +228,63 @@ def low_af_and_mq(input_vcf, output_vcf=None, af_thresh=0.2, mq_thresh=40):
     )
 
 
-def strand_bias(input_vcf, output_vcf=None):
-    """Label strand-biased variants not supported on both DNA strands."""
+def low_af_and_mq(input_vcf, output_vcf=None, af_thresh=0.2, mq_thresh=40):
+    """Label variants with low allele frequency or low mapping quality (if present)."""
     input_vcf = Path(input_vcf)
-    output_vcf = (
-        Path(output_vcf)
-        if output_vcf
-        else input_vcf.with_name(input_vcf.stem + "_strand.vcf")
-    )
+    output_vcf = Path(output_vcf) if output_vcf else derived_path(input_vcf, "_afmq")
+
+    return run_stage(low_af_and_mq_stage(input_vcf, af_thresh, mq_thresh), input_vcf, output_vcf)
+
 
-    return apply_filter(
-        input_vcf=input_vcf,
-        output_vcf=output_vcf,
-        expression="SAF=0 || SAR=0",
+def strand_bias_stage(input_vcf=None):
+    """
+    Stage form of strand_bias(). Uses FreeBayes SAF/SAR counts; if input_vcf
+    is given and only has GATK's FS/SOR annotations, those are used instead.
+    Returns None if the header has neither.
+    """
+    expr = "SAF=0 || SAR=0"
+    if input_vcf is not None:
+        header = read_header(input_vcf)
+        if not header.has_info("SAF", "SAR"):
+            if not header.has_info("FS", "SOR"):
+                print("[filter_strand_bias] No strand annotations in header. Skipping.")
+                return None
+            expr = "INFO/FS>60 || INFO/SOR>3"
+
+    return filter_stage(
+        expression=expr,
         label="StrandBias",
         include=False,
         fn="filter_strand_bias",
     )
 
 
-def strict_high_confidence(
+def strand_bias(input_vcf, output_vcf=None):
+    """Label strand-biased variants not supported on both DNA strands."""
+    input_vcf = Path(input_vcf)
+    output_vcf = Path(output_vcf) if output_vcf else derived_path(input_vcf, "_strand")
+
+    stage = strand_bias_stage(input_vcf)
+    if stage is None:
+        return input_vcf
+    return run_stage(stage, input_vcf, output_vcf)
+
+
+def strict_high_confidence_stage(
     input_vcf,
-    output_vcf=None,
     qual_thresh=30,
     dp_thresh=15,
     af_thresh=0.3,
     mq_thresh=50,
 ):
     """
-    Apply a strict high-confidence filter combining quality, depth, allele frequency,
-    and optionally mapping quality (MQ, if present).
+    Stage form of strict_high_confidence(). input_vcf is only read for its header.
     """
-    input_vcf = Path(input_vcf)
-    output_vcf = (
-        Path(output_vcf)
-        if output_vcf
-        else input_vcf.with_name(input_vcf.stem + "_strict.vcf")
-    )
-
-    # Check if MQ is present in the VCF header
-    has_mq = (
-        "MQ,"
-        in subprocess.run(
-            ["bcftools", "view", "-h", input_vcf], capture_output=True, text=True
-        ).stdout
-    )
-
     expr = f"QUAL<{qual_thresh} || INFO/DP<{dp_thresh} || AF<{af_thresh}"
-    if has_mq:
+    if read_header(input_vcf).has_info("MQ"):
         expr += f" || MQ<{mq_thresh}"
 
-    return apply_filter(
-        input_vcf=input_vcf,
-        output_vcf=output_vcf,
+    return filter_stage(
         expression=expr,
         label="Strict",
         include=False,
@@ -191,18 +292,28 @@ def strict_high_confidence(
     )
 
 
-def sample_coverage(input_vcf, output_vcf=None, sample_idx=0, min_dp=10):
-    """Filter variants with low depth in a specific sample (e.g. sample 0)."""
+def strict_high_confidence(
+    input_vcf,
+    output_vcf=None,
+    qual_thresh=30,
+    dp_thresh=15,
+    af_thresh=0.3,
+    mq_thresh=50,
+):
+    """
+    Apply a strict high-confidence filter combining quality, depth, allele frequency,
+    and optionally mapping quality (MQ, if present).
+    """
     input_vcf = Path(input_vcf)
-    output_vcf = (
-        Path(output_vcf)
-        if output_vcf
-        else input_vcf.with_name(input_vcf.stem + f"_sample{sample_idx}_dp.vcf")
-    )
+    output_vcf = Path(output_vcf) if output_vcf else derived_path(input_vcf, "_strict")
+
+    stage = strict_high_confidence_stage(input_vcf, qual_thresh, dp_thresh, af_thresh, mq_thresh)
+    return run_stage(stage, input_vcf, output_vcf)
 
-    return apply_filter(
-        input_vcf=input_vcf,
-        output_vcf=output_vcf,
+
+def sample_coverage_stage(sample_idx=0, min_dp=10):
+    """Stage form of sample_coverage()."""
+    return filter_stage(
         expression=f"FORMAT/DP[{sample_idx}]<{min_dp}",
         label="LowSampleDepth",
         include=False,
@@ -210,17 +321,29 @@ def sample_coverage(input_vcf, output_vcf=None, sample_idx=0, min_dp=10):
     )
 
 
-def separate_snps(input_vcf, output_vcf):
-    """Extract only SNPs."""
-    subprocess.run(
-        ["bcftools", "view", "-v", "snps", input_vcf, "-o", output_vcf, "-O", "v"],
+def sample_coverage(input_vcf, output_vcf=None, sample_idx=0, min_dp=10):
+    """Filter variants with low depth in a specific sample (e.g. sample 0)."""
+    input_vcf = Path(input_vcf)
+    output_vcf = Path(output_vcf) if output_vcf else derived_path(input_vcf, f"_sample{sample_idx}_dp")
+
+    return run_stage(sample_coverage_stage(sample_idx, min_dp), input_vcf, output_vcf)
+
+
+def separate_snps(input_vcf, output_vcf, threads=None):
+    """Extract only SNPs; the output format follows the output suffix."""
+    run(
+        ["bcftools", "view", *threads_args(threads),
+         "-v", "snps", *output_args(output_vcf), str(input_vcf)],
         check=True,
     )
+    return Path(output_vcf)
 
 
-def separate_indels(input_vcf, output_vcf):
-    """Extract only indels."""
-    subprocess.run(
-        ["bcftools", "view", "-v", "indels", input_vcf, "-o", output_vcf, "-O", "v"],
+def separate_indels(input_vcf, output_vcf, threads=None):
+    """Extract only indels; the output format follows the output suffix."""
+    run(
+        ["bcftools", "view", *threads_args(threads),
+         "-v", "indels", *output_args(output_vcf), str(input_vcf)],
         check=True,
     )
+    return Path(output_vcf)
@@ -0,0 +1,98 @@
+"""
+Output-format policy for the bcftools steps of the variants package.
+
+Intermediates are uncompressed BCF (-O u): the next bcftools call reads the
+binary records without parsing text, and no CPU goes into compressing a
+file that is read once. Final products are bgzipped VCF (-O z) with a CSI
+index written in the same pass (--write-index).
+
+The type of an explicitly named output follows its suffix:
+
+    .bcf     → u for intermediates, b (indexed) for final products
+    .vcf.gz  → z (indexed)
+    .vcf     → v
+
+Default output names use the policy's suffix, so a wrapper called without
+an output path writes variants_qualdepth.bcf rather than text VCF.
+"""
+from pathlib import Path
+
+from omics.resources import SORT_MEMORY_FRACTION
+from omics.resources import sort_memory
+from omics.resources import threads as resolve_threads
+from omics.scratch import current_session
+from omics.scratch import temp_prefix
+
+INTERMEDIATE_TYPE = "u"
+FINAL_TYPE = "z"
+SUFFIXES = {"u": ".bcf", "b": ".bcf", "z": ".vcf.gz", "v": ".vcf"}
+VCF_SUFFIXES = (".g.vcf.gz", ".vcf.gz", ".vcf.bgz", ".vcf", ".bcf", ".gz")
+
+
+def vcf_stem(path):
+    """File name without its VCF/BCF suffix: variants_raw.vcf.gz → variants_raw."""
+    name = Path(path).name
+    for suffix in VCF_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return Path(name).stem
+
+
+def output_type(path, final=False):
+    """bcftools -O type for an output path, from its suffix."""
+    name = Path(path).name
+    if name.endswith(".bcf"):
+        return "b" if final else INTERMEDIATE_TYPE
+    if name.endswith((".gz", ".bgz")):
+        return "z"
+    if name.endswith(".vcf"):
+        return "v"
+    return FINAL_TYPE if final else INTERMEDIATE_TYPE
+
+
+def derived_path(input_vcf, tag, final=False):
+    """Default output path next to input_vcf: <stem><tag> plus the policy's suffix."""
+    input_vcf = Path(input_vcf)
+    kind = FINAL_TYPE if final else INTERMEDIATE_TYPE
+    return input_vcf.with_name(vcf_stem(input_vcf) + tag + SUFFIXES[kind])
+
+
+def output_args(path, final=False, kind=None):
+    """
+    bcftools output options for path: -O/-o, plus --write-index when the
+    output is compressed (bgzipped VCF or compressed BCF). kind overrides
+    the -O type the suffix implies.
+    """
+    kind = kind or output_type(path, final)
+    args = ["-O", kind, "-o", str(path)]
+    if kind in ("z", "b"):
+        args.append("--write-index")
+    return args
+
+
+def threads_args(threads=None):
+    """--threads for bcftools (de)compression, sized from the resource budget."""
+    return ["--threads", str(resolve_threads(threads))]
+
+
+def sort_run_args(cmd, memory_fraction=SORT_MEMORY_FRACTION):
+    """
+    Run-time options for a bcftools sort command: -m from the resource budget
+    (memory_fraction of it) and -T, a fresh template in the scratch session's
+    directory, each unless the command sets it. Outside a session -T is left
+    to bcftools. Added when the command runs, so budget-dependent values and
+    per-run paths stay out of the stage and its cache key.
+    """
+    if cmd[:2] != ["bcftools", "sort"]:
+        return []
+    args = []
+    if "-m" not in cmd and "--max-mem" not in cmd:
+        args += ["-m", sort_memory(1, memory_fraction)]
+    if "-T" not in cmd and "--temp-dir" not in cmd and current_session() is not None:
+        args += ["-T", temp_prefix("bcftools_sort", default=None) + ".XXXXXX"]
+    return args
+
+
+def index_path(path):
+    """Index written by --write-index or bcftools index (CSI)."""
+    return Path(f"{path}.csi")
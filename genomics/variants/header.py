@@ -0,0 +1,146 @@
+"""
+In-process VCF/BCF header parsing.
+
+read_header() returns typed INFO, FORMAT and FILTER definitions, contigs and
+sample names for .vcf, .vcf.gz (BGZF or plain gzip) and .bcf (compressed or
+not). Results are memoised on file identity (device, inode, size, mtime), so
+repeated calls from filters and QC cost a stat() rather than a bcftools spawn.
+"""
+import functools
+import gzip
+import re
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+
+GZIP_MAGIC = b"\x1f\x8b"
+BCF_MAGIC = b"BCF\x02"
+
+_STRUCTURED = re.compile(r"^##(\w+)=<(.*)>$")
+
+
+@dataclass(frozen=True)
+class HeaderField:
+    """An ##INFO, ##FORMAT or ##FILTER definition."""
+    id: str
+    number: str = None
+    type: str = None
+    description: str = ""
+    extra: tuple = ()
+
+
+@dataclass
+class VCFHeader:
+    fileformat: str = None
+    info: dict = field(default_factory=dict)
+    format: dict = field(default_factory=dict)
+    filter: dict = field(default_factory=dict)
+    contigs: dict = field(default_factory=dict)
+    samples: list = field(default_factory=list)
+    meta: list = field(default_factory=list)
+
+    def has_info(self, *tags):
+        return all(t in self.info for t in tags)
+
+    def has_format(self, *tags):
+        return all(t in self.format for t in tags)
+
+
+def _parse_structured(body):
+    """Split 'ID=DP,Number=1,Description="a, b"' into an ordered dict."""
+    values = {}
+    key, buf, in_quotes, escaped = None, [], False, False
+    for ch in body + ",":
+        if escaped:
+            buf.append(ch)
+            escaped = False
+        elif ch == "\\" and in_quotes:
+            escaped = True
+        elif ch == '"':
+            in_quotes = not in_quotes
+        elif ch == "=" and key is None and not in_quotes:
+            key, buf = "".join(buf), []
+        elif ch == "," and not in_quotes:
+            if key is not None:
+                values[key] = "".join(buf)
+            key, buf = None, []
+        else:
+            buf.append(ch)
+    return values
+
+
+def parse_header_text(text):
+    """Parse the '##...' and '#CHROM' lines of a VCF header."""
+    header = VCFHeader()
+    for line in text.splitlines():
+        if line.startswith("#CHROM"):
+            header.samples = line.rstrip("\n").split("\t")[9:]
+            break
+        if line.startswith("##fileformat="):
+            header.fileformat = line.split("=", 1)[1]
+            continue
+        match = _STRUCTURED.match(line)
+        if not match:
+            if line.startswith("##"):
+                header.meta.append(line[2:])
+            continue
+
+        kind, values = match.group(1), _parse_structured(match.group(2))
+        if kind == "contig":
+            length = values.get("length")
+            header.contigs[values["ID"]] = int(length) if length else None
+        elif kind in ("INFO", "FORMAT", "FILTER"):
+            known = ("ID", "Number", "Type", "Description")
+            definition = HeaderField(
+                id=values["ID"],
+                number=values.get("Number"),
+                type=values.get("Type"),
+                description=values.get("Description", ""),
+                extra=tuple((k, v) for k, v in values.items() if k not in known),
+            )
+            getattr(header, kind.lower())[definition.id] = definition
+        else:
+            header.meta.append(line[2:])
+    return header
+
+
+def _read_header_text(path):
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    opener = gzip.open if magic == GZIP_MAGIC else open
+
+    with opener(path, "rb") as f:
+        start = f.read(len(BCF_MAGIC))
+        if start == BCF_MAGIC:
+            f.read(1)  # minor version
+            (l_text,) = struct.unpack("<I", f.read(4))
+            return f.read(l_text).rstrip(b"\0").decode()
+
+        lines = [start + f.readline()]
+        while not lines[-1].startswith(b"#CHROM"):
+            line = f.readline()
+            if not line.startswith(b"#"):
+                break
+            lines.append(line)
+        return b"".join(lines).decode()
+
+
+@functools.lru_cache(maxsize=256)
+def _read_header_cached(path, identity):
+    return parse_header_text(_read_header_text(path))
+
+
+def read_header(vcf_file):
+    """
+    Parse the header of a VCF/BCF file.
+
+    Parameters:
+        vcf_file (str or Path): .vcf, .vcf.gz or .bcf file.
+
+    Returns:
+        VCFHeader: typed definitions, contigs and samples. Treat as read-only;
+            the same object is returned until the file changes.
+    """
+    path = Path(vcf_file).resolve()
+    st = path.stat()
+    return _read_header_cached(str(path), (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns))
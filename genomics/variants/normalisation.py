@@ -1,6 +1,26 @@
-import subprocess
 from pathlib import Path
 
+from omics.telemetry import run
+from genomics.variants.formats import derived_path
+from genomics.variants.formats import output_args
+from genomics.variants.formats import threads_args
+
+
+def normalize_stage(reference_fa, split_multiallelics=True, check_ref=True, validate_only=False):
+    """
+    Build the bcftools norm command without input or output options,
+    for use as a FilterPipeline stage. Parameters are as for normalize().
+    """
+    cmd = ["bcftools", "norm", "-f", str(reference_fa)]
+
+    if not validate_only and split_multiallelics:
+        cmd += ["-m", "-any"]
+
+    if check_ref:
+        cmd += ["-c", "s"]
+
+    return cmd
+
 
 def normalize(
     input_vcf,
@@ -9,6 +29,7 @@ def normalize(
     split_multiallelics=True,
     check_ref=True,
     validate_only=False,
+    threads=None,
 ):
     """
     Normalize or validate variants in a VCF file using bcftools norm:
@@ -18,60 +39,61 @@ def normalize(
     - Optionally run in validation-only mode (no left-align or split)
 
     Parameters:
-    - input_vcf (str or Path): Input VCF path (.vcf or .vcf.gz)
+    - input_vcf (str or Path): Input VCF path (.vcf, .vcf.gz or .bcf)
     - reference_fa (str or Path): Reference genome in FASTA format
-    - output_vcf (str or Path): Output path (.vcf.gz or .vcf); if None, auto-generated
+    - output_vcf (str or Path): Output path; its suffix sets the format (.vcf.gz
+      bgzipped and indexed, .bcf, .vcf). If None, '<stem>_norm.vcf.gz', or
+      '<stem>_validated.bcf' when validating
     - split_multiallelics (bool): If True, split into biallelics (unless validate_only)
     - check_ref (bool): If True, enforce REF allele check against FASTA
     - validate_only (bool): If True, only validate REF/ALT against reference without modifying VCF
+    - threads (int): bcftools threads (defaults to the resource budget)
 
     Returns:
     - Path to output VCF (validated or normalized)
     """
     input_vcf = Path(input_vcf)
-    output_vcf = (
-        Path(output_vcf)
-        if output_vcf
-        else input_vcf.with_name(
-            input_vcf.stem + ("_validated.vcf" if validate_only else "_norm.vcf.gz")
-        )
-    )
+    if output_vcf:
+        output_vcf = Path(output_vcf)
+    elif validate_only:
+        output_vcf = derived_path(input_vcf, "_validated")
+    else:
+        output_vcf = derived_path(input_vcf, "_norm", final=True)
 
     print(
         f"[normalize] {'Validating' if validate_only else 'Normalizing'}: "
         f"{input_vcf.name} → {output_vcf.name}"
     )
 
-    cmd = [
-        "bcftools", "norm",
-        "-f", str(reference_fa),
-        "-o", str(output_vcf),
-        "-O", "v" if validate_only else "z",  # uncompressed VCF if just validating
+    cmd = normalize_stage(reference_fa, split_multiallelics, check_ref, validate_only)
+    cmd += [
+        *threads_args(threads),
+        *output_args(output_vcf, final=not validate_only),
+        str(input_vcf),
     ]
 
-    if not validate_only and split_multiallelics:
-        cmd += ["-m", "-any"]
-
-    if check_ref:
-        cmd += ["-c", "s"]
-
-    cmd.append(str(input_vcf))
-
-    subprocess.run(cmd, check=True)
+    run(cmd, check=True)
     return output_vcf
 
 
-def index(vcf_gz):
+def index(vcf_gz, threads=None):
     """
-    Index a bgzipped VCF using tabix.
+    Index a bgzipped VCF using tabix, or a compressed BCF with bcftools index.
+
+    Outputs written with --write-index (see formats.output_args) already
+    have a CSI index and do not need this.
 
     Parameters:
-    - vcf_gz (str or Path): Path to .vcf.gz file
+    - vcf_gz (str or Path): Path to .vcf.gz or .bcf file
+    - threads (int): bcftools threads for a BCF (defaults to the resource budget)
 
     Returns:
-    - Path to created index file (.tbi)
+    - Path to created index file (.tbi, or .csi for a BCF)
     """
     vcf_gz = Path(vcf_gz)
     print(f"[index] Indexing VCF: {vcf_gz.name}")
-    subprocess.run(["tabix", "-p", "vcf", str(vcf_gz)], check=True)
+    if vcf_gz.suffix == ".bcf":
+        run(["bcftools", "index", *threads_args(threads), str(vcf_gz)], check=True)
+        return Path(str(vcf_gz) + ".csi")
+    run(["tabix", "-p", "vcf", str(vcf_gz)], check=True)
     return Path(str(vcf_gz) + ".tbi")
\ No newline at end of file
@@ -1,6 +1,8 @@
-import subprocess
 from pathlib import Path
 
+from omics.telemetry import run
+from omics.resources import java_heap_mb
+
 def add_read_groups(
     input_bam: Path,
     output_bam: Path,
@@ -23,7 +25,7 @@ def add_read_groups(
         rgsm (str): Sample name.
     """
     cmd = [
-        "picard",
+        "picard", f"-Xmx{java_heap_mb()}m",
         "AddOrReplaceReadGroups",
         f"I={input_bam}",
         f"O={output_bam}",
@@ -34,7 +36,7 @@ def add_read_groups(
         f"RGSM={rgsm}"
     ]
 
-    subprocess.run(cmd, check=True)
+    run(cmd, check=True)
 
 
 def generate_bqsr_table(
@@ -53,14 +55,14 @@ def generate_bqsr_table(
         output_table (Path): Output recalibration table.
     """
     cmd = [
-        "gatk",
+        "gatk", "--java-options", f"-Xmx{java_heap_mb()}m",
         "BaseRecalibrator",
         "-I", str(input_bam),
         "-R", str(reference_fasta),
         "--known-sites", str(known_sites_vcf),
         "-O", str(output_table)
     ]
-    subprocess.run(cmd, check=True)
+    run(cmd, check=True)
 
 
 def apply_bqsr(
@@ -79,11 +81,11 @@ def apply_bqsr(
         output_bam (Path): Recalibrated output BAM file.
     """
     cmd = [
-        "gatk",
+        "gatk", "--java-options", f"-Xmx{java_heap_mb()}m",
         "ApplyBQSR",
         "-I", str(input_bam),
         "-R", str(reference_fasta),
         "--bqsr-recal-file", str(bqsr_table),
         "-O", str(output_bam)
     ]
-    subprocess.run(cmd, check=True)
+    run(cmd, check=True)
@@ -1,15 +1,24 @@
 import subprocess
 from pathlib import Path
-import matplotlib.pyplot as plt
-import gzip
 
-def stats(vcf_file, output_file=None):
+from omics.telemetry import run
+from omics.telemetry import stage
+from omics.resources import threads as resolve_threads
+from genomics.variants.header import read_header
+
+# numpy/pandas (scan), matplotlib and the index reader are imported by the
+# functions that use them, so importing this module stays cheap.
+
+def stats(vcf_file, output_file=None, threads=None):
     """
     Run bcftools stats on a VCF file.
 
     Parameters:
         vcf_file (str or Path): Path to input VCF.
         output_file (str or Path, optional): Output stats file. Defaults to vcf_file.stem + ".bcftools_stats.txt".
+        threads (int, optional): Decompression threads. Defaults to the resource budget.
+
+    Per-sample statistics (-s -) are collected when the header lists samples.
 
     Returns:
         Path: Path to stats file.
@@ -21,8 +30,12 @@ def stats(vcf_file, output_file=None):
     else:
         output_file = Path(output_file)
 
+    cmd = ["bcftools", "stats", "--threads", str(resolve_threads(threads))]
+    if read_header(vcf_file).samples:
+        cmd += ["-s", "-"]
+
     with open(output_file, "w") as out:
-        subprocess.run(["bcftools", "stats", str(vcf_file)], stdout=out, check=True)
+        run(cmd + [str(vcf_file)], stdout=out, check=True)
 
     return output_file
 
@@ -39,8 +52,8 @@ def validate(vcf_path):
     vcf_path = Path(vcf_path)
 
     try:
-        subprocess.run(["vcf-validator", str(vcf_path)],
-                       check=True)
+        run(["vcf-validator", str(vcf_path)],
+            check=True)
         print(f"[✓] VCF validation passed: {vcf_path.name}")
         return True
     except subprocess.CalledProcessError:
@@ -48,6 +61,7 @@ def validate(vcf_path):
         return False
     
 
+@stage("qual_distribution")
 def qual_distribution(vcf_file, output_file=None, bins=100):
     """
     Plot histogram of QUAL scores from a VCF file.
@@ -60,24 +74,15 @@ def qual_distribution(vcf_file, output_file=None, bins=100):
     Returns:
         Path: Path to saved plot.
     """
-    output_file.parent.mkdir(parents=True, exist_ok=True)
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from genomics.variants.scan import scan_vcf
+
     vcf_file = Path(vcf_file)
-    qual_scores = []
-
-    opener = gzip.open if vcf_file.suffix == ".gz" else open
-    with opener(vcf_file, "rt") as f:
-        for line in f:
-            if line.startswith("#"):
-                continue
-            parts = line.strip().split("\t")
-            try:
-                qual = float(parts[5])
-                qual_scores.append(qual)
-            except ValueError:
-                continue
+    scan = scan_vcf(vcf_file)
 
     plt.figure()
-    plt.hist(qual_scores, bins=bins)
+    plt.hist(scan.qual[~np.isnan(scan.qual)], bins=bins)
     plt.xlabel("QUAL Score")
     plt.ylabel("Number of Variants")
     plt.title("VCF Variant Quality Score Distribution")
@@ -87,11 +92,13 @@ def qual_distribution(vcf_file, output_file=None, bins=100):
         output_file = vcf_file.with_name(f"{vcf_file.stem}_qual_hist.png")
     else:
         output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
 
     plt.savefig(output_file)
     plt.close()
     return output_file
 
+@stage("count_variant_types")
 def count_variant_types(vcf_file, output_file=None):
     """
     Count number of SNPs and indels in a VCF file and optionally write results.
@@ -103,33 +110,14 @@ def count_variant_types(vcf_file, output_file=None):
     Returns:
         dict: {'SNPs': int, 'Indels': int}
     """
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    vcf_file = Path(vcf_file)
-    snps = 0
-    indels = 0
-
-    opener = gzip.open if vcf_file.suffix == ".gz" else open
+    from genomics.variants.scan import scan_vcf
 
-    with opener(vcf_file, "rt") as f:
-        for line in f:
-            if line.startswith("#"):
-                continue
-            fields = line.strip().split("\t")
-            if len(fields) < 5:
-                continue
-            ref = fields[3]
-            alt = fields[4]
-
-            for allele in alt.split(","):
-                if len(ref) == 1 and len(allele) == 1:
-                    snps += 1
-                else:
-                    indels += 1
-
-    result = {"SNPs": snps, "Indels": indels}
+    scan = scan_vcf(vcf_file)
+    result = {"SNPs": scan.snps, "Indels": scan.indels}
 
     if output_file:
         output_file = Path(output_file)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
         with open(output_file, "w") as out:
             for k, v in result.items():
                 out.write(f"{k}: {v}\n")
@@ -137,5 +125,61 @@ def count_variant_types(vcf_file, output_file=None):
 
     return result
 
+def region_variant_counts(vcf_file, regions, output_file=None):
+    """
+    Count SNPs and indels in each target region through the VCF's tabix/CSI
+    index, for spot checks of a few loci without scanning the whole file.
+
+    Parameters:
+        vcf_file (str or Path): Bgzipped VCF with a .tbi or .csi index.
+        regions (str, Path or list): BED file, or regions as 'chr:start-end'
+            strings, Region objects or (contig, start, end) tuples.
+        output_file (str or Path, optional): TSV with one row per region.
 
+    Returns:
+        list of dict: contig, start, end, SNPs, Indels and Other per region.
+    """
+    from omics.query import VCFQuery
+    from omics.query import read_regions
+
+    rows = []
+    with VCFQuery(vcf_file) as vcf:
+        regions = read_regions(regions)
+        batch = vcf.fetch_many(regions)
+        for region in regions:
+            counts = {"SNPs": 0, "Indels": 0, "Other": 0}
+            for record in batch[region]:
+                for alt in record.alt:
+                    if len(record.ref) == 1 and len(alt) == 1 and alt not in ".*":
+                        counts["SNPs"] += 1
+                    elif alt.isalpha() and len(alt) != len(record.ref):
+                        counts["Indels"] += 1
+                    else:
+                        counts["Other"] += 1
+            rows.append({"contig": region.contig, "start": region.start,
+                         "end": region.end, **counts})
 
+    if output_file:
+        output_file = Path(output_file)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, "w") as out:
+            out.write("contig\tstart\tend\tSNPs\tIndels\tOther\n")
+            for row in rows:
+                out.write("\t".join(str(v) for v in row.values()) + "\n")
+        print(f"[✓] Region variant counts written to: {output_file.name}")
+    return rows
+
+@stage("variant_metrics")
+def variant_metrics(vcf_file, output_file):
+    """
+    Write the full single-pass QC summary (classes, Ts/Tv, indel spectrum,
+    FILTER and contig counts, QUAL/DP distributions) as JSON.
+
+    Returns:
+        Path: Path to the JSON summary.
+    """
+    from genomics.variants.scan import write_summary
+
+    output_file = write_summary(vcf_file, output_file)
+    print(f"[✓] Variant metrics written to: {output_file.name}")
+    return output_file
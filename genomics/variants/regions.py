@@ -0,0 +1,205 @@
+"""
+Split a reference into balanced regions for scatter-gather variant calling.
+
+Contig lengths come from the reference .fai (or a sequence dictionary).
+Optionally the BAM index read counts (samtools idxstats) weight each contig,
+so shards get similar numbers of reads rather than similar numbers of bases.
+"""
+import gzip
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from omics.telemetry import run
+
+
+@dataclass(frozen=True)
+class Region:
+    """A half-open, 0-based interval [start, end) on a contig."""
+    contig: str
+    start: int
+    end: int
+
+    def __len__(self):
+        return self.end - self.start
+
+    def bed(self):
+        """0-based, end-exclusive (BED, FreeBayes --region)."""
+        return f"{self.contig}:{self.start}-{self.end}"
+
+    def one_based(self):
+        """1-based, inclusive (samtools/bcftools/GATK -L)."""
+        return f"{self.contig}:{self.start + 1}-{self.end}"
+
+
+def read_fai(reference_fasta):
+    """Return [(contig, length)] from '<reference>.fai', in file order."""
+    fai = Path(str(reference_fasta) + ".fai")
+    if not fai.exists():
+        print(f"Indexing FASTA: {reference_fasta}")
+        run(["samtools", "faidx", str(reference_fasta)], check=True)
+    contigs = []
+    with fai.open() as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            contigs.append((fields[0], int(fields[1])))
+    return contigs
+
+
+def read_dict(dict_file):
+    """Return [(contig, length)] from a Picard/GATK sequence dictionary."""
+    contigs = []
+    with open(dict_file) as f:
+        for line in f:
+            if not line.startswith("@SQ"):
+                continue
+            tags = dict(t.split(":", 1) for t in line.rstrip("\n").split("\t")[1:])
+            contigs.append((tags["SN"], int(tags["LN"])))
+    return contigs
+
+
+def reference_contigs(reference_fasta):
+    """Contigs from the sequence dictionary if present, else the .fai."""
+    reference_fasta = Path(reference_fasta)
+    name = reference_fasta.name
+    for suffix in (".gz", ".fa", ".fasta", ".fna"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    dict_file = reference_fasta.with_name(name + ".dict")
+    if dict_file.exists():
+        return read_dict(dict_file)
+    return read_fai(reference_fasta)
+
+
+def contig_read_counts(bam_file):
+    """Mapped reads per contig from the BAM index (samtools idxstats)."""
+    out = run(["samtools", "idxstats", str(bam_file)],
+              capture_output=True, text=True, check=True).stdout
+    counts = {}
+    for line in out.splitlines():
+        name, _, mapped, _ = line.split("\t")
+        if name != "*":
+            counts[name] = int(mapped)
+    return counts
+
+
+def n_gap_free_regions(reference_fasta, min_gap=1000):
+    """
+    Regions of the reference between runs of at least min_gap Ns.
+
+    Shard boundaries placed in assembly gaps cannot cut through a variant or
+    an active region. The scan is cached next to the reference as
+    '<reference>.nogap<min_gap>.bed'.
+    """
+    reference_fasta = Path(reference_fasta)
+    cache = Path(f"{reference_fasta}.nogap{min_gap}.bed")
+    if cache.exists() and cache.stat().st_mtime >= reference_fasta.stat().st_mtime:
+        with cache.open() as f:
+            return [Region(c, int(s), int(e)) for c, s, e in (l.split() for l in f)]
+
+    print(f"Scanning for N-gaps >= {min_gap} bp: {reference_fasta}")
+    n_run = re.compile(rb"[Nn]+")
+    regions = []
+
+    def close_contig(name, length, gaps):
+        start = 0
+        for gap_start, gap_end in gaps:
+            if gap_end - gap_start >= min_gap:
+                if gap_start > start:
+                    regions.append(Region(name, start, gap_start))
+                start = gap_end
+        if length > start:
+            regions.append(Region(name, start, length))
+
+    opener = gzip.open if reference_fasta.suffix == ".gz" else open
+    name, pos, gaps = None, 0, []
+    with opener(reference_fasta, "rb") as f:
+        for line in f:
+            if line.startswith(b">"):
+                if name is not None:
+                    close_contig(name, pos, gaps)
+                name, pos, gaps = line[1:].split()[0].decode(), 0, []
+                continue
+            line = line.rstrip()
+            for m in n_run.finditer(line):
+                start, end = pos + m.start(), pos + m.end()
+                if gaps and gaps[-1][1] == start:
+                    gaps[-1] = (gaps[-1][0], end)  # run continues from the previous line
+                else:
+                    gaps.append((start, end))
+            pos += len(line)
+    if name is not None:
+        close_contig(name, pos, gaps)
+
+    write_bed(regions, cache)
+    return regions
+
+
+def balanced_regions(contigs, n_shards, read_counts=None, min_size=10_000):
+    """
+    Cut contigs into about n_shards shards of similar weight.
+
+    Large contigs are split; consecutive small contigs are packed together,
+    so every shard is a run of regions in reference order and the shard
+    outputs can simply be concatenated.
+
+    Parameters:
+        contigs (list): [(contig, length)] or Regions (e.g. from
+            n_gap_free_regions), in reference order.
+        n_shards (int): Target number of shards.
+        read_counts (dict, optional): contig → mapped reads; weights each base
+            by its contig's read density. Contigs without reads get the
+            smallest weight, not zero, so they are still called.
+        min_size (int): Contigs are never cut into pieces smaller than this.
+
+    Returns:
+        list of list of Region: one list of regions per shard.
+    """
+    spans = [c if isinstance(c, Region) else Region(c[0], 0, c[1]) for c in contigs]
+    spans = [r for r in spans if len(r) > 0]
+
+    contig_lengths = {}
+    for r in spans:
+        contig_lengths[r.contig] = max(contig_lengths.get(r.contig, 0), r.end)
+    if read_counts:
+        densities = {name: read_counts.get(name, 0) / length
+                     for name, length in contig_lengths.items()}
+        floor = min((d for d in densities.values() if d > 0), default=1.0)
+        density = {name: max(d, floor) for name, d in densities.items()}
+    else:
+        density = {name: 1.0 for name in contig_lengths}
+
+    total = sum(len(r) * density[r.contig] for r in spans)
+    target = total / max(1, n_shards)
+
+    regions = []
+    for span in spans:
+        # Bases per piece on this contig, so each piece weighs about one shard
+        step = max(min_size, target / density[span.contig])
+        n_pieces = max(1, round(len(span) / step))
+        bounds = [span.start + round(i * len(span) / n_pieces) for i in range(n_pieces + 1)]
+        regions.extend(Region(span.contig, s, e) for s, e in zip(bounds, bounds[1:]))
+
+    shards, current, weight = [], [], 0.0
+    for region in regions:
+        w = len(region) * density[region.contig]
+        if current and weight + w > target * 1.05:
+            shards.append(current)
+            current, weight = [], 0.0
+        current.append(region)
+        weight += w
+        if weight >= target * 0.95:
+            shards.append(current)
+            current, weight = [], 0.0
+    if current:
+        shards.append(current)
+    return shards
+
+
+def write_bed(regions, bed_file):
+    """Write regions as a BED file (FreeBayes --targets)."""
+    bed_file = Path(bed_file)
+    with bed_file.open("w") as f:
+        for r in regions:
+            f.write(f"{r.contig}\t{r.start}\t{r.end}\n")
+    return bed_file
@@ -0,0 +1,234 @@
+"""
+Single-pass, columnar VCF scanner for variant QC.
+
+scan_vcf() streams a .vcf/.vcf.gz in chunks through pandas' C parser, turns
+each chunk into NumPy arrays (position, QUAL, DP, allele lengths, FILTER,
+variant class) and accumulates every QC metric in one vectorised pass:
+variant class counts, Ts/Tv, indel length spectrum, FILTER and per-contig
+counts, and QUAL/DP distributions. Results are memoised on file identity, so
+qual_distribution() and count_variant_types() on the same file share a scan.
+"""
+import csv
+import functools
+import gzip
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from omics.telemetry import stage
+
+CHUNK_RECORDS = 250_000
+COLUMNS = ["chrom", "pos", "id", "ref", "alt", "qual", "filter", "info"]
+VARIANT_CLASSES = ("snp", "mnp", "insertion", "deletion", "complex", "other")
+
+
+@dataclass
+class VCFScan:
+    records: int = 0
+    alleles: int = 0
+    qual: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+    dp: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    variant_classes: Counter = field(default_factory=Counter)
+    transitions: int = 0
+    transversions: int = 0
+    indel_lengths: Counter = field(default_factory=Counter)
+    filters: Counter = field(default_factory=Counter)
+    contigs: Counter = field(default_factory=Counter)
+    contig_max_pos: dict = field(default_factory=dict)
+    # Per-allele counts as the original count_variant_types defined them:
+    # single-base REF and ALT is a SNP, anything else an indel.
+    snps: int = 0
+    indels: int = 0
+
+    @property
+    def ts_tv(self):
+        return self.transitions / self.transversions if self.transversions else float("nan")
+
+    def qual_histogram(self, bins=100):
+        values = self.qual[~np.isnan(self.qual)]
+        return np.histogram(values, bins=bins)
+
+    def summary(self):
+        """JSON-serialisable dict of all metrics."""
+        qual = self.qual[~np.isnan(self.qual)]
+        dp = self.dp[self.dp >= 0]
+        return {
+            "records": self.records,
+            "alleles": self.alleles,
+            "SNPs": self.snps,
+            "Indels": self.indels,
+            "variant_classes": {c: self.variant_classes.get(c, 0) for c in VARIANT_CLASSES},
+            "transitions": self.transitions,
+            "transversions": self.transversions,
+            "ts_tv": None if np.isnan(self.ts_tv) else round(self.ts_tv, 4),
+            "indel_lengths": {str(k): v for k, v in sorted(self.indel_lengths.items())},
+            "filters": dict(self.filters),
+            "contigs": {
+                name: {"records": n, "max_pos": self.contig_max_pos[name]}
+                for name, n in self.contigs.items()
+            },
+            "qual": _describe(qual),
+            "dp": _describe(dp),
+        }
+
+
+def _describe(values):
+    if values.size == 0:
+        return {"n": 0}
+    q = np.percentile(values, [5, 25, 50, 75, 95])
+    return {
+        "n": int(values.size),
+        "mean": round(float(values.mean()), 3),
+        "min": float(values.min()),
+        "p5": float(q[0]), "p25": float(q[1]), "median": float(q[2]),
+        "p75": float(q[3]), "p95": float(q[4]),
+        "max": float(values.max()),
+    }
+
+
+def _header_lines(vcf_file):
+    with open(vcf_file, "rb") as f:
+        opener = gzip.open if f.read(2) == b"\x1f\x8b" else open
+    n = 0
+    with opener(vcf_file, "rb") as f:
+        for line in f:
+            if not line.startswith(b"#"):
+                break
+            n += 1
+    return n
+
+
+# Base → 1 (purine) / 2 (pyrimidine) / 0 (anything else), for Ts/Tv
+_BASE_CLASS = np.zeros(256, dtype=np.int8)
+for _b in b"AGag":
+    _BASE_CLASS[_b] = 1
+for _b in b"CTct":
+    _BASE_CLASS[_b] = 2
+
+
+def _explode_alleles(ref, alt):
+    """One (REF, ALT) pair per ALT allele; only multi-allelic rows are split in Python."""
+    multi = np.char.find(alt, ",") >= 0
+    if not multi.any():
+        return ref, alt
+    split = [a.split(",") for a in alt[multi]]
+    counts = [len(a) for a in split]
+    ref = np.concatenate([ref[~multi], np.repeat(ref[multi], counts)])
+    alt = np.concatenate([alt[~multi], np.array([a for alts in split for a in alts])])
+    return ref, alt
+
+
+def _scan_chunk(scan, chunk, quals, dps):
+    scan.records += len(chunk)
+
+    quals.append(chunk["qual"].to_numpy(dtype=np.float32))
+
+    # DP value via the pandas string engine: fixed-width NumPy string arrays
+    # would be sized to the longest INFO field in the chunk
+    dp = chunk["info"].str.extract(r"(?:^|;)DP=(\d+)", expand=False)
+    dp = pd.to_numeric(dp, errors="coerce").fillna(-1).to_numpy(dtype=np.int32)
+    dps.append(dp)
+
+    # Few distinct FILTER strings: count them first, split after
+    for value, n in chunk["filter"].value_counts().items():
+        for f in value.split(";"):
+            scan.filters[f] += n
+    scan.contigs.update(chunk["chrom"].value_counts().to_dict())
+    for name, pos in chunk.groupby("chrom", sort=False)["pos"].max().items():
+        scan.contig_max_pos[name] = max(int(pos), scan.contig_max_pos.get(name, 0))
+
+    ref, alt = _explode_alleles(chunk["ref"].to_numpy(dtype=str),
+                                chunk["alt"].to_numpy(dtype=str))
+    rl = np.char.str_len(ref)
+    al = np.char.str_len(alt)
+    scan.alleles += len(alt)
+
+    legacy_snp = (rl == 1) & (al == 1)
+    scan.snps += int(legacy_snp.sum())
+    scan.indels += int((~legacy_snp).sum())
+
+    symbolic = alt == "."
+    for char in "<[]*":
+        symbolic |= np.char.find(alt, char) >= 0
+    snp = ~symbolic & legacy_snp
+    mnp = ~symbolic & (rl == al) & (rl > 1)
+    ins = ~symbolic & (al > rl) & (rl == 1)
+    dele = ~symbolic & (al < rl) & (al == 1)
+    complex_ = ~symbolic & ~(snp | mnp | ins | dele)
+    for name, mask in zip(VARIANT_CLASSES, (snp, mnp, ins, dele, complex_, symbolic)):
+        scan.variant_classes[name] += int(mask.sum())
+
+    ref_class = _BASE_CLASS[ref[snp].astype("S1").view(np.uint8)]
+    alt_class = _BASE_CLASS[alt[snp].astype("S1").view(np.uint8)]
+    called = (ref_class > 0) & (alt_class > 0)
+    scan.transitions += int((called & (ref_class == alt_class)).sum())
+    scan.transversions += int((called & (ref_class != alt_class)).sum())
+
+    indel = ins | dele
+    lengths, counts = np.unique((al - rl)[indel], return_counts=True)
+    scan.indel_lengths.update(dict(zip(lengths.tolist(), counts.tolist())))
+
+
+@functools.lru_cache(maxsize=4)
+@stage("scan_vcf")
+def _scan_cached(path, identity, chunk_records):
+    scan = VCFScan()
+    quals, dps = [], []
+    reader = pd.read_csv(
+        path,
+        sep="\t",
+        header=None,
+        names=COLUMNS,
+        usecols=range(len(COLUMNS)),
+        skiprows=_header_lines(path),
+        dtype={"chrom": str, "pos": np.int64, "id": str, "ref": str, "alt": str,
+               "qual": np.float32, "filter": str, "info": str},
+        keep_default_na=False,
+        na_values={"qual": ["."]},
+        quoting=csv.QUOTE_NONE,
+        compression="gzip" if path.endswith(".gz") else None,
+        chunksize=chunk_records,
+    )
+    with reader:
+        for chunk in reader:
+            # A header-only VCF (no calls after filtering) yields one empty chunk
+            if chunk.empty:
+                continue
+            _scan_chunk(scan, chunk, quals, dps)
+
+    if quals:
+        scan.qual = np.concatenate(quals)
+        scan.dp = np.concatenate(dps)
+    return scan
+
+
+def scan_vcf(vcf_file, chunk_records=CHUNK_RECORDS):
+    """
+    Scan a VCF once and return all QC metrics.
+
+    Parameters:
+        vcf_file (str or Path): Path to input VCF (.vcf or .vcf.gz).
+        chunk_records (int): Records parsed per chunk; bounds parser memory.
+
+    Returns:
+        VCFScan: metrics and per-record QUAL/DP arrays. Treat as read-only;
+            the same object is returned until the file changes.
+    """
+    path = Path(vcf_file).resolve()
+    if path.suffix == ".bcf":
+        raise ValueError(f"scan_vcf reads text VCF only, got: {vcf_file}")
+    st = path.stat()
+    identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    return _scan_cached(str(path), identity, chunk_records)
+
+
+def write_summary(vcf_file, output_file):
+    """Write the scan summary of vcf_file as JSON and return the output path."""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    output_file.write_text(json.dumps(scan_vcf(vcf_file).summary(), indent=2))
+    return output_file
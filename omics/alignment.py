@@ -0,0 +1,99 @@
+from pathlib import Path
+
+from omics.telemetry import run
+from omics.utils import run_pipeline
+from omics.resources import threads as resolve_threads
+from omics.resources import ALIGN_SORT_MEMORY_FRACTION
+from omics.resources import samtools_sort_args
+from omics.resources import split_threads
+from omics.scratch import temp_prefix
+from omics.read_trim import ADAPTER
+from omics.read_trim import cut_adapt_interleaved
+
+def alignment_index(fasta_path: Path):
+    """Run BWA-MEM2 index on a FASTA file if index files are missing."""
+    fasta_path = Path(fasta_path)
+    expected_extensions = [".0123", ".amb", ".ann", ".bwt.2bit.64", ".pac", ".sa"]
+    index_files = [fasta_path.with_suffix(fasta_path.suffix + ext) for ext in expected_extensions]
+
+    if all(f.exists() for f in index_files):
+        print(f"BWA-MEM2 index already exists for: {fasta_path}")
+        return
+
+    print(f"Indexing reference: {fasta_path}")
+    run(["bwa-mem2", "index", str(fasta_path)], check=True)
+
+
+def align_ends(reference: str, sequence1: str, sequence2: str, out_filename=None,
+               threads=None) -> str:
+    sam_file = Path(out_filename) if out_filename else Path("aln.sam")
+    print(f"Aligning reads → {sam_file}")
+    with sam_file.open("w") as out:
+        run([
+            "bwa-mem2", "mem", "-t", str(resolve_threads(threads)), reference,
+            sequence1, sequence2
+        ], stdout=out, check=True)
+    return str(sam_file)
+
+
+def align_sorted(reference: str, sequence1: str, sequence2: str, out_filename=None,
+                 threads=None) -> str:
+    """
+    Align paired reads and stream the aligner output straight into
+    `samtools sort`, so no SAM or unsorted BAM is written to disk.
+
+    Returns:
+        str: Path to the coordinate-sorted BAM (indexed, .bai alongside).
+    """
+    bam_file = Path(out_filename) if out_filename else Path("aln_sorted.bam")
+    tmp_prefix = temp_prefix("sort", default=bam_file.with_name(bam_file.stem + ".sort_tmp"))
+    print(f"Aligning and sorting reads → {bam_file}")
+    # Aligner and sorter run at once; the aligner is the bottleneck
+    align_t, sort_t = split_threads([3, 1], threads)
+    run_pipeline([
+        ["bwa-mem2", "mem", "-t", str(align_t), reference, sequence1, sequence2],
+        ["samtools", "sort", *samtools_sort_args(sort_t, ALIGN_SORT_MEMORY_FRACTION),
+         "-T", tmp_prefix,
+         "--write-index", "-o", f"{bam_file}##idx##{bam_file}.bai", "-"],
+    ])
+
+    if not bam_file.exists():
+        raise FileNotFoundError(f"BAM file not created: {bam_file}")
+    return str(bam_file)
+
+
+def trim_align_sorted(reference: str, sequence1: str, sequence2: str, report_file,
+                      out_filename=None, adapter=ADAPTER, threads=None) -> str:
+    """
+    Trim, align and sort in one pipe: cutadapt writes interleaved,
+    uncompressed reads to stdout, `bwa-mem2 mem -p` reads them from stdin
+    and `samtools sort` writes the indexed BAM. No trimmed FASTQ is
+    compressed, written or read back.
+
+    Parameters:
+        report_file (str or Path): Where cutadapt's report is saved; put it
+            in the QC directory for MultiQC.
+
+    Returns:
+        str: Path to the coordinate-sorted BAM (indexed, .bai alongside).
+    """
+    bam_file = Path(out_filename) if out_filename else Path("aln_sorted.bam")
+    report_file = Path(report_file)
+    report_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_prefix = temp_prefix("sort", default=bam_file.with_name(bam_file.stem + ".sort_tmp"))
+    print(f"Trimming, aligning and sorting reads → {bam_file}")
+    # The aligner is the bottleneck; trimming keeps up with about a quarter of the cores
+    trim_t, align_t, sort_t = split_threads([1, 3, 1], threads)
+    with report_file.open("w") as report:
+        run_pipeline([
+            cut_adapt_interleaved(sequence1, sequence2, adapter=adapter, threads=trim_t),
+            ["bwa-mem2", "mem", "-t", str(align_t), "-p", reference, "-"],
+            ["samtools", "sort", *samtools_sort_args(sort_t, ALIGN_SORT_MEMORY_FRACTION),
+             "-T", tmp_prefix,
+             "--write-index", "-o", f"{bam_file}##idx##{bam_file}.bai", "-"],
+        ], stderr={0: report})
+    print(f"Trimming report: {report_file}")
+
+    if not bam_file.exists():
+        raise FileNotFoundError(f"BAM file not created: {bam_file}")
+    return str(bam_file)
@@ -0,0 +1,245 @@
+"""
+Pure-Python reader for BGZF, the blocked gzip used by bgzip, BAM, BCF and tabix.
+
+A BGZF file is a series of gzip members of at most 64 KiB uncompressed data,
+each recording its compressed size in a 'BC' extra field, so any block can be
+decompressed on its own. A '.gzi' index (bgzip -i, samtools faidx) maps
+compressed block offsets to uncompressed offsets, which gives random access
+by uncompressed position; BAI/CSI/tabix use 'virtual offsets' instead
+(compressed block offset << 16 | offset within the block).
+"""
+import bisect
+import struct
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+HEADER_SIZE = 18  # fixed gzip header + XLEN + the 'BC' subfield
+MAX_BLOCK_SIZE = 1 << 16
+CACHE_BLOCKS = 64  # decompressed blocks kept per reader, up to 4 MiB
+
+
+class BGZFError(ValueError):
+    """The data is not valid BGZF."""
+
+
+def is_bgzf(path):
+    """True if path starts with a BGZF block header."""
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    return (len(header) == HEADER_SIZE and header[:4] == BGZF_MAGIC
+            and header[12:14] == b"BC")
+
+
+def read_block(f, offset):
+    """
+    Decompress the block starting at compressed offset `offset` of an open file.
+
+    Returns:
+        tuple: (data, next_offset). data is b"" at end of file; the empty
+            end-of-file marker block also yields b"".
+    """
+    f.seek(offset)
+    header = f.read(12)
+    if not header:
+        return b"", offset
+    if len(header) < 12 or header[:4] != BGZF_MAGIC:
+        raise BGZFError(f"No BGZF block at offset {offset}")
+    (xlen,) = struct.unpack("<H", header[10:12])
+    extra = f.read(xlen)
+
+    bsize = None
+    pos = 0
+    while pos + 4 <= len(extra):
+        si1, si2, slen = extra[pos], extra[pos + 1], struct.unpack("<H", extra[pos + 2:pos + 4])[0]
+        if si1 == 66 and si2 == 67 and slen == 2:  # 'BC'
+            (bsize,) = struct.unpack("<H", extra[pos + 4:pos + 6])
+        pos += 4 + slen
+    if bsize is None:
+        raise BGZFError(f"Block at offset {offset} has no BC field")
+
+    # BSIZE is the total block size minus one
+    remaining = bsize + 1 - 12 - xlen
+    body = f.read(remaining)
+    cdata, trailer = body[:-8], body[-8:]
+    crc, isize = struct.unpack("<II", trailer)
+    data = zlib.decompress(cdata, -15)
+    if len(data) != isize or zlib.crc32(data) != crc:
+        raise BGZFError(f"Corrupt BGZF block at offset {offset}")
+    return data, offset + bsize + 1
+
+
+def read_gzi(gzi_file):
+    """
+    Read a .gzi index.
+
+    Returns:
+        list of tuple: (compressed_offset, uncompressed_offset) for every
+            block, starting with (0, 0).
+    """
+    data = Path(gzi_file).read_bytes()
+    (n,) = struct.unpack_from("<Q", data)
+    values = struct.unpack_from(f"<{2 * n}Q", data, 8)
+    return [(0, 0)] + list(zip(values[0::2], values[1::2]))
+
+
+def split_virtual_offset(voffset):
+    """(compressed block offset, offset within the uncompressed block)."""
+    return voffset >> 16, voffset & 0xFFFF
+
+
+def make_virtual_offset(coffset, within):
+    return (coffset << 16) | within
+
+
+def read_bgzf_file(path):
+    """Decompress a whole (small) BGZF file, e.g. a .tbi or .csi index."""
+    parts = []
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            data, next_offset = read_block(f, offset)
+            if next_offset == offset:
+                break
+            parts.append(data)
+            offset = next_offset
+    return b"".join(parts)
+
+
+class BGZFReader:
+    """
+    Random-access reads from a BGZF file.
+
+    Reads by uncompressed offset need the .gzi index (built on first use if
+    missing, by scanning block headers); reads by virtual offset do not.
+    The cache_blocks most recently used blocks are kept decompressed, so
+    repeated and nearby reads (e.g. a batch of region queries) decompress
+    each block once.
+
+    seek_virtual(), read(), readline() and tell_virtual() give a file-like
+    cursor over virtual offsets, for walking the chunks of a BAI/CSI/tabix
+    index.
+    """
+
+    def __init__(self, path, gzi_file=None, cache_blocks=CACHE_BLOCKS):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._gzi_file = Path(gzi_file) if gzi_file else Path(f"{self.path}.gzi")
+        self._index = None
+        self._cache = OrderedDict()
+        self._cache_blocks = max(1, cache_blocks)
+        self._coffset = 0
+        self._within = 0
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def block(self, offset):
+        """Decompressed block at a compressed offset (cached) and the next block's offset."""
+        cached = self._cache.get(offset)
+        if cached is not None:
+            self._cache.move_to_end(offset)
+            return cached
+        cached = read_block(self._file, offset)
+        self._cache[offset] = cached
+        if len(self._cache) > self._cache_blocks:
+            self._cache.popitem(last=False)
+        return cached
+
+    @property
+    def index(self):
+        if self._index is None:
+            if self._gzi_file.exists():
+                self._index = read_gzi(self._gzi_file)
+            else:
+                self._index = self._scan_index()
+            self._uoffsets = [u for _, u in self._index]
+        return self._index
+
+    def _scan_index(self):
+        index, coffset, uoffset = [], 0, 0
+        while True:
+            data, next_offset = read_block(self._file, coffset)
+            if next_offset == coffset:
+                break
+            index.append((coffset, uoffset))
+            uoffset += len(data)
+            coffset = next_offset
+        return index or [(0, 0)]
+
+    def _read_from(self, coffset, within, length):
+        parts = []
+        while length > 0:
+            data, next_offset = self.block(coffset)
+            if next_offset == coffset:
+                break  # end of file
+            chunk = data[within:within + length]
+            parts.append(chunk)
+            length -= len(chunk)
+            within = 0
+            coffset = next_offset
+        return b"".join(parts)
+
+    def read_at(self, uoffset, length):
+        """Read length bytes starting at uncompressed offset uoffset."""
+        index = self.index
+        i = bisect.bisect_right(self._uoffsets, uoffset) - 1
+        coffset, block_start = index[i]
+        return self._read_from(coffset, uoffset - block_start, length)
+
+    def read_virtual(self, voffset, length):
+        """Read length bytes starting at a BAI/CSI/tabix virtual offset."""
+        coffset, within = split_virtual_offset(voffset)
+        return self._read_from(coffset, within, length)
+
+    # -- cursor ------------------------------------------------------------
+
+    def seek_virtual(self, voffset):
+        self._coffset, self._within = split_virtual_offset(voffset)
+
+    def tell_virtual(self):
+        return make_virtual_offset(self._coffset, self._within)
+
+    def _current(self):
+        """Block under the cursor, moving on to the next block at a block end."""
+        data, next_offset = self.block(self._coffset)
+        while self._within >= len(data) and next_offset != self._coffset:
+            self._coffset, self._within = next_offset, self._within - len(data)
+            data, next_offset = self.block(self._coffset)
+        return data
+
+    def read(self, length):
+        """Read length bytes at the cursor (fewer at end of file) and advance it."""
+        parts = []
+        while length > 0:
+            data = self._current()
+            chunk = data[self._within:self._within + length]
+            if not chunk:
+                break
+            parts.append(chunk)
+            self._within += len(chunk)
+            length -= len(chunk)
+        return b"".join(parts)
+
+    def readline(self):
+        """Read up to and including the next newline; b"" at end of file."""
+        parts = []
+        while True:
+            data = self._current()
+            if self._within >= len(data):
+                break
+            end = data.find(b"\n", self._within)
+            if end >= 0:
+                parts.append(data[self._within:end + 1])
+                self._within = end + 1
+                break
+            parts.append(data[self._within:])
+            self._within = len(data)
+        return b"".join(parts)
@@ -0,0 +1,166 @@
+"""
+Command-line entry point for the pipeline, installed as `omics`.
+
+Every command imports the modules it needs when it runs, and those modules
+import pandas, matplotlib and pysradb only inside the functions that plot or
+fetch metadata, so a short per-sample job does not pay for them:
+
+    omics run --accession SRR34533466 --reference <url> --out-dir yeast
+    omics run --reads r_1.fastq.gz r_2.fastq.gz --reference ref.fa --out-dir sample
+    omics batch manifest.tsv --reference <url> --out-dir runs
+    omics query variants_final.vcf.gz chrI:140,000-142,000
+    omics query aln_sorted_dedup.bam chrI:140000-142000 --count
+    omics metadata SRR34533466
+    omics cache list
+    omics reference list
+"""
+import argparse
+import importlib
+import sys
+from pathlib import Path
+
+# Commands that hand their arguments to an existing module's main()
+DELEGATED = {
+    "batch": ("genomics.batch", "Run a manifest of samples through the pipeline"),
+    "cache": ("omics.stepcache", "Inspect and evict pipeline step cache entries"),
+    "reference": ("omics.reference_registry", "Inspect and evict registered references"),
+}
+
+
+def cmd_run(args):
+    """One sample through reads, alignment, QC and variant calling (as genomics/main.py)."""
+    from genomics.read_alignment import align_reads
+    from genomics.sequence_acquisition import get_local_sequence
+    from genomics.sequence_acquisition import get_sequence
+    from genomics.variant_calling import call_variants
+    from omics.reference_registry import PIPELINE_INDEXES
+    from omics.reference_registry import get_registry
+    from omics.resources import configure
+    from omics.scratch import configure_scratch
+    from omics.scratch import scratch_session
+    from omics.stepcache import cached_step
+
+    configure(threads=args.threads, memory_mb=args.memory_mb)
+    configure_scratch(root=args.scratch_dir, high_water=args.scratch_high_water)
+    base_dir = args.out_dir
+    base_dir.mkdir(parents=True, exist_ok=True)
+
+    with scratch_session(base_dir.resolve().name or "run"):
+        if args.accession:
+            reads = cached_step("get_sequence", get_sequence, args.accession, base_dir=base_dir,
+                                do_trimming=not args.stream_trim,
+                                tools=["prefetch", "fasterq-dump", "cutadapt"])
+        else:
+            reads = cached_step("get_local_sequence", get_local_sequence, args.reads,
+                                base_dir=base_dir, do_trimming=not args.stream_trim,
+                                inputs=args.reads, tools=["cutadapt"])
+
+        registry = get_registry()
+        if Path(args.reference).exists():
+            fa_path = registry.reference(fasta_path=args.reference, indexes=PIPELINE_INDEXES)
+        else:
+            fa_path = registry.reference(url=args.reference, indexes=PIPELINE_INDEXES)
+
+        bam = cached_step("align_reads", align_reads, fa_path, *reads, base_dir=base_dir,
+                          trim=args.stream_trim, inputs=[fa_path, *reads],
+                          tools=["cutadapt", "bwa-mem2", "samtools"])
+        if not args.no_qc:
+            from genomics.quality_control import perform_qc
+            perform_qc(bam, fa_path, base_dir=base_dir)
+        final_vcf = call_variants(bam, fa_path, base_dir=base_dir, parquet=args.parquet)
+    print(final_vcf)
+    return 0
+
+
+def cmd_query(args):
+    """Print the records (or counts) overlapping regions of an indexed VCF or BAM."""
+    from omics.query import BAMQuery
+    from omics.query import VCFQuery
+    from omics.query import read_regions
+    from omics import telemetry
+    # Records go to stdout: keep the telemetry summary table out of it
+    telemetry.configure(quiet=True)
+    with telemetry.stage("query"):
+        regions = read_regions(args.regions[0]) if args.bed else args.regions
+        if args.file.suffix == ".bam":
+            with BAMQuery(args.file) as bam:
+                for region, records in bam.fetch_many(regions).items():
+                    if args.count:
+                        print(f"{region}\t{len(records)}")
+                        continue
+                    for rec in records:
+                        print(f"{rec.qname}\t{rec.flag}\t{rec.contig}\t{rec.pos + 1}\t"
+                              f"{rec.mapq}\t{rec.cigar_string}")
+        else:
+            with VCFQuery(args.file) as vcf:
+                if args.header and not args.count:
+                    sys.stdout.write(vcf.header_text)
+                for region in regions:
+                    if args.count:
+                        print(f"{region}\t{vcf.count(region)}")
+                        continue
+                    for line in vcf.lines(region):
+                        sys.stdout.write(line)
+    return 0
+
+
+def cmd_metadata(args):
+    """Print study and experiment metadata for SRA runs."""
+    from omics.downloader import sra_metadata
+
+    for accession in args.accessions:
+        sra_metadata(accession)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="omics", description="Omics processing pipeline.")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    run = sub.add_parser("run", help="Run one sample through the pipeline")
+    source = run.add_mutually_exclusive_group(required=True)
+    source.add_argument("--accession", help="SRA run accession")
+    source.add_argument("--reads", nargs=2, type=Path, metavar=("READ1", "READ2"))
+    run.add_argument("--reference", required=True, help="Reference FASTA URL or path")
+    run.add_argument("--out-dir", type=Path, default=Path("."))
+    run.add_argument("--threads", type=int)
+    run.add_argument("--memory-mb", type=int)
+    run.add_argument("--no-qc", action="store_true", help="Skip post-alignment QC")
+    run.add_argument("--parquet", action="store_true", help="Also export the final VCF to Parquet")
+    run.add_argument("--stream-trim", action="store_true",
+                     help="Trim in the alignment pipe instead of writing trimmed FASTQs")
+    run.add_argument("--scratch-dir", type=Path,
+                     help="Directory for intermediates (fast local disk or tmpfs)")
+    run.add_argument("--scratch-high-water", type=float,
+                     help="Hold new work while the scratch filesystem is fuller than this fraction")
+    run.set_defaults(func=cmd_run)
+
+    query = sub.add_parser("query", help="Records overlapping regions of an indexed VCF or BAM")
+    query.add_argument("file", type=Path, help=".vcf.gz (with .tbi/.csi) or .bam (with .bai/.csi)")
+    query.add_argument("regions", nargs="+", help="chr, chr:start-end (1-based) or, with --bed, a BED file")
+    query.add_argument("--bed", action="store_true", help="Regions come from a BED file")
+    query.add_argument("--count", action="store_true", help="Print a count per region")
+    query.add_argument("--header", action="store_true", help="Print the VCF header first")
+    query.set_defaults(func=cmd_query)
+
+    metadata = sub.add_parser("metadata", help="SRA study and experiment metadata")
+    metadata.add_argument("accessions", nargs="+")
+    metadata.set_defaults(func=cmd_metadata)
+
+    for name, (_, help_text) in DELEGATED.items():
+        sub.add_parser(name, help=help_text, add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in DELEGATED:
+        module = importlib.import_module(DELEGATED[argv[0]][0])
+        sys.argv[0] = f"omics {argv[0]}"
+        return module.main(argv[1:])
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
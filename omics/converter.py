@@ -0,0 +1,158 @@
+from pathlib import Path
+import json
+
+from omics.telemetry import run
+from omics.utils import run_pipeline
+from omics.resources import threads as resolve_threads
+from omics.resources import PIPE_SORT_MEMORY_FRACTION
+from omics.resources import samtools_sort_args
+from omics.resources import split_threads
+from omics.scratch import intermediate
+from omics.scratch import release
+from omics.scratch import temp_prefix
+
+def SAM_to_BAM(sam_file, threads=None):
+    bam_file = Path(sam_file).with_suffix(".bam")
+    print(f"Converting SAM to BAM: {sam_file} → {bam_file}")
+
+    if not Path(sam_file).exists():
+        raise FileNotFoundError(f"SAM file not found: {sam_file}")
+    if Path(sam_file).stat().st_size == 0:
+        raise ValueError(f"SAM file is empty: {sam_file}")
+
+    run(["samtools", "view", "-@", str(resolve_threads(threads)), "-b",
+         str(sam_file), "-o", str(bam_file)], check=True)
+
+    if not bam_file.exists():
+        raise FileNotFoundError(f"BAM file not created: {bam_file}")
+
+    release(sam_file)
+
+    return str(bam_file)
+
+
+def sort_bam(bam_file, threads=None):
+    sorted_bam_file = Path(bam_file).with_name(Path(bam_file).stem + "_sorted.bam")
+    print(f"Sorting BAM: {bam_file} → {sorted_bam_file}")
+    run(["samtools", "sort", *samtools_sort_args(threads),
+         "-T", temp_prefix("sort", default=sorted_bam_file.with_suffix(".sort_tmp")),
+         "-o", str(sorted_bam_file), str(bam_file)], check=True)
+
+    release(bam_file)
+
+    return str(sorted_bam_file)
+
+
+def index_bam(bam_file, threads=None):
+    print(f"Indexing BAM: {bam_file}")
+    run(["samtools", "index", "-@", str(resolve_threads(threads)), str(bam_file)],
+        check=True)
+
+def mark_duplicates(input_bam, pipeline=True, stats_file=None, threads=None, output_bam=None):
+    """
+    Mark and remove duplicates, returning the path of the indexed dedup BAM.
+
+    With pipeline=True, collate → fixmate → sort → markdup run as one pipe
+    with uncompressed BAM between stages, so only the final BAM is written.
+    pipeline=False runs the original one-file-per-pass workflow, with each
+    intermediate on scratch (see omics/scratch.py) and deleted as soon as the
+    next pass has read it. The input BAM is released once it has been read.
+
+    markdup statistics are written as JSON to stats_file
+    (default '<dedup>.markdup.json'); see markdup_stats().
+    output_bam defaults to '<input>_dedup.bam' next to the input.
+    """
+    input_bam = Path(input_bam)
+    dedup_bam = Path(output_bam) if output_bam else input_bam.with_name(input_bam.stem + "_dedup.bam")
+    stats_file = Path(stats_file) if stats_file else dedup_bam.with_suffix(".markdup.json")
+    threads = resolve_threads(threads)
+    t = str(threads)
+
+    if pipeline:
+        return _mark_duplicates_pipe(input_bam, dedup_bam, stats_file, threads)
+
+    name_sorted = intermediate(dedup_bam.with_name(input_bam.stem + "_namesort.bam"))
+    fixmate_bam = intermediate(dedup_bam.with_name(input_bam.stem + "_fixmate.bam"))
+    coord_sorted = intermediate(dedup_bam.with_name(input_bam.stem + "_coord.bam"))
+    tmp_prefix = dedup_bam.with_name(dedup_bam.stem + ".tmp")
+
+    print(f"Name-sorting BAM: {input_bam} → {name_sorted}")
+    run(["samtools", "sort", "-n", *samtools_sort_args(threads),
+         "-T", temp_prefix("namesort", default=f"{tmp_prefix}.namesort"),
+         "-o", str(name_sorted), str(input_bam)], check=True)
+    release(input_bam)
+
+    print(f"Fixing mates: {name_sorted} → {fixmate_bam}")
+    run(["samtools", "fixmate", "-@", t, "-m", str(name_sorted), str(fixmate_bam)], check=True)
+    release(name_sorted)
+
+    print(f"Coordinate-sorting fixed BAM: {fixmate_bam} → {coord_sorted}")
+    run(["samtools", "sort", *samtools_sort_args(threads),
+         "-T", temp_prefix("sort", default=f"{tmp_prefix}.sort"),
+         "-o", str(coord_sorted), str(fixmate_bam)], check=True)
+    release(fixmate_bam)
+
+    print(f"Marking duplicates: {coord_sorted} → {dedup_bam}")
+    run(["samtools", "markdup", "-@", t, "-r", "-f", str(stats_file), "--json",
+         "-T", temp_prefix("markdup", default=f"{tmp_prefix}.markdup"),
+         str(coord_sorted), str(dedup_bam)], check=True)
+    release(coord_sorted)
+
+    print(f"Indexing final BAM: {dedup_bam}")
+    run(["samtools", "index", "-@", t, str(dedup_bam)], check=True)
+
+    return str(dedup_bam)
+
+
+def _mark_duplicates_pipe(input_bam, dedup_bam, stats_file, threads):
+    # The four stages run at once: split the threads, mostly to sort and to
+    # markdup (which compresses the final BAM)
+    collate_t, fixmate_t, sort_t, markdup_t = split_threads([1, 1, 3, 3], threads)
+    tmp_prefix = temp_prefix("markdup", default=dedup_bam.with_name(dedup_bam.stem + ".tmp"))
+    print(f"Marking duplicates (collate | fixmate | sort | markdup): {input_bam} → {dedup_bam}")
+    run_pipeline([
+        ["samtools", "collate", "-@", str(collate_t), "-O", "-u", "-T", f"{tmp_prefix}.collate",
+         str(input_bam)],
+        ["samtools", "fixmate", "-@", str(fixmate_t), "-m", "-u", "-", "-"],
+        ["samtools", "sort", *samtools_sort_args(sort_t, PIPE_SORT_MEMORY_FRACTION), "-u",
+         "-T", f"{tmp_prefix}.sort", "-"],
+        ["samtools", "markdup", "-@", str(markdup_t), "-r", "-T", f"{tmp_prefix}.markdup",
+         "-f", str(stats_file), "--json", "--write-index",
+         "-", f"{dedup_bam}##idx##{dedup_bam}.bai"],
+    ])
+
+    if not dedup_bam.exists():
+        raise FileNotFoundError(f"BAM file not created: {dedup_bam}")
+
+    release(input_bam)
+
+    return str(dedup_bam)
+
+
+def markdup_stats(stats_file):
+    """
+    Read `samtools markdup -f` statistics into a dict.
+
+    Accepts both the --json output and the plain 'KEY: value' text report.
+    Numeric values are returned as int/float.
+    """
+    text = Path(stats_file).read_text()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    stats = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        value = value.strip()
+        try:
+            stats[key.strip()] = int(value)
+        except ValueError:
+            try:
+                stats[key.strip()] = float(value)
+            except ValueError:
+                stats[key.strip()] = value
+    return stats
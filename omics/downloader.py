@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from omics.telemetry import run
+from omics.resources import threads as resolve_threads
+from omics.fetch import DEFAULT_SEGMENTS
+from omics.fetch import download
+
+def sra_metadata(identifier):
+    """Query and print study and experiment metadata for a given SRA run."""
+    from pysradb.sraweb import SRAweb  # slow to import; only metadata lookups need it
+
+    db = SRAweb()
+    df = db.sra_metadata(identifier, detailed=True)
+    print(df[['study_accession', 'experiment_accession']])
+    return df
+
+def download_sra(identifier, raw_dir):
+    """Download .sra file and extract compressed FASTQ files to raw_dir."""
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    print(f"\nDownloading data for {identifier}...")
+    run(["prefetch", identifier], check=True)
+    run(["fasterq-dump", identifier, "--split-files",
+         "--threads", str(resolve_threads()), "-O", str(raw_dir)], check=True)
+    print("FASTQ download and extraction complete.")
+
+def download_reference_genome(url: str, filename: str, target_dir="ref",
+                              checksum: str = None, segments: int = DEFAULT_SEGMENTS) -> Path:
+    """
+    Download the reference genome FASTA to a target directory.
+
+    The transfer is resumable, uses parallel byte ranges where the server
+    supports them and is verified against checksum (or a checksum published
+    next to the file) before it is renamed into place, so an existing file
+    is always complete.
+    """
+    ref_dir = Path(target_dir)
+    ref_dir.mkdir(parents=True, exist_ok=True)
+    dest_path = ref_dir / filename
+    return download(url, dest_path, checksum=checksum, segments=segments)
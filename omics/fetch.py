@@ -0,0 +1,447 @@
+"""
+Resumable, checksum-verified downloads over HTTP(S) and FTP.
+
+download() writes to '<dest>.part' and only renames it to dest once the
+transfer is complete and its checksum matches, so a file at dest is always
+whole. When the server accepts byte ranges the file is fetched as parallel
+segments written in place with os.pwrite; progress is recorded in
+'<dest>.part.json' and an interrupted download resumes from where each
+segment stopped, provided the remote size and ETag/Last-Modified are
+unchanged. Servers without ranges fall back to a single stream, which
+also resumes with a Range request (or FTP REST) when it can.
+
+A verified dest gets a '<dest>.verified.json' sidecar recording the checksum
+with the file's size and mtime; while those match, a later call returns dest
+without re-hashing it or looking up the published checksum. An existing dest
+that fails its checksum is moved to '<dest>.bad' and fetched again.
+
+Checksums are given as 'md5:<hex>', 'sha256:<hex>', 'sum:<checksum> <blocks>'
+(BSD sum, as in Ensembl CHECKSUMS files) or a bare MD5/SHA-256 hex digest.
+Without one, a published checksum is looked up next to the file: '<url>.md5',
+'<url>.sha256', 'md5checksums.txt' (NCBI) and 'CHECKSUMS' (Ensembl).
+"""
+import ftplib
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+from omics.telemetry import run
+
+DEFAULT_SEGMENTS = 4
+MIN_SEGMENT_BYTES = 8 << 20
+CHUNK_BYTES = 1 << 20
+STATE_EVERY_BYTES = 16 << 20
+USER_AGENT = "omics-processing-fetch"
+# Network errors worth another attempt; a truncated HTTP body is an IncompleteRead
+RETRY_ERRORS = (urllib.error.URLError, OSError, http.client.HTTPException,
+                EOFError, ftplib.error_temp, ftplib.error_reply)
+
+
+class ChecksumError(RuntimeError):
+    """The downloaded file does not match the expected checksum."""
+
+
+def _request(url, method="GET", headers=None):
+    return urllib.request.Request(url, method=method,
+                                  headers={"User-Agent": USER_AGENT, **(headers or {})})
+
+
+def remote_info(url, timeout=60):
+    """
+    Size, range support and validators of a remote file.
+
+    Returns:
+        dict: size (int or None), ranges (bool), etag, last_modified.
+    """
+    info = {"size": None, "ranges": False, "etag": None, "last_modified": None}
+    scheme = urllib.parse.urlparse(url).scheme
+    if scheme == "ftp":
+        return _ftp_info(url, info, timeout)
+    if scheme not in ("http", "https"):
+        return info
+    try:
+        with urllib.request.urlopen(_request(url, "HEAD"), timeout=timeout) as resp:
+            headers = resp.headers
+    except urllib.error.HTTPError as err:
+        if err.code not in (403, 405, 501):
+            raise
+        # No HEAD: ask for the first byte instead
+        with urllib.request.urlopen(_request(url, headers={"Range": "bytes=0-0"}),
+                                    timeout=timeout) as resp:
+            headers = resp.headers
+            if resp.status == 206:
+                info["ranges"] = True
+                total = headers.get("Content-Range", "").rpartition("/")[2]
+                info["size"] = int(total) if total.isdigit() else None
+    if info["size"] is None and headers.get("Content-Length"):
+        info["size"] = int(headers["Content-Length"])
+    info["ranges"] = info["ranges"] or headers.get("Accept-Ranges", "").lower() == "bytes"
+    info["etag"] = headers.get("ETag")
+    info["last_modified"] = headers.get("Last-Modified")
+    return info
+
+
+def _ftp_connect(url, timeout):
+    """Logged-in FTP connection in binary mode, and the path of url on it."""
+    parts = urllib.parse.urlparse(url)
+    ftp = ftplib.FTP(timeout=timeout)
+    ftp.connect(parts.hostname, parts.port or 21)
+    ftp.login(urllib.parse.unquote(parts.username or "anonymous"),
+              urllib.parse.unquote(parts.password or "anonymous@"))
+    ftp.voidcmd("TYPE I")
+    return ftp, urllib.parse.unquote(parts.path)
+
+
+def _ftp_info(url, info, timeout):
+    """remote_info() over FTP: SIZE, MDTM and whether REST (resume) is accepted."""
+    ftp, path = _ftp_connect(url, timeout)
+    try:
+        info["size"] = ftp.size(path)
+        try:
+            info["last_modified"] = ftp.sendcmd(f"MDTM {path}").split()[-1]
+        except ftplib.error_perm:
+            pass
+        try:
+            ftp.sendcmd("REST 0")
+            info["ranges"] = True
+        except ftplib.error_perm:
+            pass
+    finally:
+        ftp.close()
+    return info
+
+
+def _parse_checksum(checksum):
+    """'algo:value' from a user-supplied checksum string."""
+    if ":" in checksum:
+        algo, value = checksum.split(":", 1)
+        return algo.lower(), value.strip().lower()
+    value = checksum.strip().lower()
+    algo = {32: "md5", 40: "sha1", 64: "sha256"}.get(len(value))
+    if algo is None:
+        raise ValueError(f"Cannot tell the algorithm of checksum {checksum!r}")
+    return algo, value
+
+
+def file_checksum(path, algo):
+    """Checksum of a local file in the given algorithm ('sum' uses BSD sum)."""
+    if algo == "sum":
+        # BSD checksum and 1 KiB block count, e.g. '12345 678'
+        out = run(["sum", "-r", str(path)], capture_output=True,
+                  text=True, check=True).stdout.split()
+        return f"{int(out[0])} {int(out[1])}"
+    digest = hashlib.new(algo)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fetch_text(url, timeout=60):
+    try:
+        with urllib.request.urlopen(_request(url), timeout=timeout) as resp:
+            return resp.read(1 << 22).decode(errors="replace")
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def published_checksum(url, timeout=60):
+    """
+    Look for a checksum published next to url.
+
+    Returns:
+        str or None: e.g. 'md5:<hex>' or 'sum:<checksum> <blocks>'.
+    """
+    base, _, name = url.rpartition("/")
+    for suffix, algo in ((".md5", "md5"), (".sha256", "sha256")):
+        text = _fetch_text(url + suffix, timeout)
+        if text and text.split():
+            return f"{algo}:{text.split()[0].lower()}"
+
+    text = _fetch_text(f"{base}/md5checksums.txt", timeout)
+    for line in (text or "").splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[1].rpartition("/")[2] == name:
+            return f"md5:{fields[0].lower()}"
+
+    text = _fetch_text(f"{base}/CHECKSUMS", timeout)
+    for line in (text or "").splitlines():
+        fields = line.split()
+        if len(fields) == 3 and fields[2] == name:
+            return f"sum:{int(fields[0])} {int(fields[1])}"
+    return None
+
+
+def verify_checksum(path, checksum):
+    """Raise ChecksumError unless path matches checksum."""
+    algo, expected = _parse_checksum(checksum)
+    actual = file_checksum(path, algo)
+    if actual != expected:
+        raise ChecksumError(f"{path}: {algo} {actual} != expected {expected}")
+    print(f"Checksum OK ({algo}): {Path(path).name}")
+
+
+def _verified_path(dest):
+    return dest.with_name(dest.name + ".verified.json")
+
+
+def _verified_checksum(dest):
+    """
+    Checksum recorded when dest was last verified ('' if it had none to
+    verify against), or None if dest has changed since or was never recorded.
+    """
+    try:
+        saved = json.loads(_verified_path(dest).read_text())
+    except (OSError, ValueError):
+        return None
+    st = dest.stat()
+    if saved.get("size") != st.st_size or saved.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return saved.get("checksum") or ""
+
+
+def _record_verified(dest, checksum):
+    st = dest.stat()
+    if checksum:
+        checksum = ":".join(_parse_checksum(checksum))
+    _verified_path(dest).write_text(json.dumps(
+        {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "checksum": checksum}))
+
+
+class _State:
+    """Per-segment progress of a .part file, saved as JSON next to it."""
+
+    def __init__(self, path, url, info, segments):
+        self.path = Path(path)
+        self.url = url
+        self.info = info
+        self.segments = segments  # [start, end (exclusive), bytes done]
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load_or_create(cls, path, url, info, n_segments, part_exists):
+        path = Path(path)
+        if part_exists and path.exists():
+            try:
+                saved = json.loads(path.read_text())
+            except ValueError:
+                saved = {}
+            same = all(saved.get(k) == info[k] for k in ("size", "etag", "last_modified"))
+            if saved.get("url") == url and same and saved.get("segments"):
+                print(f"Resuming download: {sum(s[2] for s in saved['segments'])}"
+                      f"/{info['size']} bytes present")
+                return cls(path, url, info, saved["segments"])
+
+        size = info["size"]
+        bounds = [round(i * size / n_segments) for i in range(n_segments + 1)]
+        return cls(path, url, info, [[s, e, 0] for s, e in zip(bounds, bounds[1:])])
+
+    def advance(self, index, n):
+        with self.lock:
+            self.segments[index][2] += n
+
+    def save(self):
+        with self.lock:
+            payload = {"url": self.url, **{k: self.info[k] for k in ("size", "etag", "last_modified")},
+                       "segments": self.segments}
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(payload))
+            os.replace(tmp, self.path)
+
+
+def _fetch_segment(url, fd, state, index, timeout, retries):
+    unsaved = 0
+    for attempt in range(retries + 1):
+        start, end, done = state.segments[index]
+        if start + done >= end:
+            return
+        headers = {"Range": f"bytes={start + done}-{end - 1}"}
+        try:
+            with urllib.request.urlopen(_request(url, headers=headers), timeout=timeout) as resp:
+                if resp.status != 206:
+                    raise IOError(f"Server ignored byte range for {url}")
+                offset = start + done
+                while offset < end:
+                    block = resp.read(min(CHUNK_BYTES, end - offset))
+                    if not block:
+                        break
+                    os.pwrite(fd, block, offset)
+                    offset += len(block)
+                    state.advance(index, len(block))
+                    unsaved += len(block)
+                    if unsaved >= STATE_EVERY_BYTES:
+                        state.save()
+                        unsaved = 0
+            if state.segments[index][0] + state.segments[index][2] >= end:
+                return
+        except RETRY_ERRORS as err:
+            if attempt == retries:
+                raise
+            wait = min(60, 2 ** attempt)
+            print(f"Segment {index} interrupted ({err!r}); retrying in {wait}s")
+            time.sleep(wait)
+        finally:
+            state.save()
+    raise IOError(f"Segment {index} of {url} incomplete after {retries} retries")
+
+
+def _download_segments(url, part, info, n_segments, timeout, retries):
+    state = _State.load_or_create(Path(f"{part}.json"), url, info, n_segments, part.exists())
+    fd = os.open(part, os.O_RDWR | os.O_CREAT)
+    try:
+        os.ftruncate(fd, info["size"])
+        errors = []
+
+        def worker(index):
+            try:
+                _fetch_segment(url, fd, state, index, timeout, retries)
+            except BaseException as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(len(state.segments))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        missing = sum(end - start - done for start, end, done in state.segments)
+        if missing:
+            raise IOError(f"Download of {url} is missing {missing} bytes; rerun to resume")
+    finally:
+        os.close(fd)
+    Path(f"{part}.json").unlink(missing_ok=True)
+
+
+def _stream_http(url, part, have, timeout):
+    headers = {"Range": f"bytes={have}-"} if have else {}
+    with urllib.request.urlopen(_request(url, headers=headers), timeout=timeout) as resp:
+        mode = "ab" if have and getattr(resp, "status", None) == 206 else "wb"
+        with open(part, mode) as out:
+            for block in iter(lambda: resp.read(CHUNK_BYTES), b""):
+                out.write(block)
+
+
+def _stream_ftp(url, part, have, timeout):
+    ftp, path = _ftp_connect(url, timeout)
+    try:
+        with open(part, "ab" if have else "wb") as out:
+            ftp.retrbinary(f"RETR {path}", out.write, blocksize=CHUNK_BYTES, rest=have or None)
+    finally:
+        ftp.close()
+
+
+def _download_stream(url, part, info, timeout, retries):
+    """Single stream; resumes with a Range request or FTP REST when the server allows it."""
+    # A partial file is only resumed if the remote file is unchanged
+    state_path = Path(f"{part}.json")
+    state = {"url": url, **{k: info[k] for k in ("size", "etag", "last_modified")}}
+    try:
+        saved = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        saved = None
+    if part.exists() and saved != state:
+        part.unlink()
+    state_path.write_text(json.dumps(state))
+
+    transfer = _stream_ftp if urllib.parse.urlparse(url).scheme == "ftp" else _stream_http
+    for attempt in range(retries + 1):
+        have = part.stat().st_size if part.exists() and info["ranges"] else 0
+        if info["size"] is not None and have >= info["size"]:
+            break
+        if have:
+            print(f"Resuming download: {have}/{info['size'] or '?'} bytes present")
+        try:
+            transfer(url, part, have, timeout)
+            if info["size"] is None or part.stat().st_size == info["size"]:
+                break
+        except RETRY_ERRORS as err:
+            if attempt == retries:
+                raise
+            wait = min(60, 2 ** attempt)
+            print(f"Download interrupted ({err!r}); retrying in {wait}s")
+            time.sleep(wait)
+    else:
+        raise IOError(f"Download of {url} incomplete after {retries} retries")
+    state_path.unlink(missing_ok=True)
+
+
+def download(url, dest, checksum=None, find_checksum=True, segments=DEFAULT_SEGMENTS,
+             timeout=60, retries=5):
+    """
+    Download url to dest, resumably and atomically.
+
+    Parameters:
+        url (str): http(s):// or ftp:// URL.
+        dest (str or Path): Final path; written only once complete and verified.
+        checksum (str, optional): Expected checksum (see module docstring).
+        find_checksum (bool): Without a checksum, look for a published one.
+        segments (int): Parallel byte-range segments when the server supports them.
+        timeout (int): Socket timeout in seconds.
+        retries (int): Retries per segment (or stream) after a network error.
+
+    Returns:
+        Path: dest.
+
+    Raises:
+        ChecksumError: if the download does not match. The partial file is
+            removed so the next attempt starts afresh. (An existing dest that
+            does not match is moved aside and downloaded again instead.)
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + ".part")
+
+    if dest.exists():
+        print(f"Found existing download: {dest}")
+        verified = _verified_checksum(dest)
+        if verified is not None and (checksum is None
+                                     or verified == ":".join(_parse_checksum(checksum))):
+            return dest
+
+    if checksum is None and find_checksum:
+        checksum = published_checksum(url, timeout)
+        if checksum:
+            print(f"Using published checksum {checksum} for {dest.name}")
+
+    if dest.exists():
+        if not checksum:
+            _record_verified(dest, None)
+            return dest
+        try:
+            verify_checksum(dest, checksum)
+            _record_verified(dest, checksum)
+            return dest
+        except ChecksumError as err:
+            bad = dest.with_name(dest.name + ".bad")
+            print(f"{err}; moving it to {bad.name} and downloading again")
+            os.replace(dest, bad)
+            _verified_path(dest).unlink(missing_ok=True)
+
+    info = remote_info(url, timeout)
+    n_segments = max(1, min(segments, (info["size"] or 0) // MIN_SEGMENT_BYTES))
+    print(f"Downloading: {url} → {dest}"
+          + (f" ({n_segments} segments)" if info["ranges"] and n_segments > 1 else ""))
+    # FTP resumes (REST) but is not split into segments
+    if info["ranges"] and info["size"] and not url.startswith("ftp:"):
+        _download_segments(url, part, info, n_segments, timeout, retries)
+    else:
+        _download_stream(url, part, info, timeout, retries)
+
+    if checksum:
+        try:
+            verify_checksum(part, checksum)
+        except ChecksumError:
+            part.unlink()
+            raise
+    os.replace(part, dest)
+    _record_verified(dest, checksum)
+    return dest
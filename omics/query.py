@@ -0,0 +1,483 @@
+"""
+Indexed region queries over bgzipped VCFs and BAMs, in-process.
+
+The tabix (.tbi) or CSI index of a .vcf.gz and the BAI (or CSI) of a BAM
+map a region to the few BGZF chunks that can hold overlapping records, so a
+locus or a gene is read in milliseconds instead of scanning the whole file:
+
+    with VCFQuery("vcf/variants_final.vcf.gz") as vcf:
+        for record in vcf.fetch("chrI:140,000-142,000"):
+            ...
+    with BAMQuery("aln_sorted_dedup.bam") as bam:
+        bam.count("chrI:140000-142000")
+        depth = bam.coverage("chrI:140000-142000")
+
+Regions are 'contig', 'contig:start-end' (1-based, inclusive, as in
+samtools/bcftools), regions.Region objects or (contig, start, end) tuples
+(0-based, end-exclusive). fetch_many() runs a batch of regions in file
+order; decompressed BGZF blocks are cached by the reader (bgzf.BGZFReader),
+so regions sharing blocks decompress them once.
+"""
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+from omics.bgzf import BGZFReader
+from omics.bgzf import read_bgzf_file
+from genomics.variants.header import parse_header_text
+from genomics.variants.regions import Region
+
+TBI_MAGIC = b"TBI\x01"
+CSI_MAGIC = b"CSI\x01"
+BAI_MAGIC = b"BAI\x01"
+BAM_MAGIC = b"BAM\x01"
+LINEAR_SHIFT = 14  # tabix/BAI linear index: one offset per 16 kb window
+
+# CIGAR operations that consume the reference: M, D, N, =, X
+_REF_OPS = (True, False, True, True, False, False, False, True, True, False)
+CIGAR_CHARS = "MIDNSHP=XB"
+SEQ_CHARS = "=ACMGRSVTWYHKDBN"
+
+
+def parse_region(region):
+    """Region (0-based, end-exclusive) from a string, Region or tuple; end None = contig end."""
+    if isinstance(region, Region):
+        return region
+    if isinstance(region, tuple):
+        contig, start, end = (tuple(region) + (None, None))[:3]
+        return Region(contig, start or 0, end)
+    contig, sep, span = region.rpartition(":")
+    if not sep or "-" not in span and not span.replace(",", "").isdigit():
+        return Region(region, 0, None)
+    start, _, end = span.replace(",", "").partition("-")
+    return Region(contig, max(0, int(start) - 1), int(end) if end else None)
+
+
+def read_regions(regions):
+    """Regions from a BED file path, or an iterable of region strings/Regions/tuples."""
+    if isinstance(regions, (str, Path)) and Path(regions).exists():
+        parsed = []
+        with open(regions) as f:
+            for line in f:
+                if line.strip() and not line.startswith(("#", "track", "browser")):
+                    contig, start, end = line.split("\t")[:3]
+                    parsed.append(Region(contig, int(start), int(end)))
+        return parsed
+    return [parse_region(r) for r in regions]
+
+
+# -- indexes -------------------------------------------------------------------
+
+def reg2bins(beg, end, min_shift=LINEAR_SHIFT, depth=5):
+    """Bins that may hold records overlapping [beg, end), for any BAI/tabix/CSI binning."""
+    bins = []
+    end -= 1
+    shift, offset = min_shift + depth * 3, 0
+    for level in range(depth + 1):
+        bins.extend(range(offset + (beg >> shift), offset + (end >> shift) + 1))
+        offset += 1 << (level * 3)
+        shift -= 3
+    return bins
+
+
+@dataclass
+class _Reference:
+    bins: dict      # bin → list of (chunk_beg, chunk_end) virtual offsets
+    linear: list    # tabix/BAI: minimum virtual offset per 16 kb window
+    loffset: dict   # CSI: bin → minimum virtual offset of its records
+
+
+class BinningIndex:
+    """A parsed tabix, CSI or BAI index."""
+
+    def __init__(self, references, min_shift=LINEAR_SHIFT, depth=5, names=None):
+        self.references = references
+        self.min_shift = min_shift
+        self.depth = depth
+        self.names = names or []
+
+    @classmethod
+    def read(cls, path):
+        path = Path(path)
+        raw = path.read_bytes()
+        data = raw if raw[:4] == BAI_MAGIC else read_bgzf_file(path)
+        magic = data[:4]
+        if magic == BAI_MAGIC:
+            return cls._parse_bai_or_tbi(data, 4, names=None)
+        if magic == TBI_MAGIC:
+            (n_ref,) = struct.unpack_from("<i", data, 4)
+            names, pos = _tabix_names(data, 8)
+            return cls._parse_bai_or_tbi(data, pos, names=names, n_ref=n_ref)
+        if magic == CSI_MAGIC:
+            return cls._parse_csi(data)
+        raise ValueError(f"Not a tabix, CSI or BAI index: {path}")
+
+    @classmethod
+    def _parse_bai_or_tbi(cls, data, pos, names, n_ref=None):
+        if n_ref is None:
+            (n_ref,) = struct.unpack_from("<i", data, pos)
+            pos += 4
+        references = []
+        for _ in range(n_ref):
+            (n_bin,) = struct.unpack_from("<i", data, pos)
+            pos += 4
+            bins = {}
+            for _ in range(n_bin):
+                bin_id, n_chunk = struct.unpack_from("<Ii", data, pos)
+                pos += 8
+                chunks = struct.unpack_from(f"<{2 * n_chunk}Q", data, pos)
+                pos += 16 * n_chunk
+                bins[bin_id] = list(zip(chunks[0::2], chunks[1::2]))
+            (n_intv,) = struct.unpack_from("<i", data, pos)
+            pos += 4
+            linear = list(struct.unpack_from(f"<{n_intv}Q", data, pos))
+            pos += 8 * n_intv
+            references.append(_Reference(bins, linear, {}))
+        return cls(references, names=names)
+
+    @classmethod
+    def _parse_csi(cls, data):
+        min_shift, depth, l_aux = struct.unpack_from("<iii", data, 4)
+        aux = data[16:16 + l_aux]
+        pos = 16 + l_aux
+        # bcftools/tabix write the tabix header (with contig names) as aux
+        names = _tabix_names(aux, 0)[0] if l_aux >= 28 else None
+        (n_ref,) = struct.unpack_from("<i", data, pos)
+        pos += 4
+        references = []
+        for _ in range(n_ref):
+            (n_bin,) = struct.unpack_from("<i", data, pos)
+            pos += 4
+            bins, loffset = {}, {}
+            for _ in range(n_bin):
+                bin_id, lo, n_chunk = struct.unpack_from("<IQi", data, pos)
+                pos += 16
+                chunks = struct.unpack_from(f"<{2 * n_chunk}Q", data, pos)
+                pos += 16 * n_chunk
+                bins[bin_id] = list(zip(chunks[0::2], chunks[1::2]))
+                loffset[bin_id] = lo
+            references.append(_Reference(bins, [], loffset))
+        return cls(references, min_shift=min_shift, depth=depth, names=names)
+
+    def chunks(self, tid, beg, end):
+        """Merged, sorted (beg, end) virtual offset chunks that may overlap [beg, end)."""
+        if tid < 0 or tid >= len(self.references):
+            return []
+        ref = self.references[tid]
+        end = min(end, 1 << (self.min_shift + 3 * self.depth))
+        # Chunks ending before this offset cannot hold overlapping records
+        if ref.linear:
+            min_offset = ref.linear[min(beg >> LINEAR_SHIFT, len(ref.linear) - 1)]
+        else:
+            leaf = reg2bins(beg, beg + 1, self.min_shift, self.depth)
+            min_offset = 0
+            for bin_id in reversed(leaf):
+                if bin_id in ref.loffset:
+                    min_offset = ref.loffset[bin_id]
+                    break
+
+        chunks = []
+        max_bin = ((1 << (3 * (self.depth + 1))) - 1) // 7
+        for bin_id in reg2bins(beg, end, self.min_shift, self.depth):
+            if bin_id < max_bin:
+                chunks.extend(c for c in ref.bins.get(bin_id, ()) if c[1] > min_offset)
+        chunks.sort()
+
+        merged = []
+        for chunk_beg, chunk_end in chunks:
+            chunk_beg = max(chunk_beg, min_offset)
+            if merged and chunk_beg <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], chunk_end)
+            else:
+                merged.append([chunk_beg, chunk_end])
+        return [tuple(c) for c in merged]
+
+
+def _tabix_names(data, pos):
+    """Contig names from a tabix header (format .. l_nm, names); returns (names, next pos)."""
+    _fmt, _col_seq, _col_beg, _col_end, _meta, _skip, l_nm = struct.unpack_from("<7i", data, pos)
+    pos += 28
+    names = data[pos:pos + l_nm].split(b"\0")[:-1]
+    return [n.decode() for n in names], pos + l_nm
+
+
+def find_index(path, suffixes):
+    """First existing '<path><suffix>' (or '<stem><suffix>'), else FileNotFoundError."""
+    path = Path(path)
+    for suffix in suffixes:
+        for candidate in (Path(f"{path}{suffix}"), path.with_suffix(suffix)):
+            if candidate.exists():
+                return candidate
+    raise FileNotFoundError(f"No {'/'.join(suffixes)} index for {path}")
+
+
+class _IndexedFile:
+    """Common reader, index and batching for VCFQuery and BAMQuery."""
+
+    def __init__(self, path, index_file, cache_blocks):
+        self.path = Path(path)
+        self.index = BinningIndex.read(index_file)
+        self.reader = BGZFReader(self.path, cache_blocks=cache_blocks)
+
+    def close(self):
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fetch_many(self, regions):
+        """
+        Fetch a batch of regions in file order.
+
+        Returns:
+            dict: region as given → list of records.
+        """
+        parsed = {region: parse_region(region) for region in regions}
+        order = {name: i for i, name in enumerate(self.contigs)}
+        results = {}
+        for region, r in sorted(parsed.items(),
+                                key=lambda kv: (order.get(kv[1].contig, len(order)),
+                                                kv[1].start)):
+            results[region] = list(self.fetch(r))
+        return {region: results[region] for region in regions}
+
+
+# -- VCF -----------------------------------------------------------------------
+
+@dataclass
+class VCFRecord:
+    chrom: str
+    pos: int          # 1-based
+    id: str
+    ref: str
+    alt: list
+    qual: float       # None if '.'
+    filter: str
+    info: str
+    fields: list      # FORMAT and sample columns, unparsed
+
+    @property
+    def end(self):
+        """1-based inclusive end: REF length, or INFO/END for symbolic alleles."""
+        if self.alt and self.alt[0].startswith("<"):
+            for item in self.info.split(";"):
+                if item.startswith("END="):
+                    return int(item[4:])
+        return self.pos + len(self.ref) - 1
+
+    def info_dict(self):
+        """INFO as a dict of strings (True for flags)."""
+        if self.info == ".":
+            return {}
+        items = (item.partition("=") for item in self.info.split(";"))
+        return {k: v if sep else True for k, sep, v in items}
+
+
+def parse_vcf_line(line):
+    f = line.rstrip("\n").split("\t")
+    return VCFRecord(f[0], int(f[1]), f[2], f[3], f[4].split(","),
+                     None if f[5] == "." else float(f[5]), f[6], f[7], f[8:])
+
+
+class VCFQuery(_IndexedFile):
+    """
+    Region queries on a bgzipped VCF with a .tbi or .csi index (tabix,
+    bcftools index or bcftools --write-index).
+    """
+
+    def __init__(self, vcf_file, index_file=None, cache_blocks=64):
+        vcf_file = Path(vcf_file)
+        index_file = index_file or find_index(vcf_file, (".tbi", ".csi"))
+        super().__init__(vcf_file, index_file, cache_blocks)
+        self.header_text = self._header_text()
+        self.header = parse_header_text(self.header_text)
+        self.contigs = self.index.names or list(self.header.contigs)
+        self._tid = {name: i for i, name in enumerate(self.contigs)}
+
+    def _header_text(self):
+        self.reader.seek_virtual(0)
+        lines = []
+        while True:
+            line = self.reader.readline()
+            if not line.startswith(b"#"):
+                break
+            lines.append(line)
+            if line.startswith(b"#CHROM"):
+                break
+        return b"".join(lines).decode()
+
+    def lines(self, region):
+        """Raw VCF lines overlapping region."""
+        r = parse_region(region)
+        tid = self._tid.get(r.contig)
+        if tid is None:
+            return
+        end = r.end if r.end is not None else 1 << 62
+        for chunk_beg, chunk_end in self.index.chunks(tid, r.start, end):
+            self.reader.seek_virtual(chunk_beg)
+            while self.reader.tell_virtual() < chunk_end:
+                line = self.reader.readline()
+                if not line:
+                    break
+                if line.startswith(b"#"):
+                    continue
+                chrom, pos, _, ref, alt, _, _, info = line.split(b"\t", 8)[:8]
+                if chrom.decode() != r.contig:
+                    continue
+                beg = int(pos) - 1
+                if beg >= end:
+                    break  # records are sorted: nothing further in this chunk overlaps
+                rec_end = beg + len(ref)
+                if alt.startswith(b"<") and b"END=" in info:
+                    for item in info.split(b";"):
+                        if item.startswith(b"END="):
+                            rec_end = int(item[4:])
+                if rec_end > r.start:
+                    yield line.decode()
+
+    def fetch(self, region):
+        """VCFRecords overlapping region, in file order."""
+        for line in self.lines(region):
+            yield parse_vcf_line(line)
+
+    def count(self, region):
+        return sum(1 for _ in self.lines(region))
+
+
+# -- BAM -----------------------------------------------------------------------
+
+class BAMRecord:
+    """One alignment; sequence, qualities and tags are decoded on access."""
+
+    __slots__ = ("qname", "flag", "tid", "contig", "pos", "end", "mapq", "cigar",
+                 "next_tid", "next_pos", "tlen", "_data", "_seq_offset", "_l_seq")
+
+    @property
+    def seq(self):
+        import numpy as np
+
+        packed = np.frombuffer(self._data, dtype=np.uint8, count=(self._l_seq + 1) // 2,
+                               offset=self._seq_offset)
+        codes = np.empty(packed.size * 2, dtype=np.uint8)
+        codes[0::2], codes[1::2] = packed >> 4, packed & 0xF
+        return "".join(SEQ_CHARS[c] for c in codes[:self._l_seq])
+
+    @property
+    def qual(self):
+        import numpy as np
+
+        start = self._seq_offset + (self._l_seq + 1) // 2
+        return np.frombuffer(self._data, dtype=np.uint8, count=self._l_seq, offset=start)
+
+    @property
+    def cigar_string(self):
+        return "".join(f"{n}{CIGAR_CHARS[op]}" for op, n in self.cigar) or "*"
+
+    def aligned_blocks(self):
+        """(start, end) reference spans covered by M/=/X operations, 0-based."""
+        blocks, pos = [], self.pos
+        for op, n in self.cigar:
+            if op in (0, 7, 8):
+                blocks.append((pos, pos + n))
+            if _REF_OPS[op]:
+                pos += n
+        return blocks
+
+    def __repr__(self):
+        return (f"BAMRecord({self.qname}, flag={self.flag}, {self.contig}:{self.pos + 1}, "
+                f"mapq={self.mapq}, {self.cigar_string})")
+
+
+class BAMQuery(_IndexedFile):
+    """Region queries on a coordinate-sorted BAM with a .bai or .csi index."""
+
+    def __init__(self, bam_file, index_file=None, cache_blocks=64):
+        bam_file = Path(bam_file)
+        index_file = index_file or find_index(bam_file, (".bai", ".csi"))
+        super().__init__(bam_file, index_file, cache_blocks)
+        self._read_header()
+
+    def _read_header(self):
+        self.reader.seek_virtual(0)
+        if self.reader.read(4) != BAM_MAGIC:
+            raise ValueError(f"Not a BAM file: {self.path}")
+        (l_text,) = struct.unpack("<i", self.reader.read(4))
+        self.header_text = self.reader.read(l_text).rstrip(b"\0").decode()
+        (n_ref,) = struct.unpack("<i", self.reader.read(4))
+        self.contigs, self.lengths = [], []
+        for _ in range(n_ref):
+            (l_name,) = struct.unpack("<i", self.reader.read(4))
+            name = self.reader.read(l_name)[:-1].decode()
+            (l_ref,) = struct.unpack("<i", self.reader.read(4))
+            self.contigs.append(name)
+            self.lengths.append(l_ref)
+        self._tid = {name: i for i, name in enumerate(self.contigs)}
+
+    def _parse(self, data):
+        (tid, pos, l_read_name, mapq, _bin, n_cigar, flag, l_seq,
+         next_tid, next_pos, tlen) = struct.unpack_from("<iiBBHHHiiii", data, 0)
+        offset = 32
+        record = BAMRecord()
+        record.qname = data[offset:offset + l_read_name - 1].decode()
+        offset += l_read_name
+        ops = struct.unpack_from(f"<{n_cigar}I", data, offset)
+        offset += 4 * n_cigar
+        record.cigar = [(op & 0xF, op >> 4) for op in ops]
+        ref_len = sum(n for op, n in record.cigar if _REF_OPS[op])
+        record.flag, record.tid, record.pos, record.mapq = flag, tid, pos, mapq
+        record.contig = self.contigs[tid] if tid >= 0 else "*"
+        record.end = pos + max(ref_len, 1)
+        record.next_tid, record.next_pos, record.tlen = next_tid, next_pos, tlen
+        record._data, record._seq_offset, record._l_seq = data, offset, l_seq
+        return record
+
+    def fetch(self, region):
+        """BAMRecords overlapping region, in file order."""
+        r = parse_region(region)
+        tid = self._tid.get(r.contig)
+        if tid is None:
+            return
+        end = r.end if r.end is not None else self.lengths[tid]
+        for chunk_beg, chunk_end in self.index.chunks(tid, r.start, end):
+            self.reader.seek_virtual(chunk_beg)
+            while self.reader.tell_virtual() < chunk_end:
+                size = self.reader.read(4)
+                if len(size) < 4:
+                    break
+                (block_size,) = struct.unpack("<i", size)
+                record = self._parse(self.reader.read(block_size))
+                if record.tid != tid or record.pos >= end:
+                    break
+                if record.end > r.start:
+                    yield record
+
+    def count(self, region, flag_exclude=0):
+        return sum(1 for rec in self.fetch(region) if not rec.flag & flag_exclude)
+
+    def coverage(self, region, min_mapq=0, flag_exclude=0xF04):
+        """
+        Per-base depth over region from aligned (M/=/X) bases, like
+        samtools depth. flag_exclude defaults to unmapped, secondary,
+        QC-fail, duplicate and supplementary reads.
+
+        Returns:
+            numpy.ndarray: depth of each base of the region.
+        """
+        import numpy as np
+
+        r = parse_region(region)
+        tid = self._tid[r.contig]
+        end = r.end if r.end is not None else self.lengths[tid]
+        diff = np.zeros(end - r.start + 1, dtype=np.int32)
+        for rec in self.fetch(Region(r.contig, r.start, end)):
+            if rec.flag & flag_exclude or rec.mapq < min_mapq:
+                continue
+            for block_start, block_end in rec.aligned_blocks():
+                s, e = max(block_start, r.start), min(block_end, end)
+                if s < e:
+                    diff[s - r.start] += 1
+                    diff[e - r.start] -= 1
+        return np.cumsum(diff[:-1])
@@ -0,0 +1,63 @@
+from omics.telemetry import run
+from omics.resources import threads as resolve_threads
+
+ADAPTER = "AGATCGGAAGAGC"
+TRIM_OPTIONS = ["--quality-cutoff", "20", "--minimum-length", "30"]
+
+def cut_adapt(reads, trimmed_dir, adapter=ADAPTER, threads=None):
+    """Trim reads using cutadapt and output to trimmed_dir."""
+    trimmed_dir.mkdir(exist_ok=True)
+    if len(reads) == 2:
+        # Paired-end
+        out1 = trimmed_dir / f"{reads[0].stem}_trimmed.fastq.gz"
+        out2 = trimmed_dir / f"{reads[1].stem}_trimmed.fastq.gz"
+        cmd = [
+            "cutadapt", "-j", str(resolve_threads(threads)),
+            "-a", adapter, "-A", adapter,
+            "-o", str(out1), "-p", str(out2),
+            str(reads[0]), str(reads[1]),
+            *TRIM_OPTIONS
+        ]
+        outputs = [out1, out2]
+    else:
+        # Single-end
+        out1 = trimmed_dir / f"{reads[0].stem}_trimmed.fastq.gz"
+        cmd = [
+            "cutadapt", "-j", str(resolve_threads(threads)),
+            "-a", adapter,
+            "-o", str(out1), str(reads[0]),
+            *TRIM_OPTIONS
+        ]
+        outputs = [out1]
+
+    print("\nTrimming reads with cutadapt...")
+    run(cmd, check=True)
+    print("Trimming complete.")
+    return outputs
+
+def cut_adapt_interleaved(read1, read2, adapter=ADAPTER, threads=None):
+    """
+    cutadapt command that trims a read pair with the same settings as
+    cut_adapt() and writes uncompressed interleaved FASTQ to stdout, for
+    piping into an aligner. With the reads on stdout cutadapt writes its
+    report to stderr.
+    """
+    return [
+        "cutadapt", "-j", str(resolve_threads(threads)),
+        "-a", adapter, "-A", adapter, "--interleaved",
+        "-o", "-", str(read1), str(read2),
+        *TRIM_OPTIONS
+    ]
+
+def fastp_trim(read1, read2, out1, out2, threads=None):
+    print(f"\n⚡ Trimming reads with fastp...")
+    run([
+        "fastp",
+        "-i", read1, "-I", read2,
+        "-o", out1, "-O", out2,
+        "--detect_adapter_for_pe",
+        "--thread", str(resolve_threads(threads, cap=16)),
+        "--html", "fastp_report.html",
+        "--json", "fastp_report.json"
+    ], check=True)
+    print("fastp trimming + QC complete.")
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Reference FASTA preparation and random-access sequence fetch.
+
+References are kept bgzip-compressed. prepare_reference() recompresses a
+plain-gzip download to BGZF with multi-threaded bgzip and builds the .fai and
+.gzi indexes; samtools, bcftools, bwa-mem2 and GATK read that file directly.
+plain_fasta() materialises an uncompressed copy only for tools that need one
+(FreeBayes). FastaFile.fetch() gives Python code random access to either form.
+"""
+import fcntl
+import os
+import tempfile
+from pathlib import Path
+
+from omics.telemetry import run
+from omics.bgzf import BGZFReader
+from omics.bgzf import is_bgzf
+from omics.resources import threads as resolve_threads
+from omics.utils import run_pipeline
+
+
+def is_prepared(fasta_path):
+    """True if fasta_path is BGZF with .fai and .gzi, or plain with a .fai."""
+    fasta_path = Path(fasta_path)
+    if not fasta_path.exists() or not Path(f"{fasta_path}.fai").exists():
+        return False
+    if fasta_path.suffix == ".gz":
+        return Path(f"{fasta_path}.gzi").exists() and is_bgzf(fasta_path)
+    return True
+
+
+def prepare_reference(fasta_path, threads=None):
+    """
+    Make fasta_path a BGZF-compressed, faidx-indexed reference, in place.
+
+    A plain-gzip file is recompressed to BGZF (decompressed and compressed
+    by multi-threaded bgzip in one pipe, then renamed over the original); an
+    uncompressed FASTA is left as it is and only indexed.
+
+    Parameters:
+        fasta_path (str or Path): .fa, .fa.gz (gzip or BGZF) reference.
+        threads (int, optional): bgzip threads. Defaults to the resource budget.
+
+    Returns:
+        Path: fasta_path, with .fai (and .gzi if compressed) alongside.
+    """
+    fasta_path = Path(fasta_path)
+    if is_prepared(fasta_path):
+        print(f"Reference already prepared: {fasta_path}")
+        return fasta_path
+
+    threads = str(resolve_threads(threads))
+    if fasta_path.suffix == ".gz" and not is_bgzf(fasta_path):
+        print(f"Recompressing to BGZF: {fasta_path}")
+        tmp = fasta_path.with_name(fasta_path.name + ".bgzf.tmp")
+        with tmp.open("wb") as out:
+            run_pipeline([
+                ["bgzip", "-dc", "-@", threads, str(fasta_path)],
+                ["bgzip", "-c", "-@", threads],
+            ], stdout=out)
+        os.replace(tmp, fasta_path)
+        for stale in (Path(f"{fasta_path}.fai"), Path(f"{fasta_path}.gzi")):
+            stale.unlink(missing_ok=True)
+
+    print(f"Indexing FASTA: {fasta_path}")
+    run(["samtools", "faidx", str(fasta_path)], check=True)
+    return fasta_path
+
+
+def plain_fasta(fasta_path, threads=None):
+    """
+    Uncompressed, indexed copy of a compressed reference, for tools that
+    cannot read BGZF. The copy sits next to the original without '.gz' and
+    is reused while it is newer than the original. Concurrent callers for
+    the same reference wait on a lock file ('<copy>.lock') and the first one
+    builds the copy.
+
+    Returns:
+        Path: fasta_path itself if it is not compressed, else the copy.
+    """
+    fasta_path = Path(fasta_path)
+    if fasta_path.suffix != ".gz":
+        return fasta_path
+
+    plain = fasta_path.with_suffix("")
+    fai = Path(f"{plain}.fai")
+    with open(f"{plain}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if (plain.exists() and fai.exists()
+                and plain.stat().st_mtime >= fasta_path.stat().st_mtime):
+            return plain
+
+        print(f"Materialising uncompressed reference: {plain}")
+        fd, tmp = tempfile.mkstemp(prefix=f".{plain.name}.", suffix=".tmp", dir=plain.parent)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                run(["bgzip", "-dc", "-@", str(resolve_threads(threads)), str(fasta_path)],
+                    stdout=out, check=True)
+            os.chmod(tmp, 0o644)
+            fai.unlink(missing_ok=True)
+            os.replace(tmp, plain)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        run(["samtools", "faidx", str(plain)], check=True)
+    return plain
+
+
+def read_fai_index(fai_file):
+    """contig → (length, offset, line bases, line bytes) from a .fai file."""
+    index = {}
+    with open(fai_file) as f:
+        for line in f:
+            name, length, offset, line_bases, line_bytes = line.rstrip("\n").split("\t")[:5]
+            index[name] = (int(length), int(offset), int(line_bases), int(line_bytes))
+    return index
+
+
+class FastaFile:
+    """
+    Random-access sequence fetch from an indexed FASTA, plain or BGZF.
+
+        with FastaFile("ref/genome.fa.gz") as ref:
+            ref.fetch("chrI", 1000, 1060)
+    """
+
+    def __init__(self, fasta_path):
+        self.path = Path(fasta_path)
+        fai = Path(f"{self.path}.fai")
+        if not fai.exists():
+            raise FileNotFoundError(f"No .fai index for {self.path}; run prepare_reference()")
+        self.index = read_fai_index(fai)
+        if is_bgzf(self.path):
+            self._reader = BGZFReader(self.path)
+            self._read = self._reader.read_at
+        else:
+            self._reader = open(self.path, "rb")
+            self._read = self._read_plain
+
+    def _read_plain(self, offset, length):
+        self._reader.seek(offset)
+        return self._reader.read(length)
+
+    def close(self):
+        self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def contigs(self):
+        """contig → length, in file order."""
+        return {name: entry[0] for name, entry in self.index.items()}
+
+    def fetch(self, contig, start=0, end=None):
+        """
+        Sequence of contig[start:end] (0-based, end-exclusive), as in Region.
+
+        Raises:
+            KeyError: unknown contig.
+        """
+        length, offset, line_bases, line_bytes = self.index[contig]
+        end = length if end is None else min(end, length)
+        start = max(0, start)
+        if start >= end:
+            return ""
+
+        # Byte positions account for the newline(s) at the end of every line
+        first = offset + (start // line_bases) * line_bytes + start % line_bases
+        last = offset + ((end - 1) // line_bases) * line_bytes + (end - 1) % line_bases
+        raw = self._read(first, last - first + 1)
+        return raw.replace(b"\n", b"").replace(b"\r", b"").decode()
@@ -0,0 +1,355 @@
+"""
+Machine-wide registry of prepared references and their indexes.
+
+Each reference is stored once, keyed by the SHA-256 of its downloaded
+content, together with its .fai/.gzi, sequence dictionary, aligner indexes
+and (for FreeBayes) an uncompressed copy. Source URLs are recorded as
+aliases, so a second project asking for the same URL neither downloads nor
+indexes it again.
+
+    <root>/manifest.json           entries and URL aliases
+    <root>/refs/<hash>/            FASTA (BGZF) and every index built for it
+    <root>/downloads/              in-progress (resumable) downloads
+    <root>/locks/                  flock files
+
+Concurrent pipelines coordinate through flock: one downloads or builds an
+index while the others wait for it and then reuse the result. A process
+using an entry holds a shared lock on it until it exits, and eviction
+(least recently used first, down to a disk quota) skips entries in use.
+
+The root is OMICS_REFERENCE_REGISTRY (default ~/.cache/omics_references) and
+the quota OMICS_REFERENCE_QUOTA_GB (default: no limit).
+
+    omics reference list
+    omics reference evict [--quota-gb N]
+    omics reference remove <hash>
+"""
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from omics.telemetry import run
+from omics.alignment import alignment_index
+from omics.fetch import download
+from omics.reference import plain_fasta
+from omics.reference import prepare_reference
+
+DEFAULT_ROOT = Path(os.environ.get("OMICS_REFERENCE_REGISTRY",
+                                   Path.home() / ".cache" / "omics_references"))
+HASH_BLOCK = 1 << 20
+
+
+def content_hash(path):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _dir_size(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def _dict_path(fasta_path):
+    name = fasta_path.name
+    for suffix in (".gz", ".fa", ".fasta", ".fna"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return fasta_path.with_name(name + ".dict")
+
+
+def _build_dict(fasta_path):
+    run(["samtools", "dict", "-o", str(_dict_path(fasta_path)), str(fasta_path)],
+        check=True)
+
+
+# Index kind → builder; each runs once per entry under the entry's build lock
+# and what it writes counts towards the entry's size
+INDEX_BUILDERS = {
+    "dict": _build_dict,
+    "bwa-mem2": alignment_index,
+    "plain": plain_fasta,  # uncompressed copy for FreeBayes
+}
+# What the WGS pipeline needs: GATK's dictionary, the aligner index and FreeBayes' copy
+PIPELINE_INDEXES = ("dict", "bwa-mem2", "plain")
+
+
+class ReferenceRegistry:
+    def __init__(self, root=DEFAULT_ROOT, quota_gb=None):
+        self.root = Path(root)
+        self.manifest_path = self.root / "manifest.json"
+        if quota_gb is None and os.environ.get("OMICS_REFERENCE_QUOTA_GB"):
+            quota_gb = float(os.environ["OMICS_REFERENCE_QUOTA_GB"])
+        self.quota_bytes = int(quota_gb * 2**30) if quota_gb else None
+        self._held = {}
+
+    # -- locking -----------------------------------------------------------
+
+    @contextlib.contextmanager
+    def _lock(self, name, mode=fcntl.LOCK_EX):
+        lock_dir = self.root / "locks"
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        with open(lock_dir / f"{name}.lock", "w") as lock:
+            fcntl.flock(lock, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _hold(self, key):
+        """Hold a shared 'in use' lock on an entry until this process exits."""
+        if key in self._held:
+            return
+        lock_dir = self.root / "locks"
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        lock = open(lock_dir / f"use-{key}.lock", "w")
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        self._held[key] = lock
+
+    # -- manifest ----------------------------------------------------------
+
+    def load(self):
+        if not self.manifest_path.exists():
+            return {"entries": {}, "aliases": {}}
+        return json.loads(self.manifest_path.read_text())
+
+    def _save(self, manifest):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+        os.replace(tmp, self.manifest_path)
+
+    def _update(self, fn):
+        """Apply fn(manifest) under the manifest lock and save."""
+        with self._lock("manifest"):
+            manifest = self.load()
+            result = fn(manifest)
+            self._save(manifest)
+        return result
+
+    def _touch(self, key):
+        def touch(manifest):
+            entry = manifest["entries"].get(key)
+            if entry:
+                entry["last_used"] = time.time()
+        self._update(touch)
+
+    # -- entries -----------------------------------------------------------
+
+    def entry_dir(self, key):
+        return self.root / "refs" / key
+
+    def fasta(self, key):
+        """Path of an entry's FASTA."""
+        return self.entry_dir(key) / self.load()["entries"][key]["name"]
+
+    def _register(self, key, name, source):
+        def register(manifest):
+            entry = manifest["entries"].setdefault(key, {
+                "name": name, "sources": [], "indexes": [], "created": time.time(),
+            })
+            if source and source not in entry["sources"]:
+                entry["sources"].append(source)
+            if source:
+                manifest["aliases"][source] = key
+            entry["last_used"] = time.time()
+            entry["size"] = _dir_size(self.entry_dir(key))
+            return entry
+        return self._update(register)
+
+    def _ingest(self, path, source, move):
+        """Hash path and file it under its hash, unless that content is already registered."""
+        path = Path(path)
+        key = content_hash(path)
+        # Hold before checking, so the entry cannot be evicted once found
+        self._hold(key)
+        with self._lock(f"build-{key}"):
+            if key in self.load()["entries"]:
+                if move:
+                    path.unlink()
+            else:
+                entry_dir = self.entry_dir(key)
+                entry_dir.mkdir(parents=True, exist_ok=True)
+                target = entry_dir / path.name
+                if move:
+                    os.replace(path, target)
+                else:
+                    shutil.copy2(path, target)
+                prepare_reference(target)
+                print(f"[registry] Added {path.name} as {key[:12]}")
+            self._register(key, path.name, source)
+        return key
+
+    def add(self, fasta_path):
+        """Register a local FASTA (copied in) and hold it. Returns its content hash."""
+        fasta_path = Path(fasta_path).resolve()
+        key = self._ingest(fasta_path, str(fasta_path), move=False)
+        self._after_add(key)
+        return key
+
+    def resolve_url(self, url, checksum=None):
+        """
+        Content hash for url, downloading and registering it on first use.
+        Concurrent callers for the same URL wait for one download. The entry
+        is held (see _hold) before it is returned.
+        """
+        url_id = hashlib.sha1(url.encode()).hexdigest()[:16]
+        with self._lock(f"url-{url_id}"):
+            key = self.load()["aliases"].get(url)
+            if key:
+                # Hold before checking, so the entry cannot be evicted once found
+                self._hold(key)
+                if key in self.load()["entries"] and self.entry_dir(key).exists():
+                    return key
+
+            download_dir = self.root / "downloads" / url_id
+            filename = os.path.basename(url.split("?")[0]) or "reference.fa"
+            path = download(url, download_dir / filename, checksum=checksum)
+            key = self._ingest(path, url, move=True)
+            shutil.rmtree(download_dir, ignore_errors=True)
+        self._after_add(key)
+        return key
+
+    def ensure_index(self, key, kind):
+        """Build an index of an entry once; concurrent builders wait for the first."""
+        if kind in self.load()["entries"][key]["indexes"]:
+            return
+        with self._lock(f"build-{key}"):
+            if kind in self.load()["entries"][key]["indexes"]:
+                print(f"[registry] {kind} index for {key[:12]} built by another run")
+                return
+            print(f"[registry] Building {kind} index for {key[:12]}")
+            INDEX_BUILDERS[kind](self.fasta(key))
+
+            def record(manifest):
+                entry = manifest["entries"][key]
+                entry["indexes"].append(kind)
+                entry["size"] = _dir_size(self.entry_dir(key))
+            self._update(record)
+
+    def reference(self, url=None, fasta_path=None, indexes=("bwa-mem2",), checksum=None):
+        """
+        Prepared, indexed reference from the registry.
+
+        Parameters:
+            url (str, optional): Source URL (downloaded once per machine).
+            fasta_path (str or Path, optional): Local FASTA to register instead.
+            indexes (tuple): Index kinds to ensure, from INDEX_BUILDERS.
+            checksum (str, optional): Expected checksum of the download.
+
+        Returns:
+            Path: the registry's FASTA, with the requested indexes alongside.
+                The entry is protected from eviction while this process runs.
+        """
+        if (url is None) == (fasta_path is None):
+            raise ValueError("Give exactly one of url or fasta_path")
+        key = self.resolve_url(url, checksum) if url else self.add(fasta_path)
+        for kind in indexes:
+            self.ensure_index(key, kind)
+        self._touch(key)
+        return self.fasta(key)
+
+    # -- eviction ----------------------------------------------------------
+
+    def _after_add(self, key):
+        if self.quota_bytes:
+            self.evict(self.quota_bytes, keep=(key,))
+
+    def remove(self, key):
+        """Delete an entry unless another process is using it. Returns True if removed."""
+        lock_dir = self.root / "locks"
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        with open(lock_dir / f"use-{key}.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                with self._lock(f"build-{key}"):
+                    shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+
+                    def drop(manifest):
+                        manifest["entries"].pop(key, None)
+                        manifest["aliases"] = {u: k for u, k in manifest["aliases"].items()
+                                               if k != key}
+                    self._update(drop)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return True
+
+    def evict(self, quota_bytes, keep=()):
+        """
+        Remove least recently used entries until the registry fits quota_bytes.
+        Entries in use or in keep are skipped. Returns the removed hashes.
+        """
+        entries = self.load()["entries"]
+        total = sum(e.get("size", 0) for e in entries.values())
+        removed = []
+        for key, entry in sorted(entries.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= quota_bytes:
+                break
+            if key in keep or key in self._held:
+                continue
+            if self.remove(key):
+                print(f"[registry] Evicted {entry['name']} ({key[:12]}, "
+                      f"{entry.get('size', 0) / 2**30:.1f} GB)")
+                total -= entry.get("size", 0)
+                removed.append(key)
+        return removed
+
+
+_default_registry = None
+
+
+def get_registry():
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ReferenceRegistry()
+    return _default_registry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and evict registered references.")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List registered references")
+    evict = sub.add_parser("evict", help="Evict least recently used references")
+    evict.add_argument("--quota-gb", type=float, help="Defaults to OMICS_REFERENCE_QUOTA_GB")
+    remove = sub.add_parser("remove", help="Remove one reference")
+    remove.add_argument("key", help="Content hash (a unique prefix is enough)")
+    args = parser.parse_args(argv)
+
+    registry = ReferenceRegistry(args.root, quota_gb=getattr(args, "quota_gb", None))
+    manifest = registry.load()
+
+    if args.command == "list":
+        for key, entry in sorted(manifest["entries"].items(), key=lambda kv: -kv[1]["last_used"]):
+            used = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(entry["last_used"]))
+            print(f"{key[:12]}  {entry['name']:<40} {entry.get('size', 0) / 2**30:7.2f} GB  "
+                  f"{used}  {','.join(entry['indexes']) or '-'}")
+            for source in entry["sources"]:
+                print(f"{'':14}{source}")
+    elif args.command == "evict":
+        if not registry.quota_bytes:
+            parser.error("evict needs --quota-gb or OMICS_REFERENCE_QUOTA_GB")
+        removed = registry.evict(registry.quota_bytes)
+        print(f"Evicted {len(removed)} reference(s)")
+    elif args.command == "remove":
+        matches = [k for k in manifest["entries"] if k.startswith(args.key)]
+        if len(matches) != 1:
+            parser.error(f"{len(matches)} entries match {args.key!r}")
+        if not registry.remove(matches[0]):
+            parser.error(f"{matches[0][:12]} is in use")
+        print(f"Removed {matches[0][:12]}")
+
+
+if __name__ == "__main__":
+    main()
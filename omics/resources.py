@@ -0,0 +1,184 @@
+"""
+CPU and memory budget shared by every tool wrapper.
+
+Configure the budget once per pipeline run with `configure()`. If nothing is
+configured it is sized from the machine, optionally overridden by the
+OMICS_THREADS / OMICS_MEMORY_MB environment variables or a JSON config file
+named by OMICS_RESOURCES ({"threads": 32, "memory_mb": 128000}).
+Wrappers take an optional `threads` argument and fall back to the budget.
+`scoped_budget()` narrows the budget for one thread of work, e.g. one
+sample of a batch, without touching the rest of the process.
+"""
+import contextlib
+import contextvars
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+# Fraction of the budget handed to sorters; the rest covers the
+# processes feeding them in a pipe and general overhead.
+SORT_MEMORY_FRACTION = 0.75
+# A sorter sharing a pipe gets less: the other stages need memory too, the
+# aligner most of all (it holds the whole index)
+PIPE_SORT_MEMORY_FRACTION = 0.5
+ALIGN_SORT_MEMORY_FRACTION = 0.25
+MIN_SORT_MEMORY_MB = 128
+
+
+@dataclass(frozen=True)
+class ResourceBudget:
+    threads: int
+    memory_mb: int
+
+    @classmethod
+    def from_machine(cls, memory_fraction=0.8):
+        """Size the budget from the CPUs available to this process and physical RAM."""
+        try:
+            threads = len(os.sched_getaffinity(0))
+        except AttributeError:
+            threads = os.cpu_count() or 1
+        try:
+            total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+            memory_mb = int(total / 2**20 * memory_fraction)
+        except (ValueError, OSError, AttributeError):
+            memory_mb = 4096
+        return cls(threads=max(1, threads), memory_mb=max(512, memory_mb))
+
+    @classmethod
+    def from_config(cls, config_file):
+        """Read a JSON config; missing keys are sized from the machine."""
+        config = json.loads(Path(config_file).read_text())
+        machine = cls.from_machine()
+        return cls(
+            threads=int(config.get("threads", machine.threads)),
+            memory_mb=int(config.get("memory_mb", machine.memory_mb)),
+        )
+
+    @classmethod
+    def from_env(cls):
+        """Machine budget with OMICS_RESOURCES / OMICS_THREADS / OMICS_MEMORY_MB overrides."""
+        config_file = os.environ.get("OMICS_RESOURCES")
+        budget = cls.from_config(config_file) if config_file else cls.from_machine()
+        return cls(
+            threads=int(os.environ.get("OMICS_THREADS", budget.threads)),
+            memory_mb=int(os.environ.get("OMICS_MEMORY_MB", budget.memory_mb)),
+        )
+
+    def share(self, parts):
+        """Split the budget evenly between `parts` concurrent jobs."""
+        parts = max(1, int(parts))
+        return ResourceBudget(
+            threads=max(1, self.threads // parts),
+            memory_mb=max(1, self.memory_mb // parts),
+        )
+
+    def memory_per_thread_mb(self, threads=None):
+        threads = threads or self.threads
+        return max(1, self.memory_mb // max(1, threads))
+
+
+_budget = None
+_scoped = contextvars.ContextVar("omics_budget", default=None)
+
+
+def configure(budget=None, threads=None, memory_mb=None, config_file=None):
+    """
+    Set the pipeline-wide budget. Pass a ResourceBudget, a config file,
+    or individual overrides on top of the environment/machine budget.
+    """
+    global _budget
+    if budget is None:
+        if config_file:
+            budget = ResourceBudget.from_config(config_file)
+        else:
+            budget = ResourceBudget.from_env()
+        budget = ResourceBudget(
+            threads=threads or budget.threads,
+            memory_mb=memory_mb or budget.memory_mb,
+        )
+    _budget = budget
+    print(f"Resource budget: {budget.threads} threads, {budget.memory_mb} MB")
+    return budget
+
+
+def get_budget():
+    """Return the configured budget, sizing it from the environment on first use."""
+    global _budget
+    scoped = _scoped.get()
+    if scoped is not None:
+        return scoped
+    if _budget is None:
+        _budget = ResourceBudget.from_env()
+    return _budget
+
+
+@contextlib.contextmanager
+def scoped_budget(budget):
+    """
+    Use `budget` for every wrapper called from the current context.
+
+    The scope follows the context, not the process: other threads keep their
+    own budget, and run_graph() carries the scope into its task threads.
+    """
+    token = _scoped.set(budget)
+    try:
+        yield budget
+    finally:
+        _scoped.reset(token)
+
+
+def threads(requested=None, cap=None):
+    """Resolve a wrapper's thread count: explicit value, else the budget, optionally capped."""
+    n = int(requested) if requested else get_budget().threads
+    if cap:
+        n = min(n, cap)
+    return max(1, n)
+
+
+def split_threads(weights, total=None):
+    """
+    Divide a thread count between the concurrent stages of a pipe in
+    proportion to weights, so the pipe as a whole stays within it.
+
+    Every stage gets at least one thread; the remainder of the rounding
+    goes to the heaviest stages.
+
+    Parameters:
+        weights (list of int): Relative share of each stage.
+        total (int, optional): Threads to divide. Defaults to the budget.
+
+    Returns:
+        list of int: Threads per stage, in the order of weights.
+    """
+    total = max(threads(total), len(weights))
+    spare = total - len(weights)
+    shares = [1 + spare * w // sum(weights) for w in weights]
+    heaviest = sorted(range(len(weights)), key=lambda i: -weights[i])
+    for i in heaviest[:total - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+
+def sort_memory(threads_used=None, fraction=SORT_MEMORY_FRACTION):
+    """Per-thread memory for `samtools sort -m` / `bcftools sort -m`, e.g. '768M'."""
+    budget = get_budget()
+    threads_used = threads_used or budget.threads
+    mb = int(budget.memory_mb * fraction / max(1, threads_used))
+    return f"{max(MIN_SORT_MEMORY_MB, mb)}M"
+
+
+def samtools_sort_args(threads_used=None, memory_fraction=SORT_MEMORY_FRACTION):
+    """
+    Thread and per-thread memory flags for `samtools sort`. A sort running
+    in a pipe passes its share of the threads (split_threads) and a smaller
+    memory_fraction.
+    """
+    n = threads(threads_used)
+    return ["-@", str(n), "-m", sort_memory(n, memory_fraction)]
+
+
+def java_heap_mb(memory_mb=None):
+    """Heap for a single JVM tool; leaves headroom for off-heap memory."""
+    memory_mb = memory_mb or get_budget().memory_mb
+    return max(512, int(memory_mb * 0.85))
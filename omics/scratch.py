@@ -0,0 +1,288 @@
+"""
+Scratch space for intermediates, with eager cleanup and a disk high-water mark.
+
+Within a scratch_session() intermediates (unsorted and name-sorted BAMs,
+FreeBayes shards, ...) are placed in a per-session directory on the scratch
+root instead of next to the final outputs, sorters get their -T temp
+prefixes there, and each intermediate is deleted as soon as its last
+consumer releases it. Outside a session the same calls fall back to the
+paths next to the outputs, and released files are still deleted at once.
+
+    with scratch_session("yeast_a"):
+        sorted_bam = intermediate(base_dir / "aln_sorted.bam")   # on scratch
+        align_sorted(..., sorted_bam)                            # -T on scratch
+        mark_duplicates(sorted_bam, output_bam=base_dir / "dedup.bam")
+        # mark_duplicates releases sorted_bam: deleted before the session ends
+
+New sessions, and callers about to start disk-heavy work, wait in
+wait_for_space() while the scratch filesystem is above the high-water
+mark, so concurrent samples queue instead of filling the disk. Usage is
+read from the filesystem, so it covers every process sharing the scratch
+disk.
+
+The root is OMICS_SCRATCH_DIR (default <tmp>/omics_scratch; point it at a
+local SSD or /dev/shm) and the high-water mark OMICS_SCRATCH_HIGH_WATER, a
+fraction of the filesystem (default 0.85). Session directories left by
+processes that died are swept when the next session starts; only
+directories carrying this module's prefix and marker file are touched.
+"""
+import contextlib
+import contextvars
+import itertools
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_ROOT = Path(os.environ.get("OMICS_SCRATCH_DIR",
+                                   Path(tempfile.gettempdir()) / "omics_scratch"))
+DEFAULT_HIGH_WATER = float(os.environ.get("OMICS_SCRATCH_HIGH_WATER", 0.85))
+POLL_SECONDS = 5
+# Session directories are named <SESSION_PREFIX><name>-<pid> and hold a
+# MARKER_FILE naming their host and pid; sweep() only touches those
+SESSION_PREFIX = "omics-scratch-"
+MARKER_FILE = ".omics-scratch"
+# Index files that go with an intermediate and are deleted with it
+SIDECAR_SUFFIXES = (".bai", ".csi", ".tbi", ".crai", ".fai", ".gzi")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _tree_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_blocks * 512
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def _delete(path):
+    """Remove a file (with its index sidecars) or a directory tree."""
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    for p in (path, *(Path(f"{path}{s}") for s in SIDECAR_SUFFIXES)):
+        if p.exists():
+            p.unlink()
+
+
+class Scratch:
+    """A scratch root with a high-water mark on its filesystem."""
+
+    def __init__(self, root=DEFAULT_ROOT, high_water=DEFAULT_HIGH_WATER,
+                 poll_seconds=POLL_SECONDS):
+        self.root = Path(root)
+        self.high_water = high_water
+        self.poll_seconds = poll_seconds
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    def used_fraction(self, extra_bytes=0):
+        self.root.mkdir(parents=True, exist_ok=True)
+        usage = shutil.disk_usage(self.root)
+        return (usage.used + extra_bytes) / usage.total
+
+    def wait_for_space(self, expected_bytes=0, label="scratch", timeout=None):
+        """
+        Block until the scratch filesystem, plus space reserved by this
+        process and expected_bytes, is below the high-water mark; then
+        reserve expected_bytes (give it back with unreserve()).
+
+        Raises:
+            TimeoutError: if timeout seconds pass first.
+        """
+        start = time.monotonic()
+        announced = False
+        while True:
+            with self._lock:
+                fraction = self.used_fraction(self._reserved + expected_bytes)
+                if fraction <= self.high_water:
+                    self._reserved += expected_bytes
+                    break
+            if not announced:
+                print(f"[scratch] {label}: waiting for space, {self.root} at {fraction:.0%} "
+                      f"(high-water mark {self.high_water:.0%})")
+                announced = True
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(f"{self.root} stayed above {self.high_water:.0%} for {timeout} s")
+            time.sleep(self.poll_seconds)
+        if announced:
+            print(f"[scratch] {label}: resuming after {time.monotonic() - start:.0f} s")
+
+    def unreserve(self, nbytes):
+        with self._lock:
+            self._reserved = max(0, self._reserved - nbytes)
+
+    def sweep(self):
+        """
+        Remove session directories left behind by processes that no longer
+        exist. Only directories this module created (prefix and marker file)
+        and whose owner ran on this host are considered, so a shared scratch
+        root is safe.
+        """
+        if not self.root.exists():
+            return
+        host = socket.gethostname()
+        for entry in self.root.iterdir():
+            if not entry.name.startswith(SESSION_PREFIX) or not entry.is_dir():
+                continue
+            try:
+                owner_host, _, pid = (entry / MARKER_FILE).read_text().strip().rpartition(" ")
+            except OSError:
+                continue
+            if owner_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                print(f"[scratch] Removing stale session {entry.name}")
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+class ScratchSession:
+    """One unit of work's directory on scratch, with reference-counted intermediates."""
+
+    def __init__(self, scratch, name, reserved_bytes=0):
+        self.scratch = scratch
+        self.dir = scratch.root / f"{SESSION_PREFIX}{name}-{os.getpid()}"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / MARKER_FILE).write_text(f"{socket.gethostname()} {os.getpid()}\n")
+        self.reserved_bytes = reserved_bytes
+        self.peak_bytes = 0
+        self._refs = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def path(self, name, consumers=1):
+        """Path for an intermediate, deleted once `consumers` releases have been made."""
+        path = self.dir / name
+        with self._lock:
+            self._refs[path] = self._refs.get(path, 0) + consumers
+        return path
+
+    def acquire(self, path, consumers=1):
+        """Add consumers to an intermediate."""
+        with self._lock:
+            self._refs[Path(path)] = self._refs.get(Path(path), 0) + consumers
+
+    def release(self, path):
+        """One consumer of path is done; delete it if that was the last. Returns True if deleted."""
+        path = Path(path)
+        with self._lock:
+            remaining = self._refs.get(path, 1) - 1
+            if remaining > 0:
+                self._refs[path] = remaining
+                return False
+            self._refs.pop(path, None)
+        self._note_usage()
+        _delete(path)
+        return True
+
+    def temp_prefix(self, tag):
+        """A fresh prefix in the session directory, for a sorter's -T."""
+        return str(self.dir / f"{tag}.{next(self._counter)}")
+
+    def _note_usage(self):
+        self.peak_bytes = max(self.peak_bytes, _tree_bytes(self.dir))
+
+    def close(self):
+        self._note_usage()
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.scratch.unreserve(self.reserved_bytes)
+        print(f"[scratch] {self.dir.name}: peak {self.peak_bytes / 2**20:.1f} MB of intermediates")
+
+
+_scratch = None
+_session = contextvars.ContextVar("omics_scratch_session", default=None)
+
+
+def configure_scratch(root=None, high_water=None, poll_seconds=None):
+    """Set the process-wide scratch root and high-water mark (else from the environment)."""
+    global _scratch
+    _scratch = Scratch(
+        root=root or DEFAULT_ROOT,
+        high_water=high_water or DEFAULT_HIGH_WATER,
+        poll_seconds=poll_seconds or POLL_SECONDS,
+    )
+    return _scratch
+
+
+def get_scratch():
+    global _scratch
+    if _scratch is None:
+        _scratch = Scratch()
+    return _scratch
+
+
+@contextlib.contextmanager
+def scratch_session(name, expected_bytes=0):
+    """
+    Run the enclosed work with its intermediates on scratch. Waits for the
+    high-water mark first; the session directory is removed on exit.
+
+    Like scoped_budget(), the session follows the context: run_graph()
+    carries it into its task threads.
+    """
+    scratch = get_scratch()
+    scratch.sweep()
+    scratch.wait_for_space(expected_bytes, label=name)
+    session = ScratchSession(scratch, name, reserved_bytes=expected_bytes)
+    token = _session.set(session)
+    try:
+        yield session
+    finally:
+        _session.reset(token)
+        session.close()
+
+
+def current_session():
+    return _session.get()
+
+
+def intermediate(default_path, consumers=1):
+    """
+    Where to write an intermediate whose default location is default_path:
+    the session's scratch directory, or default_path outside a session.
+    """
+    session = _session.get()
+    if session is None:
+        return Path(default_path)
+    return session.path(Path(default_path).name, consumers)
+
+
+def release(path):
+    """
+    A consumer of an intermediate is done with it. Session intermediates are
+    deleted when their last consumer releases them; anything else (e.g. an
+    intermediate written outside a session) is deleted straight away.
+    """
+    session = _session.get()
+    if session is None:
+        _delete(path)
+    elif not session.release(path):
+        return
+    print(f"Deleted intermediate: {path}")
+
+
+def temp_prefix(tag, default):
+    """A sorter's -T prefix: on scratch within a session, else default."""
+    session = _session.get()
+    return session.temp_prefix(tag) if session is not None else str(default)
+
+
+def wait_for_space(expected_bytes=0, label="scratch"):
+    """Block new disk-heavy work while scratch is above its high-water mark."""
+    scratch = get_scratch()
+    scratch.wait_for_space(expected_bytes, label=label)
+    scratch.unreserve(expected_bytes)
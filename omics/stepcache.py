@@ -0,0 +1,292 @@
+"""
+Content-addressed cache for pipeline steps.
+
+A step is keyed on the fingerprints of its input files, its parameters and
+the versions of the tools it runs. When the key matches a manifest entry and
+the recorded outputs are still on disk unchanged, the step is skipped and its
+recorded result returned. Outputs are the files named in the step's result
+plus any declared with outputs=; a step with neither is not cached unless
+it opts in with allow_no_outputs=True. Changing a parameter changes that
+step's outputs, which in turn changes the key of everything downstream.
+
+Large files are fingerprinted cheaply from size, mtime and a hash of their
+first and last blocks.
+
+    omics cache list
+    omics cache show <key>
+    omics cache evict [--step NAME] [--key KEY] [--all]
+"""
+import argparse
+import contextlib
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+
+from omics.telemetry import stage
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("OMICS_STEP_CACHE", ".omics_cache"))
+MANIFEST_NAME = "manifest.json"
+PARTIAL_HASH_BYTES = 1 << 20
+
+
+def fingerprint(path):
+    """
+    Cheap identity of a file: size, mtime and a SHA-256 over its first and
+    last PARTIAL_HASH_BYTES. Directories are fingerprinted from their files.
+    """
+    path = Path(path)
+    if path.is_dir():
+        digest = hashlib.sha256()
+        for child in sorted(p for p in path.rglob("*") if p.is_file()):
+            digest.update(str(child.relative_to(path)).encode())
+            digest.update(fingerprint(child).encode())
+        return digest.hexdigest()
+
+    st = path.stat()
+    digest = hashlib.sha256(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with path.open("rb") as f:
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+        if st.st_size > 2 * PARTIAL_HASH_BYTES:
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version(tool):
+    """First line of `tool --version` (memoised); 'unknown' if it cannot be run."""
+    try:
+        proc = subprocess.run([tool, "--version"], capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+    out = (proc.stdout or proc.stderr).strip().splitlines()
+    return out[0] if out else "unknown"
+
+
+def _encode(value):
+    """JSON form of a step result/parameter, keeping Paths distinguishable."""
+    if isinstance(value, Path):
+        return {"__path__": str(value)}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _encode(v) for k, v in value.items()}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if set(value) == {"__path__"}:
+            return Path(value["__path__"])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+def _result_paths(value):
+    """Files named in a step result, used to validate a cache hit."""
+    if isinstance(value, Path):
+        return [value]
+    if isinstance(value, str) and os.path.exists(value):
+        return [Path(value)]
+    if isinstance(value, (list, tuple)):
+        return [p for v in value for p in _result_paths(v)]
+    if isinstance(value, dict):
+        return [p for v in value.values() for p in _result_paths(v)]
+    return []
+
+
+class StepCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.manifest_path = self.cache_dir / MANIFEST_NAME
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Serialise manifest updates between concurrent pipelines."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_dir / "manifest.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self):
+        if not self.manifest_path.exists():
+            return {}
+        return json.loads(self.manifest_path.read_text())
+
+    def save(self, manifest):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+        os.replace(tmp, self.manifest_path)
+
+    def key(self, step, inputs=(), params=None, tools=()):
+        payload = {
+            "step": step,
+            "inputs": {str(p): fingerprint(p) for p in inputs},
+            "params": _encode(params or {}),
+            "tools": {t: tool_version(t) for t in tools},
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def lookup(self, key):
+        """Return the manifest entry for key if its outputs are intact, else None."""
+        entry = self.load().get(key)
+        if entry is None:
+            return None
+        if not entry["outputs"] and not entry.get("allow_no_outputs"):
+            return None
+        for path, digest in entry["outputs"].items():
+            if not Path(path).exists() or fingerprint(path) != digest:
+                return None
+        return entry
+
+    def run(self, step, fn, *args, inputs=(), params=None, tools=(), outputs=(),
+            allow_no_outputs=False, **kwargs):
+        """
+        Run fn(*args, **kwargs) unless an identical step has already run.
+
+        Parameters:
+            step (str): Step name, e.g. "freebayes".
+            fn (callable): The step function.
+            inputs (list of Path): Files the step reads.
+            params (dict, optional): Parameters beyond the input files.
+                Defaults to the call's args and kwargs.
+            tools (list of str): Executables whose versions invalidate the step.
+            outputs (list of Path): Files the step writes but does not return;
+                a hit needs them on disk unchanged, like returned paths.
+            allow_no_outputs (bool): Cache a step with no output files at all
+                (a pure computation). Otherwise such a step runs every time,
+                since nothing could show that its work was lost.
+
+        Returns:
+            The step result, either fresh or recorded from the previous run.
+        """
+        if params is None:
+            params = {"args": [a for a in args if not _is_input(a, inputs)], "kwargs": kwargs}
+        key = self.key(step, inputs, params, tools)
+
+        entry = self.lookup(key)
+        if entry is not None:
+            print(f"[cache] {step}: reusing result from {entry['created']}")
+            with self.locked():
+                manifest = self.load()
+                if key in manifest:
+                    manifest[key]["last_used"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                    self.save(manifest)
+            return _decode(entry["result"])
+
+        with stage(step):
+            result = fn(*args, **kwargs)
+
+        missing = [str(p) for p in outputs if not Path(p).exists()]
+        if missing:
+            print(f"[cache] {step}: declared outputs missing ({', '.join(missing)}); not cached")
+            return result
+        output_paths = [*_result_paths(result), *(Path(p) for p in outputs)]
+        if not output_paths and not allow_no_outputs:
+            print(f"[cache] {step}: no output files to validate a later hit; not cached "
+                  f"(declare outputs= or pass allow_no_outputs=True)")
+            return result
+
+        now = time.strftime("%Y-%m-%dT%H:%M:%S")
+        record = {
+            "step": step,
+            "inputs": [str(p) for p in inputs],
+            "params": _encode(params),
+            "tools": {t: tool_version(t) for t in tools},
+            "result": _encode(result),
+            "outputs": {str(p): fingerprint(p) for p in output_paths},
+            "allow_no_outputs": allow_no_outputs,
+            "created": now,
+            "last_used": now,
+        }
+        with self.locked():
+            manifest = self.load()
+            manifest[key] = record
+            self.save(manifest)
+        return result
+
+    def evict(self, step=None, key=None, everything=False):
+        """Drop manifest entries (output files are left in place). Returns the count."""
+        with self.locked():
+            manifest = self.load()
+            doomed = [
+                k for k, e in manifest.items()
+                if everything or k == key or (step is not None and e["step"] == step)
+            ]
+            for k in doomed:
+                del manifest[k]
+            self.save(manifest)
+        return len(doomed)
+
+
+def _is_input(arg, inputs):
+    return any(str(arg) == str(p) for p in inputs)
+
+
+_default_cache = None
+
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = StepCache()
+    return _default_cache
+
+
+def cached_step(step, fn, *args, inputs=(), params=None, tools=(), outputs=(),
+                allow_no_outputs=False, **kwargs):
+    """Run a step through the default cache (OMICS_STEP_CACHE or ./.omics_cache)."""
+    return get_cache().run(step, fn, *args, inputs=inputs, params=params, tools=tools,
+                           outputs=outputs, allow_no_outputs=allow_no_outputs, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and evict pipeline step cache entries.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List cached steps")
+    show = sub.add_parser("show", help="Show one entry")
+    show.add_argument("key", help="Entry key (a unique prefix is enough)")
+    evict = sub.add_parser("evict", help="Remove entries from the manifest")
+    evict.add_argument("--step")
+    evict.add_argument("--key")
+    evict.add_argument("--all", action="store_true")
+    args = parser.parse_args(argv)
+
+    cache = StepCache(args.cache_dir)
+    manifest = cache.load()
+
+    if args.command == "list":
+        for key, entry in sorted(manifest.items(), key=lambda kv: kv[1]["created"]):
+            print(f"{key[:12]}  {entry['step']:<24} {entry['created']}  "
+                  f"{len(entry['outputs'])} output(s)")
+    elif args.command == "show":
+        matches = [k for k in manifest if k.startswith(args.key)]
+        if len(matches) != 1:
+            parser.error(f"{len(matches)} entries match {args.key!r}")
+        print(json.dumps({matches[0]: manifest[matches[0]]}, indent=2))
+    elif args.command == "evict":
+        if not (args.step or args.key or args.all):
+            parser.error("evict needs --step, --key or --all")
+        key = args.key
+        if key:
+            matches = [k for k in manifest if k.startswith(key)]
+            key = matches[0] if len(matches) == 1 else key
+        n = cache.evict(step=args.step, key=key, everything=args.all)
+        print(f"Evicted {n} entr{'y' if n == 1 else 'ies'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Minimal task-graph executor for independent tool steps.
+
+Tasks declare the steps they depend on and the threads/memory they will use.
+A task starts once its dependencies have finished and its resources fit into
+what is left of the budget, so independent steps run side by side without
+oversubscribing the machine. External tools do the real work, so tasks run on
+threads that simply wait for their subprocesses.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Callable
+
+from omics.resources import get_budget
+
+
+@dataclass
+class Task:
+    name: str
+    fn: Callable
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    deps: tuple = ()
+    threads: int = 1
+    memory_mb: int = 0
+
+
+class TaskGraphError(RuntimeError):
+    """Raised after the graph has drained if any task failed."""
+
+    def __init__(self, failures, results):
+        self.failures = failures
+        self.results = results
+        summary = ", ".join(f"{name}: {err!r}" for name, err in failures.items())
+        super().__init__(f"{len(failures)} task(s) failed: {summary}")
+
+
+def _check_graph(tasks):
+    names = {}
+    for task in tasks:
+        if task.name in names:
+            raise ValueError(f"Duplicate task name: {task.name}")
+        names[task.name] = task
+    for task in tasks:
+        for dep in task.deps:
+            if dep not in names:
+                raise ValueError(f"Task {task.name} depends on unknown task {dep}")
+
+    # Kahn's algorithm, only to reject cycles up front
+    remaining = {t.name: set(t.deps) for t in tasks}
+    while remaining:
+        free = [n for n, deps in remaining.items() if not deps]
+        if not free:
+            raise ValueError(f"Dependency cycle between: {sorted(remaining)}")
+        for n in free:
+            del remaining[n]
+        for deps in remaining.values():
+            deps.difference_update(free)
+
+
+def run_graph(tasks, budget=None):
+    """
+    Run tasks concurrently, respecting dependencies and the resource budget.
+
+    Parameters:
+        tasks (list of Task): Tasks to run; names must be unique.
+        budget (ResourceBudget, optional): Defaults to the pipeline budget.
+
+    Returns:
+        dict: Task name → return value of its function.
+
+    Raises:
+        TaskGraphError: if any task failed. Tasks that do not depend on the
+            failure still run; its dependents are skipped.
+    """
+    tasks = list(tasks)
+    _check_graph(tasks)
+    budget = budget or get_budget()
+
+    # A task asking for more than the whole budget still runs, just alone.
+    need = {
+        t.name: (min(max(1, t.threads), budget.threads), min(t.memory_mb, budget.memory_mb))
+        for t in tasks
+    }
+    free_threads, free_memory = budget.threads, budget.memory_mb
+
+    pending = list(tasks)
+    running = {}
+    results, failures, skipped = {}, {}, set()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(tasks), budget.threads))) as pool:
+        while pending or running:
+            for task in list(pending):
+                if any(d in failures or d in skipped for d in task.deps):
+                    pending.remove(task)
+                    skipped.add(task.name)
+                    print(f"[taskgraph] Skipping {task.name}: a dependency failed")
+                    continue
+                if not all(d in results for d in task.deps):
+                    continue
+                threads, memory = need[task.name]
+                fits = threads <= free_threads and memory <= free_memory
+                if not fits and running:
+                    continue
+                pending.remove(task)
+                free_threads -= threads
+                free_memory -= memory
+                print(f"[taskgraph] Starting {task.name} ({threads} threads, {memory} MB)")
+                # Run in a copy of the caller's context so a scoped budget applies
+                context = contextvars.copy_context()
+                future = pool.submit(context.run, task.fn, *task.args, **task.kwargs)
+                running[future] = task
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                threads, memory = need[task.name]
+                free_threads += threads
+                free_memory += memory
+                try:
+                    results[task.name] = future.result()
+                    print(f"[taskgraph] Finished {task.name}")
+                except Exception as err:
+                    failures[task.name] = err
+                    print(f"[taskgraph] Failed {task.name}: {err}")
+
+    if failures:
+        raise TaskGraphError(failures, results)
+    return results
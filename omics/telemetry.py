@@ -0,0 +1,343 @@
+"""
+Resource telemetry for external tools and Python stages.
+
+run() is a drop-in replacement for subprocess.run() that also records the
+child's wall time, user/sys CPU, peak RSS and bytes read/written. The child
+is first waited for with WNOWAIT, so it stays a zombie while its
+/proc/<pid>/io is read; os.wait4() then reaps it and returns its rusage.
+Both cover the whole process tree, as far as the tool waits for its own
+children: CPU and I/O are summed over it, and peak RSS is that of the
+largest single process. utils.run_pipeline() records every process of a pipe
+the same way.
+
+    with stage("filter_pipeline"):
+        ...
+
+records a Python stage: wall time, and CPU and I/O of the calling thread
+where the OS reports them per thread (Linux), so stages running concurrently
+under run_graph() or a batch are not charged for each other's work. Threads
+and processes the stage starts are not included (tools run through run()
+are recorded on their own). Peak RSS is the whole process's: memory is
+shared between threads. stage() also works as a decorator, so the Python
+hot paths (VCF scan, FASTQ and depth QC, Parquet export) record themselves
+whether or not they run through stepcache.cached_step(); a stage inside one
+of the same name is recorded once. Work in a process pool is measured in the
+worker with measured() and the record added by the parent.
+
+Records are appended to <dir>/<run id>.jsonl as they complete, and at exit a
+Chrome/Perfetto trace (<run id>.trace.json, open in ui.perfetto.dev or
+chrome://tracing) and <run id>.summary.tsv are written and the summary table
+is printed. The directory is OMICS_TELEMETRY_DIR (default .omics_telemetry);
+OMICS_TELEMETRY=0 turns recording off.
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_DIR = Path(os.environ.get("OMICS_TELEMETRY_DIR", ".omics_telemetry"))
+IO_FIELDS = ("rchar", "wchar", "read_bytes", "write_bytes")
+# Per-thread CPU and I/O for stage(), else the process's
+RUSAGE_STAGE = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+IO_STAGE = "thread-self" if os.path.exists("/proc/thread-self/io") else "self"
+
+
+class Recorder:
+    """Collects records for one run and writes them out."""
+
+    def __init__(self, out_dir=DEFAULT_DIR, run_id=None, enabled=True, quiet=False):
+        self.out_dir = Path(out_dir)
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+        self.enabled = enabled
+        self.quiet = quiet
+        self.records = []
+        self._lock = threading.Lock()
+        self._t0 = time.time()
+        self._finished = False
+
+    @property
+    def jsonl_path(self):
+        return self.out_dir / f"{self.run_id}.jsonl"
+
+    def add(self, record):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.records.append(record)
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            with self.jsonl_path.open("a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def trace(self):
+        """Chrome trace events: one complete ('X') event per record."""
+        events = []
+        for r in self.records:
+            events.append({
+                "name": r["name"],
+                "cat": r["kind"],
+                "ph": "X",
+                "ts": int((r["start"] - self._t0) * 1e6),
+                "dur": int(r["wall_s"] * 1e6),
+                "pid": r["pid"],
+                "tid": r["thread"],
+                "args": {k: v for k, v in r.items()
+                         if k not in ("name", "kind", "start", "pid", "thread")},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        """Per-name totals: count, wall, CPU, peak RSS and I/O."""
+        rows = {}
+        for r in self.records:
+            row = rows.setdefault(r["name"], {
+                "name": r["name"], "kind": r["kind"], "count": 0, "wall_s": 0.0,
+                "user_s": 0.0, "sys_s": 0.0, "max_rss_mb": 0.0,
+                "read_mb": 0.0, "write_mb": 0.0, "failed": 0,
+            })
+            row["count"] += 1
+            row["wall_s"] += r["wall_s"]
+            row["user_s"] += r["user_s"]
+            row["sys_s"] += r["sys_s"]
+            row["max_rss_mb"] = max(row["max_rss_mb"], r["max_rss_mb"])
+            row["read_mb"] += r.get("rchar", 0) / 2**20
+            row["write_mb"] += r.get("wchar", 0) / 2**20
+            row["failed"] += r.get("returncode", 0) not in (0, None)
+        return sorted(rows.values(), key=lambda row: -row["wall_s"])
+
+    def finish(self):
+        """Write the trace and summary files and print the summary table."""
+        if self._finished or not self.enabled or not self.records:
+            return
+        self._finished = True
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        (self.out_dir / f"{self.run_id}.trace.json").write_text(json.dumps(self.trace()))
+
+        rows = self.summary()
+        columns = ["name", "kind", "count", "wall_s", "user_s", "sys_s",
+                   "max_rss_mb", "read_mb", "write_mb", "failed"]
+        with (self.out_dir / f"{self.run_id}.summary.tsv").open("w") as f:
+            f.write("\t".join(columns) + "\n")
+            for row in rows:
+                f.write("\t".join(_fmt(row[c]) for c in columns) + "\n")
+
+        if self.quiet:
+            return
+        print(f"\nResource summary ({self.out_dir / self.run_id}.*)")
+        print(f"{'step':<32} {'n':>4} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} "
+              f"{'read MB':>10} {'write MB':>10}")
+        for row in rows:
+            print(f"{row['name'][:32]:<32} {row['count']:>4} {row['wall_s']:>9.1f} "
+                  f"{row['user_s'] + row['sys_s']:>9.1f} {row['max_rss_mb']:>9.0f} "
+                  f"{row['read_mb']:>10.0f} {row['write_mb']:>10.0f}"
+                  + (f"  ({row['failed']} failed)" if row["failed"] else ""))
+
+
+def _fmt(value):
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+_recorder = None
+
+
+def configure(out_dir=None, run_id=None, enabled=None, quiet=False):
+    """
+    Start a new run's recorder (otherwise one is made on first use). A quiet
+    recorder writes its files but does not print the summary table, for
+    commands whose stdout is their output.
+    """
+    global _recorder
+    if _recorder is not None:
+        _recorder.finish()
+    if enabled is None:
+        enabled = os.environ.get("OMICS_TELEMETRY", "1") != "0"
+    _recorder = Recorder(out_dir or DEFAULT_DIR, run_id=run_id, enabled=enabled, quiet=quiet)
+    return _recorder
+
+
+def get_recorder():
+    global _recorder
+    if _recorder is None:
+        configure()
+    return _recorder
+
+
+@atexit.register
+def _finish_at_exit():
+    if _recorder is not None:
+        _recorder.finish()
+
+
+def step_name(cmd):
+    """'samtools sort', 'gatk HaplotypeCaller', 'freebayes', ... from an argv."""
+    tool = os.path.basename(str(cmd[0]))
+    for arg in cmd[1:5]:
+        arg = str(arg)
+        if arg.startswith("-") or arg.isdigit() or any(c in arg for c in "/.=:"):
+            continue
+        return f"{tool} {arg}"
+    return tool
+
+
+def _read_io(pid):
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            values = dict(line.split(": ") for line in f.read().splitlines())
+        return {k: int(values[k]) for k in IO_FIELDS if k in values}
+    except (OSError, ValueError):
+        return {}
+
+
+def reap(proc):
+    """
+    Wait for a Popen child and return its rusage and I/O counters.
+    Sets proc.returncode; use instead of proc.wait().
+    """
+    io = {}
+    try:
+        # Leave the child a zombie so its I/O counters can still be read
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        io = _read_io(proc.pid)
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    except (ChildProcessError, AttributeError):
+        # Already reaped, or no waitid/wait4 on this platform
+        proc.wait()
+        usage = None
+    return usage, io
+
+
+def record_process(cmd, start, usage, io, returncode, name=None):
+    """Record a finished external process."""
+    get_recorder().add({
+        "kind": "tool",
+        "name": name or step_name(cmd),
+        "cmd": " ".join(str(c) for c in cmd),
+        "start": start,
+        "wall_s": round(time.time() - start, 3),
+        "user_s": round(usage.ru_utime, 3) if usage else 0.0,
+        "sys_s": round(usage.ru_stime, 3) if usage else 0.0,
+        # ru_maxrss is in KiB on Linux
+        "max_rss_mb": round(usage.ru_maxrss / 1024, 1) if usage else 0.0,
+        **io,
+        "returncode": returncode,
+        "pid": os.getpid(),
+        "thread": threading.get_ident(),
+    })
+
+
+def _drain(stream, sink):
+    sink.append(stream.read())
+    stream.close()
+
+
+def run(cmd, check=False, capture_output=False, input=None, text=None, name=None, **kwargs):
+    """
+    subprocess.run() with telemetry. Takes the same arguments except timeout,
+    plus name (defaults to step_name(cmd)).
+
+    Returns:
+        subprocess.CompletedProcess
+    """
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+
+    start = time.time()
+    proc = subprocess.Popen(cmd, text=text, **kwargs)
+
+    # Read pipes on threads so the process can be reaped by reap(), not communicate()
+    outputs = {}
+    readers = []
+    for attr in ("stdout", "stderr"):
+        stream = getattr(proc, attr)
+        if stream is not None:
+            outputs[attr] = []
+            readers.append(threading.Thread(target=_drain, args=(stream, outputs[attr])))
+    for reader in readers:
+        reader.start()
+    if input is not None:
+        proc.stdin.write(input)
+        proc.stdin.close()
+    for reader in readers:
+        reader.join()
+
+    usage, io = reap(proc)
+    record_process(cmd, start, usage, io, proc.returncode, name)
+
+    stdout = outputs["stdout"][0] if "stdout" in outputs else None
+    stderr = outputs["stderr"][0] if "stderr" in outputs else None
+    if check and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+_active_stages = contextvars.ContextVar("omics_telemetry_stages", default=())
+
+
+class _StageUsage:
+    """Wall time, this thread's CPU and I/O, and process peak RSS since creation."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.before = resource.getrusage(RUSAGE_STAGE)
+        self.io_before = _read_io(IO_STAGE)
+
+    def record(self, error=None):
+        after = resource.getrusage(RUSAGE_STAGE)
+        io_after = _read_io(IO_STAGE)
+        return {
+            "kind": "stage",
+            "name": self.name,
+            "start": self.start,
+            "wall_s": round(time.time() - self.start, 3),
+            "user_s": round(after.ru_utime - self.before.ru_utime, 3),
+            "sys_s": round(after.ru_stime - self.before.ru_stime, 3),
+            "max_rss_mb": round(after.ru_maxrss / 1024, 1),
+            **{k: io_after[k] - self.io_before.get(k, 0) for k in io_after},
+            "returncode": error,
+            "pid": os.getpid(),
+            "thread": threading.get_ident(),
+        }
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Record a Python stage: wall time, this thread's CPU and I/O, and process
+    peak RSS. Usable as a decorator; nested in a stage of the same name (a
+    self-recording function run through cached_step) it records nothing.
+    """
+    active = _active_stages.get()
+    if name in active:
+        yield
+        return
+    token = _active_stages.set(active + (name,))
+    usage = _StageUsage(name)
+    error = None
+    try:
+        yield
+    except BaseException:
+        error = 1
+        raise
+    finally:
+        _active_stages.reset(token)
+        get_recorder().add(usage.record(error))
+
+
+def measured(name, fn, *args, **kwargs):
+    """
+    Call fn(*args, **kwargs) and return (result, stage record) without
+    recording it: for work in a pool worker process, whose parent adds the
+    record with get_recorder().add().
+    """
+    usage = _StageUsage(name)
+    result = fn(*args, **kwargs)
+    return result, usage.record()
@@ -0,0 +1,69 @@
+from pathlib import Path
+import subprocess
+import time
+
+from omics.telemetry import reap
+from omics.telemetry import record_process
+from omics.telemetry import run
+
+
+def decompress_gzip(filepath: Path) -> Path:
+    """Decompress a .gz file in-place and return the decompressed file path."""
+    filepath = Path(filepath)
+
+    if filepath.suffix != ".gz":
+        raise ValueError(f"Expected .gz file, got: {filepath}")
+
+    decompressed_path = filepath.with_suffix("")
+
+    if decompressed_path.exists():
+        print(f"Already decompressed: {decompressed_path}")
+        return decompressed_path
+
+    print(f"Decompressing: {filepath}")
+    run(["gunzip", str(filepath)], check=True)
+
+    return decompressed_path
+
+
+def run_pipeline(commands, stdin=None, stdout=None, stderr=None):
+    """
+    Run a chain of commands with each stdout piped into the next stdin,
+    like `cmd1 | cmd2 | ...` in a shell.
+
+    Parameters:
+        commands (list of list): argv for each process, in pipe order.
+        stdin (file, optional): Input for the first process.
+        stdout (file, optional): Destination of the last process' output.
+        stderr (dict, optional): Command index → file for that process'
+            stderr (e.g. a tool's report); others inherit ours.
+
+    Each process is recorded by telemetry like a run() call.
+
+    Raises:
+        subprocess.CalledProcessError: for the first command that exits non-zero.
+    """
+    procs = []
+    upstream = stdin
+    start = time.time()
+    for i, cmd in enumerate(commands):
+        last = i == len(commands) - 1
+        proc = subprocess.Popen(
+            [str(c) for c in cmd],
+            stdin=upstream,
+            stdout=stdout if last else subprocess.PIPE,
+            stderr=(stderr or {}).get(i),
+        )
+        if procs:
+            # Only the child should hold the read end, so that upstream
+            # gets SIGPIPE if a downstream process dies.
+            procs[-1].stdout.close()
+        procs.append(proc)
+        upstream = proc.stdout
+
+    for proc, cmd in zip(procs, commands):
+        usage, io = reap(proc)
+        record_process(cmd, start, usage, io, proc.returncode)
+    for proc, cmd in zip(procs, commands):
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
@@ -1,15 +1,21 @@
-import subprocess
 from pathlib import Path
-import pandas as pd 
-import matplotlib.pyplot as plt  
 
-def fast_qc(reads, qc_dir):
+from omics.telemetry import run
+from omics.telemetry import stage
+from omics.resources import threads as resolve_threads
+from omics.resources import java_heap_mb
+
+# numpy, pandas and matplotlib are imported by the depth functions that use
+# them: the tool wrappers here (fast_qc for one) should not pay for them.
+
+def fast_qc(reads, qc_dir, threads=None):
     """
     Run FastQC on a list of FASTQ files and save results to qc_dir.
 
     Parameters:
         reads (list of str or Path): List of input FASTQ files.
         qc_dir (str or Path): Directory to save FastQC outputs.
+        threads (int, optional): Files processed in parallel. Defaults to the resource budget.
 
     Returns:
         Path: Path to the output directory.
@@ -18,9 +24,10 @@ def fast_qc(reads, qc_dir):
     qc_dir = Path(qc_dir)
     qc_dir.mkdir(exist_ok=True)
 
-    subprocess.run(["fastqc", "-o", str(qc_dir), 
-                    *[str(f) for f in reads]], 
-                    check=True)
+    run(["fastqc", "-t", str(resolve_threads(threads, cap=len(reads))),
+         "-o", str(qc_dir),
+         *[str(f) for f in reads]], 
+         check=True)
     return qc_dir
 
 def multi_qc(target_dir, output_dir=None):
@@ -44,10 +51,10 @@ def multi_qc(target_dir, output_dir=None):
         cmd.extend(["-o", str(output_dir)])
     else:
         output_dir = target_dir
-    subprocess.run(cmd, check=True)
+    run(cmd, check=True)
     return output_dir
 
-def flagstat_summary(bam_filename, output_file=None):
+def flagstat_summary(bam_filename, output_file=None, threads=None):
     """
     Run samtools flagstat on a BAM file.
 
@@ -65,13 +72,14 @@ def flagstat_summary(bam_filename, output_file=None):
         Path(f"flagstat_{bam_path.stem}.txt")
 
     with open(output_file, "w") as out:
-        subprocess.run(["samtools", "flagstat", str(bam_path)], 
-                       stdout=out, check=True)
+        run(["samtools", "flagstat", "-@", str(resolve_threads(threads)),
+             str(bam_path)],
+            stdout=out, check=True)
 
     return output_file
 
 def alignment_summary(reference_fasta, bam_filename, 
-                      output_filename=None):
+                      output_filename=None, memory_mb=None):
     """
     Run Picard CollectAlignmentSummaryMetrics on a BAM file.
 
@@ -79,6 +87,7 @@ def alignment_summary(reference_fasta, bam_filename,
         reference_fasta (str or Path): Path to reference FASTA file used for alignment.
         bam_filename (str or Path): Path to input BAM file (coordinate-sorted, duplicate-marked alignments).
         output_filename (str or Path, optional): Output file path. Defaults to 'alignment_metrics.txt'.
+        memory_mb (int, optional): JVM memory. Defaults to the resource budget.
 
     Returns:
         Path: Path to the generated alignment metrics file.
@@ -91,8 +100,8 @@ def alignment_summary(reference_fasta, bam_filename,
     else:
         output_filename = Path("alignment_metrics.txt")
 
-    subprocess.run([
-        "picard",
+    run([
+        "picard", f"-Xmx{java_heap_mb(memory_mb)}m",
         "CollectAlignmentSummaryMetrics",
         f"R={reference_fasta}",
         f"I={bam_filename}",
@@ -101,13 +110,20 @@ def alignment_summary(reference_fasta, bam_filename,
 
     return output_filename
 
-def coverage_metrics(bam_filename, prefix=None):
+def coverage_metrics(bam_filename, prefix=None, threads=None, per_base=True,
+                     window=None, quantize=None):
     """
     Run mosdepth to compute coverage metrics for a BAM file.
 
     Parameters:
         bam_filename (str or Path): Path to input BAM file (coordinate-sorted, duplicate-marked alignments).
         prefix (str or Path, optional): Output prefix for mosdepth files (default: uses BAM basename without extension).
+        threads (int, optional): Decompression threads (mosdepth gains little beyond 4).
+        per_base (bool): Write the per-base BED. It is one of the largest
+            pipeline outputs; without it, use coverage_depth_from_summary()
+            for the depth histogram.
+        window (int or str, optional): mosdepth --by: window size in bp or a BED of regions.
+        quantize (str, optional): mosdepth --quantize bins, e.g. '0:1:10:20:30:'.
 
     Returns:
         dict: Paths to key mosdepth output files.
@@ -119,25 +135,38 @@ def coverage_metrics(bam_filename, prefix=None):
     else:
         prefix = Path(bam_filename.stem)
 
-    subprocess.run([
-        "mosdepth", "--threads", "4", str(prefix), str(bam_filename)
-    ], check=True)
+    cmd = ["mosdepth", "--threads", str(resolve_threads(threads, cap=4))]
+    if not per_base:
+        cmd.append("--no-per-base")
+    if window:
+        cmd += ["--by", str(window)]
+    if quantize:
+        cmd += ["--quantize", quantize]
+    cmd += [str(prefix), str(bam_filename)]
+    run(cmd, check=True)
 
     outputs = {
-        "summary": prefix.with_suffix(".mosdepth.summary.txt"),
-        "regions": prefix.with_name(f"{prefix.name}.regions.bed.gz"),
-        "per_base": prefix.with_name(f"{prefix.name}.per-base.bed.gz")
+        "summary": prefix.with_name(f"{prefix.name}.mosdepth.summary.txt"),
+        "global_dist": prefix.with_name(f"{prefix.name}.mosdepth.global.dist.txt"),
     }
+    if per_base:
+        outputs["per_base"] = prefix.with_name(f"{prefix.name}.per-base.bed.gz")
+    if window:
+        outputs["regions"] = prefix.with_name(f"{prefix.name}.regions.bed.gz")
+        outputs["region_dist"] = prefix.with_name(f"{prefix.name}.mosdepth.region.dist.txt")
+    if quantize:
+        outputs["quantized"] = prefix.with_name(f"{prefix.name}.quantized.bed.gz")
 
     return outputs
 
-def size_distribution(bam_filename, output_filename=None):
+def size_distribution(bam_filename, output_filename=None, memory_mb=None):
     """
     Run Picard CollectInsertSizeMetrics to compute fragment size distribution.
 
     Parameters:
         bam_filename (str or Path): Path to input BAM file (coordinate-sorted, duplicate-marked alignments).
         output_filename (str or Path, optional): Text output file for metrics. Defaults to 'insert_size_metrics.txt'.
+        memory_mb (int, optional): JVM memory. Defaults to the resource budget.
 
     Returns:
         dict: Paths to the metrics text file and PDF histogram.
@@ -151,8 +180,8 @@ def size_distribution(bam_filename, output_filename=None):
 
     pdf_output = output_filename.with_suffix(".pdf")
 
-    subprocess.run([
-        "picard", "CollectInsertSizeMetrics",
+    run([
+        "picard", f"-Xmx{java_heap_mb(memory_mb)}m", "CollectInsertSizeMetrics",
         f"I={bam_filename}",
         f"O={output_filename}",
         f"H={pdf_output}",
@@ -161,7 +190,7 @@ def size_distribution(bam_filename, output_filename=None):
 
     return output_filename, pdf_output
 
-def quality_depth(bam_filename, output_filename=None):
+def quality_depth(bam_filename, output_filename=None, threads=None):
     """
     Run samtools stats to gather alignment quality and depth metrics.
 
@@ -169,6 +198,7 @@ def quality_depth(bam_filename, output_filename=None):
         bam_filename (str or Path): Path to input BAM file (coordinate-sorted, duplicate-marked alignments).
         output_filename (str or Path, optional): Output text file for samtools stats.
             Defaults to 'samtools_stats.txt'.
+        threads (int, optional): Decompression threads. Defaults to the resource budget.
 
     Returns:
         Path: Path to the generated stats file.
@@ -181,12 +211,13 @@ def quality_depth(bam_filename, output_filename=None):
         output_filename = Path("samtools_stats.txt")
 
     with open(output_filename, "w") as out:
-        subprocess.run(["samtools", "stats", str(bam_filename)],
-                       stdout=out, check=True)
+        run(["samtools", "stats", "-@", str(resolve_threads(threads)),
+             str(bam_filename)],
+            stdout=out, check=True)
 
     return output_filename
 
-def gc_bias(bam_filename, reference_filename, output_filename=None):
+def gc_bias(bam_filename, reference_filename, output_filename=None, memory_mb=None):
     """
     Run Picard CollectGcBiasMetrics to assess GC bias in aligned reads.
 
@@ -195,6 +226,7 @@ def gc_bias(bam_filename, reference_filename, output_filename=None):
         reference_filename (str or Path): Path to reference genome FASTA used for alignment.
         output_filename (str or Path, optional): Output metrics text file.
             Defaults to 'gc_bias_metrics.txt'.
+        memory_mb (int, optional): JVM memory. Defaults to the resource budget.
 
     Returns:
         list: [metrics_file, chart_file, summary_file]
@@ -211,8 +243,8 @@ def gc_bias(bam_filename, reference_filename, output_filename=None):
     chart_filename = Path(f"{base_stem}.pdf")
     summary_filename = Path(f"{base_stem}.txt")
 
-    subprocess.run([
-        "picard", "CollectGcBiasMetrics",
+    run([
+        "picard", f"-Xmx{java_heap_mb(memory_mb)}m", "CollectGcBiasMetrics",
         f"I={bam_filename}",
         f"O={output_filename}",
         f"CHART={chart_filename}",
@@ -222,7 +254,7 @@ def gc_bias(bam_filename, reference_filename, output_filename=None):
 
     return output_filename, chart_filename, summary_filename
     
-def qualimap_bam(bam_filename, out_dir=None):
+def qualimap_bam(bam_filename, out_dir=None, threads=None, memory_mb=None):
     """
     Run Qualimap bamqc to generate a QC report on aligned reads.
 
@@ -230,6 +262,8 @@ def qualimap_bam(bam_filename, out_dir=None):
         bam_filename (str or Path): Path to input BAM file (coordinate-sorted, duplicate-marked alignments).
         out_dir (str or Path, optional): Output directory for the Qualimap report.
             Defaults to 'qualimap_report'.
+        threads (int, optional): Worker threads. Defaults to the resource budget.
+        memory_mb (int, optional): JVM memory. Defaults to the resource budget.
 
     Returns:
         Path: Path to the output report directory.
@@ -241,23 +275,176 @@ def qualimap_bam(bam_filename, out_dir=None):
     else:
         out_dir = Path("qualimap_report")
 
-    subprocess.run([
+    run([
         "qualimap", "bamqc",
         "-bam", str(bam_filename),
         "-outdir", str(out_dir),
-        "-nt", "4"
+        "-nt", str(resolve_threads(threads)),
+        f"--java-mem-size={java_heap_mb(memory_mb)}M"
     ], check=True)
 
     return out_dir
 
-def coverage_depth_distribution(sample_file, output_file=None):
+def depth_histogram(per_base_file, max_depth=1000, chunk_rows=1_000_000):
+    """
+    Stream a mosdepth per-base BED and build a base-weighted depth histogram.
+
+    Rows are read in chunks of chunk_rows and each row counts end - start
+    bases, so memory depends on max_depth and the number of contigs, not on
+    genome size.
+
+    Parameters:
+        per_base_file (str or Path): Path to mosdepth .per-base.bed.gz file.
+        max_depth (int): Depths above this are counted in the last bin.
+        chunk_rows (int): BED rows parsed per chunk.
+
+    Returns:
+        tuple: (histogram, contigs) where histogram[d] is the number of bases
+            at depth d and contigs maps contig -> (histogram, depth sum).
+    """
+    import numpy as np
+    import pandas as pd
+
+    contigs = {}
+    reader = pd.read_csv(per_base_file, sep="\t", header=None,
+                         names=["chrom", "start", "end", "depth"],
+                         dtype={"chrom": str, "start": np.int64,
+                                "end": np.int64, "depth": np.int64},
+                         chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            # Per-base BEDs are sorted, so a chunk holds one or two contigs
+            for chrom, rows in chunk.groupby("chrom", sort=False):
+                lengths = (rows["end"] - rows["start"]).to_numpy()
+                depths = rows["depth"].to_numpy()
+                hist, depth_sum = contigs.get(chrom, (np.zeros(max_depth + 1, dtype=np.int64), 0))
+                hist += np.bincount(np.minimum(depths, max_depth), weights=lengths,
+                                    minlength=max_depth + 1).astype(np.int64)
+                contigs[chrom] = (hist, depth_sum + int(np.dot(depths, lengths)))
+
+    histogram = np.zeros(max_depth + 1, dtype=np.int64)
+    for hist, _ in contigs.values():
+        histogram += hist
+    return histogram, contigs
+
+
+def _histogram_summary(hist, depth_sum, thresholds=(1, 10, 20, 30)):
+    """Bases, mean, median and breadth at each threshold from a depth histogram."""
+    import numpy as np
+
+    bases = int(hist.sum())
+    if bases == 0:
+        return {"bases": 0, "mean": 0.0, "median": 0,
+                **{f"pct_{t}x": 0.0 for t in thresholds}}
+    at_least = np.cumsum(hist[::-1])[::-1]
+    summary = {
+        "bases": bases,
+        "mean": round(depth_sum / bases, 3),
+        "median": int(np.searchsorted(np.cumsum(hist), bases / 2)),
+    }
+    for t in thresholds:
+        covered = at_least[t] if t < len(hist) else 0
+        summary[f"pct_{t}x"] = round(100 * covered / bases, 3)
+    return summary
+
+
+def write_depth_summary(contigs, output_file):
+    """
+    Write per-contig depth summaries (and a genome-wide 'total' row) as TSV.
+
+    Parameters:
+        contigs (dict): contig -> (histogram, depth sum), as from depth_histogram().
+        output_file (str or Path): Output TSV path.
+
+    Returns:
+        Path: Path to the summary file.
+    """
+    import pandas as pd
+
+    output_file = Path(output_file)
+    rows = [{"contig": name, **_histogram_summary(hist, depth_sum)}
+            for name, (hist, depth_sum) in contigs.items()]
+    if contigs:
+        total_hist = sum(hist for hist, _ in contigs.values())
+        total_sum = sum(depth_sum for _, depth_sum in contigs.values())
+        rows.append({"contig": "total", **_histogram_summary(total_hist, total_sum)})
+    pd.DataFrame(rows).to_csv(output_file, sep="\t", index=False)
+    return output_file
+
+
+def targeted_coverage(bam_filename, regions, output_file=None, min_mapq=0, max_depth=1000):
+    """
+    Depth summaries over a set of target regions, read through the BAM
+    index in-process (no samtools/mosdepth run, no whole-BAM pass).
+
+    Parameters:
+        bam_filename (str or Path): Coordinate-sorted BAM with a .bai/.csi index.
+        regions (str, Path or list): BED file, or regions as 'chr:start-end'
+            strings, Region objects or (contig, start, end) tuples.
+        output_file (str or Path, optional): TSV with one row per region.
+        min_mapq (int): Ignore reads below this mapping quality.
+        max_depth (int): Depths above this are counted in the top bin.
+
+    Returns:
+        pandas.DataFrame: contig, start, end and the depth summary of each region.
+    """
+    import numpy as np
+    import pandas as pd
+    from omics.query import BAMQuery
+    from omics.query import read_regions
+
+    rows = []
+    with BAMQuery(bam_filename) as bam:
+        for region in read_regions(regions):
+            depth = bam.coverage(region, min_mapq=min_mapq)
+            hist = np.bincount(np.minimum(depth, max_depth), minlength=max_depth + 1)
+            rows.append({"contig": region.contig, "start": region.start,
+                         "end": region.start + len(depth),
+                         **_histogram_summary(hist, int(depth.sum()))})
+    table = pd.DataFrame(rows)
+    if output_file:
+        output_file = Path(output_file)
+        table.to_csv(output_file, sep="\t", index=False)
+        print(f"[✓] Targeted coverage for {len(rows)} regions written to: {output_file.name}")
+    return table
+
+
+def plot_depth_histogram(histogram, output_file, plot_max=100):
+    """Bar chart of bases per depth, from depth 0 to plot_max."""
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    depths = np.arange(min(plot_max, len(histogram) - 1) + 1)
+    plt.figure()
+    plt.bar(depths, histogram[:len(depths)], width=1.0)
+    plt.xlabel("Depth")
+    plt.ylabel("Number of Bases")
+    plt.title("Coverage Depth Distribution")
+    plt.tight_layout()
+    plt.savefig(output_file)
+    plt.close()
+    return output_file
+
+
+@stage("coverage_depth_distribution")
+def coverage_depth_distribution(sample_file, output_file=None, summary_file=None,
+                                max_depth=1000, chunk_rows=1_000_000):
     """
     Plot and save a histogram of per-base coverage depth from a mosdepth BED file.
 
+    The BED is streamed in chunks and each interval is weighted by its
+    length, so the plot counts bases rather than intervals and memory stays
+    constant regardless of genome size. Per-contig depth summaries are
+    written alongside the plot.
+
     Parameters:
         sample_file (str or Path): Path to mosdepth .per-base.bed.gz file.
         output_file (str or Path, optional): Output path for the saved plot.
             Defaults to '{sample_file stem}_depth_hist.png'.
+        summary_file (str or Path, optional): Per-contig summary TSV.
+            Defaults to the plot path with '_summary.tsv' in place of '.png'.
+        max_depth (int): Depths above this are pooled in the last histogram bin.
+        chunk_rows (int): BED rows parsed per chunk.
 
     Returns:
         Path: Path to the saved plot image.
@@ -269,16 +456,121 @@ def coverage_depth_distribution(sample_file, output_file=None):
     else:
         output_file = sample_file.with_name(f"{sample_file.stem}_depth_hist.png")
 
-    df = pd.read_csv(sample_file, sep='\t', header=None,
-                     names=["chrom", "start", "end", "depth"])
+    if summary_file:
+        summary_file = Path(summary_file)
+    else:
+        summary_file = output_file.with_name(f"{output_file.stem}_summary.tsv")
 
-    plt.figure()
-    plt.hist(df["depth"], bins=100, range=(0, 100))
-    plt.xlabel("Depth")
-    plt.ylabel("Number of Bases")
-    plt.title("Coverage Depth Distribution")
-    plt.tight_layout()
-    plt.savefig(output_file)
-    plt.close()
+    histogram, contigs = depth_histogram(sample_file, max_depth=max_depth,
+                                         chunk_rows=chunk_rows)
+    write_depth_summary(contigs, summary_file)
+    plot_depth_histogram(histogram, output_file)
 
-    return output_file
\ No newline at end of file
+    return output_file
+
+
+def read_mosdepth_summary(summary_file):
+    """
+    Contig lengths and mean depths from a .mosdepth.summary.txt.
+
+    Returns:
+        dict: contig -> (length, mean depth). The 'total' and '*_region'
+            rows are left out.
+    """
+    contigs = {}
+    with open(summary_file) as f:
+        next(f)  # header
+        for line in f:
+            chrom, length, _, mean, *_ = line.rstrip("\n").split("\t")
+            if chrom == "total" or chrom.endswith("_region"):
+                continue
+            contigs[chrom] = (int(length), float(mean))
+    return contigs
+
+
+def depth_histogram_from_dist(dist_file, summary_file, max_depth=1000):
+    """
+    Rebuild a base-weighted depth histogram from mosdepth's summary outputs.
+
+    The .mosdepth.global.dist.txt gives, per contig, the fraction of bases
+    covered at >= each depth; differencing it and scaling by the contig
+    length from the summary gives bases per depth. mosdepth rounds the
+    fractions to two decimals, so bins are resolved to about 1% of each
+    contig; the means come from the summary and are exact.
+
+    Parameters:
+        dist_file (str or Path): Path to the .mosdepth.global.dist.txt file.
+        summary_file (str or Path): Path to the .mosdepth.summary.txt file.
+        max_depth (int): Depths above this are counted in the last bin.
+
+    Returns:
+        tuple: (histogram, contigs) in the same form as depth_histogram().
+    """
+    import numpy as np
+
+    lengths = read_mosdepth_summary(summary_file)
+
+    at_least = {}
+    with open(dist_file) as f:
+        for line in f:
+            chrom, depth, fraction = line.split("\t")
+            if chrom in lengths:
+                at_least.setdefault(chrom, {})[int(depth)] = float(fraction)
+
+    contigs = {}
+    for chrom, (length, mean) in lengths.items():
+        fractions = at_least.get(chrom, {0: 1.0})
+        cumulative = np.zeros(max(fractions) + 2)
+        for depth, fraction in fractions.items():
+            cumulative[depth] = fraction
+        # Depths mosdepth left out share the fraction of the next depth above
+        cumulative = np.maximum.accumulate(cumulative[::-1])[::-1]
+        bases = np.rint((cumulative[:-1] - cumulative[1:]) * length).astype(np.int64)
+
+        hist = np.zeros(max_depth + 1, dtype=np.int64)
+        np.add.at(hist, np.minimum(np.arange(len(bases)), max_depth), bases)
+        contigs[chrom] = (hist, int(round(mean * length)))
+
+    histogram = np.zeros(max_depth + 1, dtype=np.int64)
+    for hist, _ in contigs.values():
+        histogram += hist
+    return histogram, contigs
+
+
+@stage("coverage_depth_from_summary")
+def coverage_depth_from_summary(dist_file, summary_file, output_file=None,
+                                depth_summary_file=None, max_depth=1000):
+    """
+    Plot the coverage depth histogram from mosdepth summary outputs, for
+    runs made with coverage_metrics(per_base=False).
+
+    Parameters:
+        dist_file (str or Path): Path to the .mosdepth.global.dist.txt file.
+        summary_file (str or Path): Path to the .mosdepth.summary.txt file.
+        output_file (str or Path, optional): Output path for the saved plot.
+            Defaults to '{dist_file prefix}_depth_hist.png'.
+        depth_summary_file (str or Path, optional): Per-contig summary TSV.
+            Defaults to the plot path with '_summary.tsv' in place of '.png'.
+        max_depth (int): Depths above this are pooled in the last histogram bin.
+
+    Returns:
+        Path: Path to the saved plot image.
+    """
+    dist_file = Path(dist_file)
+
+    if output_file:
+        output_file = Path(output_file)
+    else:
+        prefix = dist_file.name.replace(".mosdepth.global.dist.txt", "")
+        output_file = dist_file.with_name(f"{prefix}_depth_hist.png")
+
+    if depth_summary_file:
+        depth_summary_file = Path(depth_summary_file)
+    else:
+        depth_summary_file = output_file.with_name(f"{output_file.stem}_summary.tsv")
+
+    histogram, contigs = depth_histogram_from_dist(dist_file, summary_file, max_depth=max_depth)
+    write_depth_summary(contigs, depth_summary_file)
+    plot_depth_histogram(histogram, output_file)
+
+    return output_file
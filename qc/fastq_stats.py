@@ -0,0 +1,542 @@
+"""
+FastQC-style read statistics computed in-process with NumPy.
+
+FASTQ files (plain, gzip or BGZF) are decompressed in large chunks on a
+reader thread while the previous chunk is analysed. Each chunk's sequence
+and quality lines are joined into flat byte arrays, and every statistic is a
+bincount over them: per-position quality and base composition, per-read
+mean quality and GC, lengths. Duplication follows FastQC: the first
+DUP_TRACK distinct sequences (truncated to 50 bp when longer than 75 bp) are
+counted over the whole file.
+
+Results are written as <name>_fastqc/fastqc_data.txt in FastQC's format, so
+MultiQC reports them like FastQC output:
+
+    fastq_qc([read1, read2], qc_dir)          # one process per file
+    fastq_qc(reads, qc_dir, engine="fastqc")  # run FastQC instead
+
+The engine defaults to OMICS_FASTQ_QC ("python", or "fastqc"). Adapter
+content and per-tile quality are not computed.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from qc.alignment import fast_qc
+from omics.resources import threads as resolve_threads
+from omics.telemetry import get_recorder
+from omics.telemetry import measured
+from omics.telemetry import stage
+
+DEFAULT_ENGINE = os.environ.get("OMICS_FASTQ_QC", "python")
+CHUNK_BYTES = 16 << 20
+RAW_READ_BYTES = 4 << 20
+MAX_QUAL = 94
+DUP_TRACK = 100_000
+OVERREPRESENTED_FRACTION = 0.001
+FASTQ_SUFFIXES = (".fastq.gz", ".fq.gz", ".fastq.bgz", ".fastq", ".fq", ".gz")
+DUP_LEVELS = ["1", "2", "3", "4", "5", "6", "7", "8", "9",
+              ">10", ">50", ">100", ">500", ">1k", ">5k", ">10k+"]
+DUP_LEVEL_STARTS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 50, 100, 500, 1000, 5000, 10000]
+# Odd 64-bit multipliers, one per 8-byte word of an 80-byte duplicate key
+HASH_WEIGHTS = (0x121564595e0490a3, 0xaad7a318d44f69ab, 0x2ad91327ad4ad2c9, 0xdbc997564d3d2c95,
+                0xe32ad27f14546619, 0xe518405f8ba6e44d, 0xa993ec25243a20f1, 0x00e8f75c09a0d789,
+                0x46f01a66ac725b19, 0x1e4adf5f7d7ea7bd)
+
+
+def _decompressed_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """Decompressed contents of a plain, gzip or multi-member (BGZF) file, in chunks."""
+    with open(path, "rb") as f:
+        if f.read(2) != b"\x1f\x8b":
+            f.seek(0)
+            while block := f.read(chunk_bytes):
+                yield block
+            return
+        f.seek(0)
+        decomp = zlib.decompressobj(31)
+        pending, size = [], 0
+        while raw := f.read(RAW_READ_BYTES):
+            while raw:
+                out = decomp.decompress(raw)
+                pending.append(out)
+                size += len(out)
+                if decomp.eof:
+                    raw = decomp.unused_data
+                    decomp = zlib.decompressobj(31)
+                else:
+                    raw = b""
+            if size >= chunk_bytes:
+                yield b"".join(pending)
+                pending, size = [], 0
+        if pending:
+            yield b"".join(pending)
+
+
+def _prefetch(chunks, depth=2):
+    """Run a chunk generator on a thread, `depth` chunks ahead (zlib releases the GIL)."""
+    q = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                q.put(chunk)
+        except Exception as err:
+            q.put(err)
+        q.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while (item := q.get()) is not done:
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def read_batches(path, chunk_bytes=CHUNK_BYTES):
+    """
+    Yield (sequences, qualities) lists of bytes for each chunk of a FASTQ file.
+
+    Raises:
+        ValueError: if the file ends part-way through a record.
+    """
+    leftover = b""
+    for chunk in _prefetch(_decompressed_chunks(path, chunk_bytes)):
+        lines = (leftover + chunk).split(b"\n")
+        n = (len(lines) - 1) // 4 * 4
+        leftover = b"\n".join(lines[n:])
+        if n:
+            yield lines[1:n:4], lines[3:n:4]
+    lines = [line for line in leftover.split(b"\n") if line]
+    if len(lines) % 4:
+        raise ValueError(f"Truncated FASTQ record at the end of {path}")
+    if lines:
+        yield lines[1::4], lines[3::4]
+
+
+def _grow(array, rows):
+    """array with at least `rows` rows, zero-padded."""
+    import numpy as np
+
+    if array.shape[0] >= rows:
+        return array
+    grown = np.zeros((rows, *array.shape[1:]), dtype=array.dtype)
+    grown[:array.shape[0]] = array
+    return grown
+
+
+class FastqStats:
+    """
+    Accumulated statistics of one FASTQ file.
+
+    Counts are kept by raw byte: quality characters (0-127) and bases by
+    their low five bits, which separate A, C, G, T and N in either case.
+    The quality encoding is decided from the lowest character seen.
+    """
+
+    def __init__(self, filename):
+        import numpy as np
+
+        self.filename = filename
+        self.total_reads = 0
+        self.char_hist = np.zeros((0, 128), dtype=np.int64)        # position x quality char
+        self.base_hist = np.zeros((0, 32), dtype=np.int64)         # position x base & 31
+        self.mean_char_hist = np.zeros(128, dtype=np.int64)        # reads by mean quality char
+        self.length_hist = np.zeros(0, dtype=np.int64)
+        self.gc_counts = {}                                        # called << 32 | G+C → reads
+        self.dup_hashes = np.zeros(0, dtype=np.uint64)             # tracked keys, sorted
+        self.dup_reads = np.zeros(0, dtype=np.int64)
+        self.dup_keys = np.zeros(0, dtype="S75")
+
+    def update(self, seqs, quals):
+        """Add one batch of reads (lists of sequence and quality bytes)."""
+        import numpy as np
+
+        if not seqs:
+            return
+        lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+        seq = np.frombuffer(b"".join(seqs), dtype=np.uint8)
+        qual = np.frombuffer(b"".join(quals), dtype=np.uint8)
+        if qual.size != seq.size:
+            raise ValueError(f"{self.filename}: sequence and quality lengths differ")
+        if qual.size and qual.max() >= 128:
+            raise ValueError(f"{self.filename}: quality string is not ASCII")
+
+        max_len = int(lengths.max())
+        fixed = bool(lengths[0] == max_len and (lengths == max_len).all())
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        base = seq & 31
+
+        # One bincount over position << 12 | base << 7 | quality char gives
+        # both the per-position quality and base composition tables
+        key = base.astype(np.int32)
+        key <<= 7
+        key |= qual
+        if fixed:
+            key = key.reshape(-1, max_len)
+            key += np.arange(max_len, dtype=np.int32) << 12
+        else:
+            key += (np.arange(seq.size, dtype=np.int32)
+                    - np.repeat(starts.astype(np.int32), lengths)) << 12
+        table = np.bincount(key.ravel(), minlength=max_len << 12).reshape(max_len, 32, 128)
+        self.char_hist = _grow(self.char_hist, max_len)
+        self.char_hist[:max_len] += table.sum(axis=1)
+        self.base_hist = _grow(self.base_hist, max_len)
+        self.base_hist[:max_len] += table.sum(axis=2)
+        self.length_hist = _grow(self.length_hist, max_len + 1)
+        self.length_hist[:max_len + 1] += np.bincount(lengths, minlength=max_len + 1)
+
+        # Per-read sums: row sums for equal lengths, else reduceat over the
+        # non-empty reads
+        gc_flag = (base == 3) | (base == 7)
+        n_flag = base == 14
+        if fixed:
+            qsum = qual.reshape(-1, max_len).sum(axis=1, dtype=np.int64)
+            gc = gc_flag.reshape(-1, max_len).sum(axis=1, dtype=np.int64)
+            called = max_len - n_flag.reshape(-1, max_len).sum(axis=1, dtype=np.int64)
+            read_lengths = lengths
+        else:
+            nonempty = lengths > 0
+            at = starts[nonempty]
+            qsum = np.add.reduceat(qual, at, dtype=np.int64)
+            gc = np.add.reduceat(gc_flag, at, dtype=np.int64)
+            read_lengths = lengths[nonempty]
+            called = read_lengths - np.add.reduceat(n_flag, at, dtype=np.int64)
+        if read_lengths.size:
+            self.mean_char_hist += np.bincount(qsum // read_lengths, minlength=128)
+        keys, n = np.unique(((called << 32) | gc)[called > 0], return_counts=True)
+        for k, count in zip(keys.tolist(), n.tolist()):
+            self.gc_counts[k] = self.gc_counts.get(k, 0) + count
+
+        self._count_duplicates(seq, starts, lengths, fixed)
+        self.total_reads += len(seqs)
+
+    @property
+    def offset(self):
+        """Phred offset: 64 (Illumina 1.3-1.7) if no quality char is below '@', else 33."""
+        seen = self.char_hist.sum(axis=0).nonzero()[0]
+        return 64 if len(seen) and seen[0] >= 64 else 33
+
+    def _phred(self, char_counts):
+        """Re-index counts by quality character (last axis) as Phred scores 0..MAX_QUAL-1."""
+        import numpy as np
+
+        off = self.offset
+        phred = np.zeros((*char_counts.shape[:-1], MAX_QUAL), dtype=char_counts.dtype)
+        phred[..., :128 - off] = char_counts[..., off:off + MAX_QUAL]
+        phred[..., 0] += char_counts[..., :off].sum(axis=-1)
+        return phred
+
+    @property
+    def qual_hist(self):
+        """position x Phred quality."""
+        return self._phred(self.char_hist)
+
+    @property
+    def base_counts(self):
+        """position x A, C, G, T, N (any other character counts as N)."""
+        import numpy as np
+
+        acgt = self.base_hist[:, [1, 3, 7, 20]]
+        other = self.base_hist.sum(axis=1) - acgt.sum(axis=1)
+        return np.column_stack([acgt, other])
+
+    def _count_duplicates(self, seq, starts, lengths, fixed):
+        """
+        Count reads per tracked sequence. Keys are the read truncated to 50 bp
+        when longer than 75 bp; a key is tracked if it is first seen while
+        fewer than DUP_TRACK keys are, and counted over the whole file.
+        Keys are compared by a 64-bit hash of their bytes.
+        """
+        import numpy as np
+
+        n = len(lengths)
+        if fixed and seq.size:
+            width = int(lengths[0]) if lengths[0] <= 75 else 50
+            keys = np.zeros((n, 80), dtype=np.uint8)
+            keys[:, :width] = seq.reshape(n, -1)[:, :width]
+        else:
+            key_len = np.where(lengths > 75, 50, lengths)
+            cols = np.arange(80)
+            keys = seq[np.minimum(starts[:, None] + cols, max(seq.size - 1, 0))] if seq.size \
+                else np.zeros((n, 80), dtype=np.uint8)
+            keys *= cols < key_len[:, None]
+        weights = np.array(HASH_WEIGHTS, dtype=np.uint64)
+        hashes = (keys.view(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+
+        uniq, first, count = np.unique(hashes, return_index=True, return_counts=True)
+        at = np.searchsorted(self.dup_hashes, uniq)
+        found = np.zeros(len(uniq), dtype=bool)
+        inside = at < len(self.dup_hashes)
+        found[inside] = self.dup_hashes[at[inside]] == uniq[inside]
+        self.dup_reads[at[found]] += count[found]
+
+        room = DUP_TRACK - len(self.dup_hashes)
+        if room > 0:
+            new = np.flatnonzero(~found)
+            new = new[np.argsort(first[new], kind="stable")[:room]]
+            hashes = np.concatenate([self.dup_hashes, uniq[new]])
+            order = np.argsort(hashes, kind="stable")
+            self.dup_hashes = hashes[order]
+            self.dup_reads = np.concatenate([self.dup_reads, count[new]])[order]
+            new_keys = np.ascontiguousarray(keys[first[new], :75]).view("S75").ravel()
+            self.dup_keys = np.concatenate([self.dup_keys, new_keys])[order]
+
+    # -- FastQC modules ----------------------------------------------------
+
+    def gc_histogram(self):
+        """
+        Reads per GC percentage 0-100. Like FastQC's GC model, a read with g
+        GC of n called bases is spread over the percentages covered by
+        (g ± 0.5) / n, in proportion to the overlap, so read lengths that
+        cannot hit some percentages leave no gaps in the distribution.
+        """
+        import numpy as np
+
+        hist = np.zeros(101)
+        models = {}
+        for key, count in self.gc_counts.items():
+            called, gc = key >> 32, key & 0xFFFFFFFF
+            if called not in models:
+                models[called] = _gc_model(called)
+            bins, weights = models[called][gc]
+            hist[bins] += count * weights
+        return hist
+
+    def _quality_rows(self):
+        """Per position: mean, median, lower/upper quartile, 10th/90th percentile."""
+        import numpy as np
+
+        hist = self.qual_hist
+        total = hist.sum(axis=1)
+        cum = hist.cumsum(axis=1)
+        mean = (hist * np.arange(MAX_QUAL)).sum(axis=1) / np.maximum(total, 1)
+        pct = {p: (cum < p * total[:, None]).sum(axis=1) for p in (0.5, 0.25, 0.75, 0.1, 0.9)}
+        return [(i + 1, mean[i], pct[0.5][i], pct[0.25][i], pct[0.75][i], pct[0.1][i], pct[0.9][i])
+                for i in range(hist.shape[0]) if total[i]]
+
+    def _duplication(self):
+        import numpy as np
+
+        counts = self.dup_reads
+        bins = np.searchsorted(DUP_LEVEL_STARTS, counts, side="right") - 1
+        distinct = np.bincount(bins, minlength=len(DUP_LEVELS))
+        reads = np.bincount(bins, weights=counts, minlength=len(DUP_LEVELS))
+        tracked = max(int(counts.sum()), 1)
+        dedup_pct = 100 * len(counts) / tracked
+        rows = [(label, 100 * d / max(len(counts), 1), 100 * r / tracked)
+                for label, d, r in zip(DUP_LEVELS, distinct, reads)]
+        return dedup_pct, rows
+
+    def _overrepresented(self):
+        import numpy as np
+
+        threshold = OVERREPRESENTED_FRACTION * self.total_reads
+        hits = np.flatnonzero(self.dup_reads > threshold)
+        hits = hits[np.argsort(-self.dup_reads[hits], kind="stable")]
+        return [(self.dup_keys[i].decode(), int(self.dup_reads[i])) for i in hits]
+
+    def fastqc_data(self):
+        """The statistics as the text of FastQC's fastqc_data.txt."""
+        import numpy as np
+
+        out = ["##FastQC\t0.11.9"]
+
+        def module(name, status, header, rows, preamble=()):
+            out.append(f">>{name}\t{status}")
+            out.extend(preamble)
+            out.append(header)
+            out.extend("\t".join(_fmt(v) for v in row) for row in rows)
+            out.append(">>END_MODULE")
+
+        lengths = np.flatnonzero(self.length_hist)
+        base_counts = self.base_counts
+        bases = base_counts.sum(axis=0)
+        acgt = bases[:4].sum()
+        length_text = (str(lengths[0]) if len(lengths) == 1
+                       else f"{lengths[0]}-{lengths[-1]}" if len(lengths) else "0")
+        encoding = "Illumina 1.5" if self.offset == 64 else "Sanger / Illumina 1.9"
+        module("Basic Statistics", "pass", "#Measure\tValue", [
+            ("Filename", self.filename),
+            ("File type", "Conventional base calls"),
+            ("Encoding", encoding),
+            ("Total Sequences", self.total_reads),
+            ("Sequences flagged as poor quality", 0),
+            ("Sequence length", length_text),
+            ("%GC", int(round(100 * (bases[1] + bases[2]) / max(acgt, 1)))),
+        ])
+
+        quality = self._quality_rows()
+        lower = min((r[3] for r in quality), default=0)
+        median = min((r[2] for r in quality), default=0)
+        module("Per base sequence quality",
+               _worst(_status(-lower, -10, -5), _status(-median, -25, -20)),
+               "#Base\tMean\tMedian\tLower Quartile\tUpper Quartile\t10th Percentile\t90th Percentile",
+               quality)
+
+        mean_qual = self._phred(self.mean_char_hist)
+        seen = np.flatnonzero(mean_qual)
+        mode = int(np.argmax(mean_qual))
+        module("Per sequence quality scores", _status(-mode, -27, -20), "#Quality\tCount",
+               [(i, mean_qual[i]) for i in range(seen[0], seen[-1] + 1)] if len(seen) else [])
+
+        acgt_pos = np.maximum(base_counts[:, :4].sum(axis=1, keepdims=True), 1)
+        content = 100 * base_counts[:, :4] / acgt_pos          # A C G T
+        imbalance = max(np.abs(content[:, 0] - content[:, 3]).max(initial=0),
+                        np.abs(content[:, 1] - content[:, 2]).max(initial=0))
+        module("Per base sequence content", _status(imbalance, 10, 20), "#Base\tG\tA\tT\tC",
+               [(i + 1, c[2], c[0], c[3], c[1]) for i, c in enumerate(content)])
+
+        gc_hist = self.gc_histogram()
+        module("Per sequence GC content", _status(_gc_deviation(gc_hist), 15, 30),
+               "#GC Content\tCount", [(i, float(gc_hist[i])) for i in range(101)])
+
+        n_pct = 100 * base_counts[:, 4] / np.maximum(base_counts.sum(axis=1), 1)
+        module("Per base N content", _status(n_pct.max(initial=0), 5, 20), "#Base\tN-Count",
+               [(i + 1, v) for i, v in enumerate(n_pct)])
+
+        module("Sequence Length Distribution",
+               "fail" if self.length_hist[:1].sum() else "warn" if len(lengths) > 1 else "pass",
+               "#Length\tCount", [(i, self.length_hist[i]) for i in lengths])
+
+        dedup_pct, dup_rows = self._duplication()
+        module("Sequence Duplication Levels", _status(-dedup_pct, -80, -50),
+               "#Duplication Level\tPercentage of deduplicated\tPercentage of total", dup_rows,
+               preamble=[f"#Total Deduplicated Percentage\t{_fmt(dedup_pct)}"])
+
+        over = self._overrepresented()
+        module("Overrepresented sequences",
+               _status(max((c for _, c in over), default=0) / max(self.total_reads, 1), 0.001, 0.01)
+               if over else "pass",
+               "#Sequence\tCount\tPercentage\tPossible Source",
+               [(s, c, 100 * c / self.total_reads, "No Hit") for s, c in over])
+        return "\n".join(out) + "\n"
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f"{value:.4f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def _status(value, warn, fail):
+    """FastQC pass/warn/fail for a value that is worse the higher it is."""
+    return "fail" if value > fail else "warn" if value > warn else "pass"
+
+
+def _worst(*statuses):
+    return max(statuses, key=("pass", "warn", "fail").index)
+
+
+def _gc_model(length):
+    """For each GC count 0..length: (percentage bins it covers, share of a read in each)."""
+    import numpy as np
+
+    model = []
+    for gc in range(length + 1):
+        low = max(gc - 0.5, 0) * 100 / length
+        high = min(gc + 0.5, length) * 100 / length
+        bins = np.arange(int(np.floor(low + 0.5)), min(int(np.floor(high + 0.5)), 100) + 1)
+        overlap = np.minimum(high, bins + 0.5) - np.maximum(low, bins - 0.5)
+        model.append((bins, np.clip(overlap, 0, None) / (high - low)))
+    return model
+
+
+def _gc_deviation(gc_hist):
+    """Percentage of reads outside a normal distribution fitted to the GC histogram (FastQC's test)."""
+    import numpy as np
+
+    total = gc_hist.sum()
+    if not total:
+        return 0.0
+    x = np.arange(len(gc_hist))
+    mode = np.argmax(gc_hist)
+    sd = np.sqrt((gc_hist * (x - mode) ** 2).sum() / total)
+    if sd == 0:
+        return 0.0
+    theoretical = np.exp(-0.5 * ((x - mode) / sd) ** 2)
+    theoretical *= total / theoretical.sum()
+    return 100 * np.abs(gc_hist - theoretical).sum() / total
+
+
+def fastqc_name(path):
+    """FastQC's report name for a FASTQ: reads_1.fastq.gz → reads_1_fastqc."""
+    name = Path(path).name
+    for suffix in FASTQ_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return f"{name}_fastqc"
+
+
+def fastq_stats(fastq, chunk_bytes=CHUNK_BYTES):
+    """
+    Compute FastQC-style statistics for one FASTQ file.
+
+    Parameters:
+        fastq (str or Path): Plain, gzip or BGZF FASTQ.
+        chunk_bytes (int): Decompressed bytes analysed per batch.
+
+    Returns:
+        FastqStats
+    """
+    stats = FastqStats(Path(fastq).name)
+    for seqs, quals in read_batches(fastq, chunk_bytes):
+        stats.update(seqs, quals)
+    return stats
+
+
+def write_fastqc_data(fastq, qc_dir, chunk_bytes=CHUNK_BYTES):
+    """Write <qc_dir>/<name>_fastqc/fastqc_data.txt for one FASTQ; returns its path."""
+    out_dir = Path(qc_dir) / fastqc_name(fastq)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_file = out_dir / "fastqc_data.txt"
+    out_file.write_text(fastq_stats(fastq, chunk_bytes).fastqc_data())
+    print(f"FASTQ QC: {fastq} → {out_file}")
+    return out_file
+
+
+def fastq_qc(reads, qc_dir, threads=None, engine=None):
+    """
+    FastQC-compatible QC of FASTQ files, for MultiQC.
+
+    Parameters:
+        reads (list of str or Path): FASTQ files.
+        qc_dir (str or Path): Output directory.
+        threads (int, optional): Files processed in parallel, one process each
+            (plus its reader thread). Defaults to the resource budget.
+        engine (str, optional): "python" for this module, "fastqc" to run
+            FastQC. Defaults to OMICS_FASTQ_QC, else "python".
+
+    Returns:
+        Path: The output directory.
+    """
+    engine = engine or DEFAULT_ENGINE
+    if engine == "fastqc":
+        return fast_qc(reads, qc_dir, threads=threads)
+    if engine != "python":
+        raise ValueError(f"Unknown FASTQ QC engine {engine!r}; use 'python' or 'fastqc'")
+
+    reads = [Path(r) for r in reads]
+    qc_dir = Path(qc_dir)
+    qc_dir.mkdir(parents=True, exist_ok=True)
+    workers = resolve_threads(threads, cap=len(reads))
+    if workers <= 1 or len(reads) == 1:
+        for fastq in reads:
+            with stage("fastq_stats"):
+                write_fastqc_data(fastq, qc_dir)
+    else:
+        # Not fork: this is called from batch's sample threads, and a forked
+        # child could inherit a lock another thread holds (telemetry, print)
+        context = multiprocessing.get_context("forkserver")
+        n = len(reads)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            # Each worker measures its file; the records join this run's telemetry
+            for _, record in pool.map(measured, ["fastq_stats"] * n, [write_fastqc_data] * n,
+                                      reads, [qc_dir] * n):
+                get_recorder().add(record)
+    return qc_dir
@@ -0,0 +1,8 @@
+import pytest
+
+from omics import telemetry
+@pytest.fixture(autouse=True, scope="session")
+def _telemetry_dir(tmp_path_factory):
+    """Keep the suite's stage records out of the working directory."""
+    telemetry.configure(out_dir=tmp_path_factory.mktemp("telemetry"), quiet=True)
+    yield
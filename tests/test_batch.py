@@ -0,0 +1,24 @@
+import contextlib
+
+from omics.resources import ResourceBudget
+from genomics import batch
+
+
+def test_setup_failure_is_recorded(tmp_path, monkeypatch):
+    @contextlib.contextmanager
+    def broken_session(name):
+        raise OSError("scratch root not writable")
+        yield
+
+    monkeypatch.setattr(batch, "scratch_session", broken_session)
+    sample = batch.Sample(name="s1", accession="SRR1")
+    status = batch._StatusFile(tmp_path / "batch_status.tsv", [sample])
+
+    batch._run_sample(sample, tmp_path / "ref.fa", tmp_path, gates={},
+                      budget=ResourceBudget(threads=1, memory_mb=512),
+                      run_qc=False, stream_trim=False, status=status)
+
+    assert sample.status == "failed"
+    assert sample.failed_stage == "setup"
+    assert sample.error == "OSError: scratch root not writable"
+    assert "\tfailed\tsetup\t" in status.path.read_text()
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import pyarrow.compute as pc
+
+from genomics.variants.export import export_parquet
+from genomics.variants.export import query_parquet
+
+HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##contig=<ID=1,length=1000>\n"
+    "##contig=<ID=2,length=1000>\n"
+    "##INFO=<ID=DP,Number=1,Type=Integer,Description=\"Depth\">\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+)
+
+
+@pytest.fixture
+def numeric_contig_dataset(tmp_path):
+    vcf = tmp_path / "calls.vcf"
+    vcf.write_text(
+        HEADER
+        + "1\t10\t.\tA\tG\t50\tPASS\tDP=12\n"
+        + "1\t200\t.\tC\tT\t40\tPASS\tDP=9\n"
+        + "2\t15\t.\tG\tA\t30\tPASS\tDP=7\n"
+    )
+    return export_parquet(vcf, tmp_path / "calls.parquet")
+
+
+def test_query_numeric_contig(numeric_contig_dataset):
+    table = query_parquet(numeric_contig_dataset, contig="1")
+    assert table["pos"].to_pylist() == [10, 200]
+    assert set(table["chrom"].to_pylist()) == {"1"}
+
+
+def test_query_numeric_contig_region(numeric_contig_dataset):
+    table = query_parquet(numeric_contig_dataset, contig="1", start=100, end=300,
+                          columns=["pos", "info_DP"])
+    assert table.to_pydict() == {"pos": [200], "info_DP": [9]}
+
+
+def test_query_all_contigs_are_strings(numeric_contig_dataset):
+    table = query_parquet(numeric_contig_dataset, where=pc.field("qual") >= 30)
+    assert sorted(table["chrom"].to_pylist()) == ["1", "1", "2"]
@@ -0,0 +1,18 @@
+from omics.resources import PIPE_SORT_MEMORY_FRACTION
+from omics.resources import ResourceBudget
+from omics.resources import scoped_budget
+from genomics.variants import filters
+from genomics.variants.annotate import sort_stage
+
+
+def test_pipeline_sort_gets_pipe_memory_share(tmp_path, monkeypatch):
+    commands = []
+    monkeypatch.setattr(filters, "run_pipeline", commands.extend)
+    pipeline = (filters.FilterPipeline(tmp_path / "in.bcf")
+                .add(filters.filter_stage("QUAL>20"))
+                .add(sort_stage()))
+    with scoped_budget(ResourceBudget(threads=4, memory_mb=4000)):
+        pipeline.run(tmp_path / "out.vcf.gz")
+    sort = next(c for c in commands if c[1] == "sort")
+    assert sort[sort.index("-m") + 1] == f"{int(4000 * PIPE_SORT_MEMORY_FRACTION)}M"
+    assert pipeline.stages[-1] == ["bcftools", "sort"]
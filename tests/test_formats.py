@@ -0,0 +1,19 @@
+from omics.resources import ResourceBudget
+from omics.resources import scoped_budget
+from genomics.variants.annotate import sort_stage
+from genomics.variants.formats import sort_run_args
+
+
+def test_sort_stage_does_not_depend_on_budget():
+    with scoped_budget(ResourceBudget(threads=2, memory_mb=2000)):
+        small = sort_stage()
+    with scoped_budget(ResourceBudget(threads=32, memory_mb=64000)):
+        large = sort_stage()
+    assert small == large == ["bcftools", "sort"]
+
+
+def test_sort_run_args_sizes_memory_from_budget():
+    with scoped_budget(ResourceBudget(threads=4, memory_mb=4000)):
+        assert sort_run_args(sort_stage()) == ["-m", "3000M"]
+        assert sort_run_args(["bcftools", "sort", "-m", "1G"]) == []
+        assert sort_run_args(["bcftools", "view"]) == []
@@ -0,0 +1,70 @@
+import gzip
+
+import pytest
+
+from genomics.variants import qc
+from genomics.variants.scan import scan_vcf
+
+HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##contig=<ID=1,length=1000>\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+)
+
+
+@pytest.fixture(params=["vcf", "vcf.gz"])
+def header_only_vcf(request, tmp_path):
+    path = tmp_path / f"empty.{request.param}"
+    if request.param == "vcf.gz":
+        with gzip.open(path, "wt") as out:
+            out.write(HEADER)
+    else:
+        path.write_text(HEADER)
+    return path
+
+
+def test_header_only_vcf_scans_empty(header_only_vcf):
+    scan = scan_vcf(header_only_vcf)
+    assert scan.records == 0
+    assert scan.alleles == 0
+    assert scan.qual.size == 0
+    assert scan.dp.size == 0
+    summary = scan.summary()
+    assert summary["ts_tv"] is None
+    assert summary["qual"] == {"n": 0}
+    assert summary["contigs"] == {}
+
+
+def test_header_only_vcf_qc(header_only_vcf, tmp_path):
+    assert qc.count_variant_types(header_only_vcf) == {"SNPs": 0, "Indels": 0}
+    assert qc.qual_distribution(header_only_vcf, tmp_path / "qual.png").exists()
+    assert qc.variant_metrics(header_only_vcf, tmp_path / "metrics.json").exists()
+
+
+def test_scan_counts_records(tmp_path):
+    path = tmp_path / "calls.vcf"
+    path.write_text(
+        HEADER
+        + "1\t10\t.\tA\tG\t50\tPASS\tDP=12\n"
+        + "1\t20\t.\tC\tA,CTT\t30\tLowQual\tAC=1;DP=7\n"
+    )
+    scan = scan_vcf(path)
+    assert scan.records == 2
+    assert scan.alleles == 3
+    assert scan.transitions == 1
+    assert scan.transversions == 1
+    assert dict(scan.indel_lengths) == {2: 1}
+    assert scan.dp.tolist() == [12, 7]
+    assert scan.contig_max_pos == {"1": 20}
+
+
+def test_scan_dp_extraction(tmp_path):
+    path = tmp_path / "dp.vcf"
+    path.write_text(
+        HEADER
+        + "1\t10\t.\tA\tG\t50\tPASS\tMQDP=3;DP=9\n"
+        + "1\t20\t.\tA\tG\t50\tPASS\tMQDP=3\n"
+        + "1\t30\t.\tA\tG\t50\tPASS\t.\n"
+        + "1\t40\t.\tA\tG\t50\tPASS\tDP=.;AC=1\n"
+    )
+    assert scan_vcf(path).dp.tolist() == [9, -1, -1, -1]
@@ -0,0 +1,36 @@
+import socket
+import subprocess
+import sys
+
+from omics.scratch import MARKER_FILE, SESSION_PREFIX, Scratch, ScratchSession
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_sweep_only_removes_own_stale_sessions(tmp_path):
+    scratch = Scratch(root=tmp_path)
+    dead = _dead_pid()
+
+    foreign = tmp_path / f"foo-{dead}"
+    foreign.mkdir()
+    unmarked = tmp_path / f"{SESSION_PREFIX}bar-{dead}"
+    unmarked.mkdir()
+    stale = tmp_path / f"{SESSION_PREFIX}sample-{dead}"
+    stale.mkdir()
+    (stale / MARKER_FILE).write_text(f"{socket.gethostname()} {dead}\n")
+    other_host = tmp_path / f"{SESSION_PREFIX}remote-{dead}"
+    other_host.mkdir()
+    (other_host / MARKER_FILE).write_text(f"some-other-host {dead}\n")
+    live = ScratchSession(scratch, "live")
+
+    scratch.sweep()
+
+    assert foreign.exists()
+    assert unmarked.exists()
+    assert not stale.exists()
+    assert other_host.exists()
+    assert live.dir.exists()
@@ -0,0 +1,153 @@
+from pathlib import Path
+
+import pytest
+
+from omics import stepcache
+from omics.resources import ResourceBudget
+from omics.resources import scoped_budget
+from omics.stepcache import StepCache
+from genomics.variants.annotate import sort_stage
+from genomics.variants.filters import FilterPipeline
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    versions = {"bcftools": "bcftools 1.21"}
+    monkeypatch.setattr(stepcache, "tool_version", lambda tool: versions.get(tool, "unknown"))
+    return versions
+
+
+@pytest.fixture
+def cache(tmp_path, versions):
+    return StepCache(tmp_path / "cache")
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+def _writer(calls):
+    def write(src, dst, label="x"):
+        calls.append(label)
+        Path(dst).write_text(Path(src).read_text() + label)
+        return Path(dst)
+    return write
+
+
+def test_key_changes_with_params_inputs_and_tools(cache, versions, tmp_path):
+    src = tmp_path / "in.txt"
+    src.write_text("a")
+    base = cache.key("step", [src], {"qual": 20}, ["bcftools"])
+
+    assert cache.key("step", [src], {"qual": 20}, ["bcftools"]) == base
+    assert cache.key("step", [src], {"qual": 30}, ["bcftools"]) != base
+    assert cache.key("other", [src], {"qual": 20}, ["bcftools"]) != base
+
+    src.write_text("ab")
+    changed_input = cache.key("step", [src], {"qual": 20}, ["bcftools"])
+    assert changed_input != base
+
+    versions["bcftools"] = "bcftools 1.22"
+    assert cache.key("step", [src], {"qual": 20}, ["bcftools"]) != changed_input
+
+
+def test_hit_then_rerun_on_change(cache, versions, tmp_path, calls):
+    write = _writer(calls)
+    src, dst = tmp_path / "in.txt", tmp_path / "out.txt"
+    src.write_text("a")
+
+    def step(label="x"):
+        return cache.run("write", write, src, dst, inputs=[src], tools=["bcftools"], label=label)
+
+    step()
+    step()
+    assert calls == ["x"]
+
+    step(label="y")
+    assert calls == ["x", "y"]
+
+    src.write_text("b")
+    step(label="y")
+    assert calls == ["x", "y", "y"]
+
+    versions["bcftools"] = "bcftools 1.22"
+    step(label="y")
+    assert calls == ["x", "y", "y", "y"]
+
+
+def test_changed_or_missing_output_forces_rerun(cache, tmp_path, calls):
+    write = _writer(calls)
+    src, dst = tmp_path / "in.txt", tmp_path / "out.txt"
+    src.write_text("a")
+
+    def step():
+        return cache.run("write", write, src, dst, inputs=[src])
+
+    step()
+    dst.write_text("tampered")
+    step()
+    assert calls == ["x", "x"]
+
+    dst.unlink()
+    step()
+    assert calls == ["x", "x", "x"]
+    step()
+    assert calls == ["x", "x", "x"]
+
+
+def test_declared_outputs_validate_hits(cache, tmp_path, calls):
+    src, report = tmp_path / "in.txt", tmp_path / "report.txt"
+    src.write_text("a")
+
+    def count(path, write_report=True):
+        calls.append(path)
+        if write_report:
+            report.write_text("1")
+        return {"records": 1}
+
+    def step(**kwargs):
+        return cache.run("count", count, src, inputs=[src], outputs=[report], **kwargs)
+
+    assert step() == {"records": 1}
+    assert step() == {"records": 1}
+    assert len(calls) == 1
+
+    report.unlink()
+    step()
+    assert len(calls) == 2
+
+    # A declared output the step did not write is not recorded
+    report.unlink()
+    step(write_report=False)
+    step(write_report=False)
+    assert len(calls) == 4
+
+
+def test_no_outputs_needs_opt_in(cache, tmp_path, calls):
+    def compute(n):
+        calls.append(n)
+        return n * 2
+
+    cache.run("compute", compute, 2)
+    cache.run("compute", compute, 2)
+    assert calls == [2, 2]
+
+    cache.run("pure", compute, 3, allow_no_outputs=True)
+    cache.run("pure", compute, 3, allow_no_outputs=True)
+    assert calls == [2, 2, 3]
+
+
+def test_filter_pipeline_key_does_not_depend_on_budget(cache, tmp_path):
+    vcf = tmp_path / "raw.bcf"
+    vcf.write_text("x")
+
+    def key():
+        pipeline = FilterPipeline(vcf).add(["bcftools", "norm", "-d", "exact"]).add(sort_stage())
+        return cache.key("filter_pipeline", [vcf], {"stages": pipeline.stages}, ["bcftools"])
+
+    with scoped_budget(ResourceBudget(threads=2, memory_mb=2000)):
+        small = key()
+    with scoped_budget(ResourceBudget(threads=32, memory_mb=64000)):
+        large = key()
+    assert small == large
@@ -0,0 +1,24 @@
+from omics import telemetry
+from omics.telemetry import stage
+
+
+@stage("outer")
+def _work():
+    return sum(range(1000))
+
+
+def test_stage_decorator_records_once_when_nested(tmp_path):
+    recorder = telemetry.configure(out_dir=tmp_path, quiet=True)
+    with stage("outer"):
+        assert _work() == 499500
+    _work()
+    assert [r["name"] for r in recorder.records] == ["outer", "outer"]
+    assert all(r["kind"] == "stage" for r in recorder.records)
+
+
+def test_measured_returns_record_without_adding(tmp_path):
+    recorder = telemetry.configure(out_dir=tmp_path, quiet=True)
+    result, record = telemetry.measured("work", sum, [1, 2, 3])
+    assert result == 6
+    assert record["name"] == "work" and record["wall_s"] >= 0
+    assert recorder.records == []